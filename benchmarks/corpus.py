@@ -0,0 +1,98 @@
+"""
+Seeded generator of CV-shaped documents for the benchmarks.
+
+The documents follow the layout of `examples/basic_ko/extended_template.yaml`: a `cv` mapping
+with language and filter configs, multi-language fields, and sections of entries whose highlights
+carry verbosity and tags. The same `CorpusSpec` always produces the same document.
+"""
+
+import random
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field
+
+
+class CorpusSpec(BaseModel):
+    seed: int = Field(default=0, description="Seed for the random choices")
+    sections: int = Field(default=20, description="Number of sections")
+    entries: int = Field(default=10, description="Entries per section")
+    highlights: int = Field(default=6, description="Highlights per entry")
+    depth: int = Field(default=1, description="Levels of nested highlight groups per entry")
+    languages: int = Field(default=2, description="Number of languages for each text field")
+    tags: int = Field(default=12, description="Size of the tag vocabulary")
+    tags_per_item: int = Field(default=2, description="Most tags given to one highlight")
+    verbosity_levels: List[float] = Field(
+        default=[1.0, 2.0, 3.0], description="Verbosity levels the highlights are spread over"
+    )
+
+
+def language_keys(count: int) -> List[str]:
+    base = ["en", "ko", "ja", "de", "fr", "es", "zh", "pt"]
+    return base[:count] + [f"l{i}" for i in range(len(base), count)]
+
+
+def generate_cv(spec: CorpusSpec) -> Dict[str, Any]:
+    rng = random.Random(spec.seed)
+    langs = language_keys(spec.languages)
+    vocabulary = [f"tag{i}" for i in range(spec.tags)]
+
+    def text(label: str) -> Dict[str, str]:
+        return {lang: f"{label} ({lang}) {rng.randrange(10**6)}" for lang in langs}
+
+    def highlight(label: str) -> Dict[str, Any]:
+        item: Dict[str, Any] = {
+            "content": text(label),
+            "verbosity": rng.choice(spec.verbosity_levels),
+        }
+        count = rng.randint(0, min(spec.tags_per_item, spec.tags))
+        if count:
+            item["tags"] = rng.sample(vocabulary, count)
+        return item
+
+    def highlight_group(label: str, depth: int) -> Any:
+        items: List[Any] = [highlight(f"{label}.{h}") for h in range(spec.highlights)]
+        if depth > 1:
+            items.append(highlight_group(f"{label}.sub", depth - 1))
+        # A wrapper like the 'highlights' of the education entry in the example
+        return {"content": items, "verbosity": rng.choice(spec.verbosity_levels)}
+
+    def entry(label: str) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            "company": text(f"Company {label}"),
+            "position": text(f"Position {label}"),
+            "start_date": f"{rng.randint(2000, 2020)}-{rng.randint(1, 12):02d}",
+            "end_date": "present",
+        }
+        if spec.depth > 0:
+            result["highlights"] = highlight_group(label, spec.depth)
+        else:
+            result["highlights"] = [highlight(f"{label}.{h}") for h in range(spec.highlights)]
+        return result
+
+    return {
+        "cv": {
+            "multi_lang_config": {"lang_keys": langs, "default_lang": langs[0]},
+            "filter_config": {"content_key": "content", "verbosity_key": "verbosity"},
+            "name": text("Name"),
+            "location": text("Location"),
+            "email": "someone@example.com",
+            "sections": {
+                f"section_{s}": [entry(f"{s}.{e}") for e in range(spec.entries)]
+                for s in range(spec.sections)
+            },
+        }
+    }
+
+
+def count_nodes(data: Any) -> int:
+    """Count every dict, list and leaf in the document."""
+    count = 0
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return count
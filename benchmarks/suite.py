@@ -0,0 +1,172 @@
+"""
+Measure throughput and peak memory of each transform on a generated CV corpus.
+
+Run with `python -m benchmarks.suite`. Results are compared against a JSON baseline written by
+an earlier `--save` run with the same corpus options, and the run fails when a transform has
+become slower or uses more memory than the baseline allows. Timings depend on the machine, so a
+baseline is only meaningful where it was recorded.
+
+    python -m benchmarks.suite --sections 40 --save      # record a baseline
+    python -m benchmarks.suite --sections 40             # compare against it
+"""
+
+import argparse
+import copy
+import json
+import platform
+import random
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.corpus import CorpusSpec, count_nodes, generate_cv
+from cvgen.cli import compare_yaml_content
+from cvgen.utils.collapse import collapse_keys
+from cvgen.utils.filter_compound import filter_compound
+from cvgen.utils.unwrap import unwrap_content
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def mutate(document: Any, changes: int, seed: int) -> Any:
+    """Return a copy of `document` with `changes` of its string leaves replaced."""
+    rng = random.Random(seed)
+    mutated = copy.deepcopy(document)
+    slots = []
+    stack = [mutated]
+    while stack:
+        node = stack.pop()
+        items = node.items() if isinstance(node, dict) else enumerate(node)
+        for key, value in items:
+            if isinstance(value, (dict, list)):
+                stack.append(value)
+            elif isinstance(value, str):
+                slots.append((node, key))
+    for node, key in rng.sample(slots, min(changes, len(slots))):
+        node[key] += " (changed)"
+    return mutated
+
+
+def transforms(document: Any, spec: CorpusSpec) -> List[Tuple[str, Callable[[], Any]]]:
+    lang = document["cv"]["multi_lang_config"]["lang_keys"][-1]
+    verbosity = sorted(spec.verbosity_levels)[len(spec.verbosity_levels) // 2]
+    other = mutate(document, changes=10, seed=spec.seed)
+    return [
+        (
+            "filter_compound",
+            lambda: filter_compound(document, target_verbosity=verbosity, exclude_tags=["tag1"]),
+        ),
+        (
+            "collapse_keys",
+            lambda: collapse_keys(document, "multi_lang_config", "lang_keys", "default_lang", lang),
+        ),
+        ("unwrap_content", lambda: unwrap_content(document)),
+        ("compare_yaml_content", lambda: compare_yaml_content(document, other)),
+    ]
+
+
+def measure(run: Callable[[], Any], nodes: int, repeat: int) -> Dict[str, float]:
+    run()
+    # Timed without tracemalloc, which slows allocations down considerably
+    seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "nodes_per_second": nodes / seconds, "peak_bytes": peak}
+
+
+def run_suite(spec: CorpusSpec, repeat: int) -> Dict[str, Any]:
+    document = generate_cv(spec)
+    nodes = count_nodes(document)
+    return {
+        "spec": spec.model_dump(),
+        "nodes": nodes,
+        "python": platform.python_version(),
+        "results": {name: measure(run, nodes, repeat) for name, run in transforms(document, spec)},
+    }
+
+
+def find_regressions(
+    report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    regressions = []
+    for name, result in report["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        if result["nodes_per_second"] < before["nodes_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['nodes_per_second']:.0f} nodes/s, "
+                f"baseline {before['nodes_per_second']:.0f}"
+            )
+        if result["peak_bytes"] > before["peak_bytes"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak {result['peak_bytes']} bytes, baseline {before['peak_bytes']}"
+            )
+    return regressions
+
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"corpus: {report['nodes']} nodes, python {report['python']}")
+    for name, result in report["results"].items():
+        line = (
+            f"{name:<22} {result['seconds'] * 1000:9.2f} ms "
+            f"{result['nodes_per_second']:12.0f} nodes/s {result['peak_bytes'] / 1e6:9.2f} MB peak"
+        )
+        before = baseline.get("results", {}).get(name)
+        if before:
+            line += f"   x{result['nodes_per_second'] / before['nodes_per_second']:.2f} speed"
+            line += f"   x{result['peak_bytes'] / max(before['peak_bytes'], 1):.2f} memory"
+        print(line)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    for name, field in CorpusSpec.model_fields.items():
+        if name == "verbosity_levels":
+            parser.add_argument(
+                "--verbosity-levels",
+                type=float,
+                nargs="+",
+                default=field.default,
+                help=field.description,
+            )
+        else:
+            flag = "--" + name.replace("_", "-")
+            parser.add_argument(flag, type=int, default=field.default, help=field.description)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per transform")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Write the results as the baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed slowdown or memory growth (0.2=20%%)"
+    )
+    args = parser.parse_args(argv)
+
+    spec = CorpusSpec(**{name: getattr(args, name) for name in CorpusSpec.model_fields})
+    report = run_suite(spec, args.repeat)
+
+    baseline: Dict[str, Any] = {}
+    if not args.save and args.baseline.is_file():
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("spec") != report["spec"]:
+            print(f"{args.baseline} was recorded for another corpus, not comparing")
+            baseline = {}
+    print_report(report, baseline)
+
+    if args.save:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    regressions = find_regressions(report, baseline, args.tolerance) if baseline else []
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
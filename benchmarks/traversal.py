@@ -0,0 +1,103 @@
+"""
+Time the tree transforms on wide and deep synthetic documents.
+
+Run with `python -m benchmarks.traversal` from the repository root. The deep document nests far
+beyond the interpreter's recursion limit, so it only completes where a transform falls back to
+the explicit-stack traversal.
+
+To compare with another revision, check it out next to this one and put it first on the path,
+for example:
+
+    git worktree add ../cvgen-base <revision>
+    PYTHONPATH=../cvgen-base python benchmarks/traversal.py
+"""
+
+import sys
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+from cvgen.utils.collapse import collapse_keys
+from cvgen.utils.filter_by_tags import _filter_by_tags
+from cvgen.utils.filter_by_verbosity import _filter_by_verbosity
+from cvgen.utils.filter_compound import filter_compound
+from cvgen.utils.unwrap import unwrap_content
+
+LANGS = ["en", "ko", "ja"]
+
+
+def wide_document(sections: int = 40, entries: int = 25, highlights: int = 10) -> Dict[str, Any]:
+    return {
+        "multi_lang_config": {"lang_keys": LANGS, "default_lang": "en"},
+        "sections": {
+            f"section_{s}": [
+                {
+                    "name": {lang: f"Entry {s}.{e} ({lang})" for lang in LANGS},
+                    "date": "2020-01",
+                    "highlights": [
+                        {
+                            "content": {lang: f"Highlight {s}.{e}.{h} ({lang})" for lang in LANGS},
+                            "verbosity": 0.5 * (h % 4 + 1),
+                            "tags": [f"tag{h % 7}", f"tag{(s + e) % 5}"],
+                        }
+                        for h in range(highlights)
+                    ],
+                }
+                for e in range(entries)
+            ]
+            for s in range(sections)
+        },
+    }
+
+
+def deep_document(depth: int) -> Dict[str, Any]:
+    document: Any = {lang: "leaf" for lang in LANGS}
+    for level in range(depth):
+        if level % 2:
+            document = {"content": document, "verbosity": 0.5, "tags": ["deep"]}
+        else:
+            document = {f"level_{level}": document}
+    return {"multi_lang_config": {"lang_keys": LANGS, "default_lang": "en"}, "root": document}
+
+
+Transform = Callable[[Any], Any]
+
+# Each transform runs on the document after its preparation step, which is not timed
+TRANSFORMS: List[Tuple[str, Transform, Transform]] = [
+    (
+        "filter_compound",
+        lambda d: d,
+        lambda d: filter_compound(d, target_verbosity=1.0, exclude_tags=["tag1"]),
+    ),
+    ("_filter_by_verbosity", lambda d: d, lambda d: _filter_by_verbosity(d, target_verbosity=1.0)),
+    ("_filter_by_tags", lambda d: d, lambda d: _filter_by_tags(d, exclude_tags=["tag1"])),
+    ("unwrap_content", lambda d: d, unwrap_content),
+    (
+        "collapse_keys",
+        unwrap_content,
+        lambda d: collapse_keys(d, "multi_lang_config", "lang_keys", "default_lang", "ko"),
+    ),
+]
+
+
+def best_time(prepare: Transform, transform: Transform, document: Any, repeat: int) -> str:
+    try:
+        prepared = prepare(document)
+        best = min(timeit.repeat(lambda: transform(prepared), number=1, repeat=repeat))
+    except RecursionError:
+        return "RecursionError"
+    return f"{best * 1000:9.2f} ms"
+
+
+def main() -> None:
+    documents = [
+        ("wide", wide_document(), 5),
+        ("deep", deep_document(sys.getrecursionlimit() * 10), 3),
+    ]
+    for document_name, document, repeat in documents:
+        for name, prepare, transform in TRANSFORMS:
+            timing = best_time(prepare, transform, document, repeat)
+            print(f"{document_name:>5} {name:<22} {timing:>14}")
+
+
+if __name__ == "__main__":
+    main()
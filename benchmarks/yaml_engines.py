@@ -0,0 +1,30 @@
+"""
+Compare load and dump throughput of every registered YAML engine.
+
+Run with `python -m benchmarks.yaml_engines`. The document is a quarter of the wide synthetic CV
+from the traversal benchmark.
+"""
+
+import timeit
+
+from benchmarks.traversal import wide_document
+from cvgen.yaml_handler import YAML_ENGINES, get_yaml_handler
+
+
+def main() -> None:
+    text = get_yaml_handler("pyyaml-pure").dump_to_string(wide_document(sections=10))
+    size_mb = len(text.encode("utf-8")) / 1e6
+    print(f"document: {size_mb:.2f} MB")
+    for name in YAML_ENGINES:
+        handler = get_yaml_handler(name)
+        data = handler.load_from_string(text)
+        load = min(timeit.repeat(lambda: handler.load_from_string(text), number=1, repeat=3))
+        dump = min(timeit.repeat(lambda: handler.dump_to_string(data), number=1, repeat=3))
+        print(
+            f"{name:<12} load {load * 1000:8.1f} ms ({size_mb / load:6.2f} MB/s)"
+            f"   dump {dump * 1000:8.1f} ms ({size_mb / dump:6.2f} MB/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
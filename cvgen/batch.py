@@ -0,0 +1,167 @@
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+from cvgen.formats import DATA_FORMATS, check_format, transform_data
+from cvgen.output import write_output
+from cvgen.pipeline import Pipeline
+from cvgen.render import default_jobs
+from cvgen.yaml_handler import get_yaml_handler, select_yaml_engine, yaml_engine_name
+
+# File suffixes of each format. Outputs get the first one, except that YAML outputs keep the
+# suffix of a YAML input.
+FORMAT_SUFFIXES: Dict[str, Tuple[str, ...]] = {
+    "yaml": (".yaml", ".yml"),
+    "json": (".json",),
+    "msgpack": (".msgpack",),
+}
+
+
+class BatchResult(BaseModel):
+    input_file: Path
+    output_file: Path
+    error: Optional[str] = Field(default=None, description="Why the file failed, if it did")
+    duration: float = Field(default=0.0, description="Seconds spent transforming this file")
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def batch_input_files(input_dir: Path, input_format: Optional[str] = None) -> List[Path]:
+    """The files of `input_dir` in `input_format`, or in any format, sorted by name."""
+    formats = DATA_FORMATS if input_format is None else (check_format(input_format),)
+    suffixes = {suffix for data_format in formats for suffix in FORMAT_SUFFIXES[data_format]}
+    return sorted(path for path in Path(input_dir).iterdir() if path.suffix in suffixes)
+
+
+def batch_output_file(input_file: Path, out_dir: Path, output_format: str = "yaml") -> Path:
+    suffixes = FORMAT_SUFFIXES[check_format(output_format)]
+    suffix = input_file.suffix if input_file.suffix in suffixes else suffixes[0]
+    return Path(out_dir) / f"{input_file.stem}{suffix}"
+
+
+# The pipeline and formats of a worker process, set once when the worker starts
+_worker: Optional[Tuple[Pipeline, Optional[str], str]] = None
+
+
+def _start_worker(
+    pipeline: Pipeline, input_format: Optional[str], output_format: str, yaml_engine: str
+) -> None:
+    global _worker
+    _worker = (pipeline, input_format, output_format)
+    select_yaml_engine(yaml_engine)
+
+
+def _transform_source(source: bytes) -> Tuple[Optional[bytes], Optional[str], float]:
+    """Transform one file in a worker. Failures are returned, never raised."""
+    pipeline, input_format, output_format = _worker
+    start = time.perf_counter()
+    try:
+        output = transform_data(
+            source, pipeline.run, input_format, output_format, get_yaml_handler()
+        )
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", time.perf_counter() - start
+    return output, None, time.perf_counter() - start
+
+
+def _error(future: Future) -> Optional[str]:
+    try:
+        future.result()
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def run_batch(
+    input_files: Sequence[Path],
+    out_dir: Path,
+    pipeline: Pipeline,
+    jobs: Optional[int] = None,
+    input_format: Optional[str] = None,
+    output_format: str = "yaml",
+) -> List[BatchResult]:
+    """
+    Run `pipeline` on every file, writing each output to `out_dir` under the name of its input.
+
+    Parsing and transforming are spread over `jobs` worker processes, which each get the pipeline
+    once when they start, so the cost of starting an interpreter is paid once per worker instead
+    of once per file. Files are read and written by threads in this process while the workers
+    run. A file that fails does not stop the others. Results are returned in the order of
+    `input_files`.
+    """
+    if jobs is None:
+        jobs = default_jobs()
+    if jobs < 1:
+        raise ValueError("jobs must be at least 1")
+    input_files = [Path(f) for f in input_files]
+    output_files = [batch_output_file(f, out_dir, output_format) for f in input_files]
+    inputs_by_output: Dict[Path, Path] = {}
+    for input_file, output_file in zip(input_files, output_files):
+        other = inputs_by_output.setdefault(output_file, input_file)
+        if other != input_file:
+            raise ValueError(f"Both {other} and {input_file} would be written to {output_file}")
+    resolved_inputs = {f.resolve() for f in input_files}
+    if any(output_file.resolve() in resolved_inputs for output_file in output_files):
+        raise ValueError(f"Writing the outputs to {out_dir} would overwrite input files")
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+    workers = min(jobs, max(len(input_files), 1))
+    with (
+        ThreadPoolExecutor(max_workers=workers) as files,
+        ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_start_worker,
+            initargs=(pipeline, input_format, output_format, yaml_engine_name()),
+        ) as pool,
+    ):
+        reads = [files.submit(Path.read_bytes, f) for f in input_files]
+        transforms: List[Optional[Future]] = []
+        errors: List[Optional[str]] = []
+        for read in reads:
+            error = _error(read)
+            transforms.append(None if error else pool.submit(_transform_source, read.result()))
+            errors.append(error)
+        # Each source is only needed until its transform is submitted
+        del reads
+
+        results = []
+        writes: List[Optional[Future]] = []
+        for input_file, output_file, transform, error in zip(
+            input_files, output_files, transforms, errors
+        ):
+            output, duration, write = None, 0.0, None
+            if transform is not None:
+                error = _error(transform)
+                if error is None:
+                    output, error, duration = transform.result()
+            if output is not None:
+                write = files.submit(write_output, output_file, output)
+            writes.append(write)
+            results.append(
+                BatchResult(
+                    input_file=input_file, output_file=output_file, error=error, duration=duration
+                )
+            )
+        for result, write in zip(results, writes):
+            if write is not None:
+                result.error = _error(write)
+    return results
+
+
+def format_summary(results: Sequence[BatchResult], elapsed: float) -> str:
+    lines = []
+    for result in results:
+        status = "ok" if result.ok else "FAILED"
+        lines.append(f"{status:<6} {result.duration:7.2f}s  {result.input_file}")
+    succeeded = sum(result.ok for result in results)
+    total = sum(result.duration for result in results)
+    lines.append(
+        f"Processed {succeeded}/{len(results)} files in {elapsed:.2f}s "
+        f"({total:.2f}s if run one at a time)"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,144 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from cvgen.config import CollapseConfig, FilterConfig
+from cvgen.profiling import profiled
+from cvgen.utils.collapse import collapse_all_keys
+from cvgen.utils.filter_compound import filter_compound
+from cvgen.yaml_handler import YAMLHandler
+
+
+class TagSet(BaseModel):
+    include_tags: Optional[List[str]] = Field(default=None, description="List of tags to include")
+    exclude_tags: Optional[List[str]] = Field(default=None, description="List of tags to exclude")
+    include_mode: str = Field(default="any", description="Mode for including tags")
+    exclude_mode: str = Field(default="any", description="Mode for excluding tags")
+    tag_expr: Optional[str] = Field(default=None, description="Boolean tag expression to filter by")
+
+
+class BuildManifest(BaseModel):
+    source: Optional[Path] = Field(
+        default=None, description="Path to the source YAML file, relative to the manifest"
+    )
+    out_dir: Path = Field(
+        default=Path("."), description="Directory for the outputs, relative to the manifest"
+    )
+    output_template: str = Field(
+        default="cv_{lang}_{verbosity}_{tags}.yaml",
+        description="File name for each output, formatted with lang, verbosity and tags",
+    )
+    languages: List[str] = Field(description="Languages to collapse each variant into")
+    verbosity: List[float] = Field(default=[1.0], description="Target verbosity levels")
+    tag_sets: Dict[str, TagSet] = Field(
+        default_factory=lambda: {"all": TagSet()}, description="Named tag filters"
+    )
+    filter: FilterConfig = Field(
+        default_factory=FilterConfig,
+        description="Key names for filtering; verbosity and tags come from the matrix",
+    )
+    collapse: CollapseConfig = Field(
+        default_factory=CollapseConfig,
+        description="Key names for collapsing; the language comes from the matrix",
+    )
+
+
+class BuildTarget(BaseModel):
+    lang: str
+    output_file: Path
+    collapse_config: CollapseConfig
+
+
+class FilterStage(BaseModel):
+    filter_config: FilterConfig
+    targets: List[BuildTarget]
+
+
+def load_manifest(yaml_handler: YAMLHandler, manifest_file: Path) -> BuildManifest:
+    manifest = BuildManifest(**yaml_handler.load_from_file(manifest_file))
+    base_dir = manifest_file.parent
+    if manifest.source is not None:
+        manifest.source = base_dir / manifest.source
+    manifest.out_dir = base_dir / manifest.out_dir
+    return manifest
+
+
+def resolve_manifest(
+    yaml_handler: YAMLHandler,
+    manifest_file: Optional[Path],
+    input_file: Optional[Path],
+    langs: Optional[List[str]],
+    target_verbosity: Optional[List[float]],
+    include_tags: Optional[List[str]],
+    exclude_tags: Optional[List[str]],
+    tag_expr: Optional[str],
+    out_dir: Optional[Path],
+) -> BuildManifest:
+    if manifest_file is not None:
+        manifest = load_manifest(yaml_handler, manifest_file)
+    elif langs:
+        manifest = BuildManifest(languages=langs)
+    else:
+        raise ValueError("Provide a manifest file or at least one --lang")
+
+    if input_file is not None:
+        manifest.source = input_file
+    if langs:
+        manifest.languages = langs
+    if target_verbosity:
+        manifest.verbosity = target_verbosity
+    if include_tags is not None or exclude_tags is not None or tag_expr is not None:
+        manifest.tag_sets = {
+            "all": TagSet(include_tags=include_tags, exclude_tags=exclude_tags, tag_expr=tag_expr)
+        }
+    if out_dir is not None:
+        manifest.out_dir = out_dir
+    return manifest
+
+
+def plan_build(manifest: BuildManifest) -> List[FilterStage]:
+    """
+    Expand the variant matrix into filter stages, each shared by all languages of a
+    (verbosity, tag set) pair, so that every filter result is computed once and only collapsed
+    per language.
+    """
+    stages = []
+    for verbosity in manifest.verbosity:
+        for tags_name, tag_set in manifest.tag_sets.items():
+            filter_config = manifest.filter.model_copy(
+                update={"target_verbosity": verbosity, **tag_set.model_dump()}
+            )
+            targets = [
+                BuildTarget(
+                    lang=lang,
+                    output_file=manifest.out_dir
+                    / manifest.output_template.format(
+                        lang=lang, verbosity=f"{verbosity:g}", tags=tags_name
+                    ),
+                    collapse_config=manifest.collapse.model_copy(update={"user_key": lang}),
+                )
+                for lang in manifest.languages
+            ]
+            stages.append(FilterStage(filter_config=filter_config, targets=targets))
+    return stages
+
+
+def run_build(data: Dict[str, Any], stages: List[FilterStage]) -> Dict[Path, Any]:
+    outputs = {}
+    for stage in stages:
+        if not stage.targets:
+            continue
+        filtered = profiled("filter", filter_compound, data, **stage.filter_config.model_dump())
+        # All languages are collapsed in one traversal, sharing the parts that do not differ
+        collapse_config = stage.targets[0].collapse_config.model_dump(exclude={"user_key"})
+        collapsed = profiled(
+            "collapse",
+            collapse_all_keys,
+            filtered,
+            user_keys=[target.lang for target in stage.targets],
+            **collapse_config,
+        )
+        for target in stage.targets:
+            outputs[target.output_file] = collapsed[target.lang]
+    return outputs
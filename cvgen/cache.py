@@ -0,0 +1,92 @@
+import hashlib
+import os
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel
+
+from cvgen.yaml_handler import yaml_engine_name
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+MAX_BYTES_ENV = "CVGEN_CACHE_MAX_BYTES"
+
+# The distribution behind each built-in YAML engine, whose version can change the output
+ENGINE_DISTRIBUTIONS = {"pyyaml": "PyYAML", "pyyaml-pure": "PyYAML", "ruamel": "ruamel.yaml"}
+
+
+def cvgen_version() -> str:
+    return _version("cvgen")
+
+
+def _version(distribution: str) -> str:
+    try:
+        return version(distribution)
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def yaml_engine_version() -> str:
+    """The YAML engine in use and the version of its library, which both decide the output."""
+    engine = yaml_engine_name()
+    distribution = ENGINE_DISTRIBUTIONS.get(engine)
+    return f"{engine} {_version(distribution) if distribution else 'unknown'}"
+
+
+class ResultCache:
+    """
+    On-disk cache of serialized outputs, keyed by what the output depends on.
+
+    Each entry is one file named after its key. Reading an entry refreshes its modification time,
+    and entries with the oldest times are evicted first once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, directory: Path, max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get(MAX_BYTES_ENV, DEFAULT_MAX_BYTES))
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def key(self, command: str, source: bytes, config: BaseModel) -> str:
+        digest = hashlib.sha256()
+        for part in (cvgen_version(), yaml_engine_version(), command, config.model_dump_json()):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(source)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.bin"
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            content = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        # Written under a temporary name first, so a concurrent reader never sees half an entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.bin"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -1,63 +1,55 @@
+import json
+import shlex
 import sys
+import textwrap
+import time
+import warnings
+from contextlib import nullcontext
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import IO, Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional
 
 import typer
-import yaml
-from deepdiff import DeepDiff
 from pydantic import BaseModel, Field
 
-from cvgen.utils.collapse import collapse_keys
-from cvgen.utils.filter_compound import filter_compound
-from cvgen.yaml_handler import get_yaml_handler
-
-
-class CollapseConfig(BaseModel):
-    config_key: str = Field(
-        default="multi_lang_config",
-        description="Name of the key that contains the collapsing configuration",
-    )
-    keys_key: str = Field(
-        default="lang_keys",
-        description="Name of the key within the config that specifies the collapsible keys",
-    )
-    default_key: str = Field(
-        default="default_lang",
-        description="Name of the key within the config that specifies the default key to use",
-    )
-    user_key: Optional[str] = Field(
-        default=None,
-        description="Name of the key within the config that specifies the user's selected language",
-    )
-
-
-class FilterConfig(BaseModel):
-    config_key: str = Field(
-        default="filter_config",
-        description="Name of the key that contains the filtering configuration",
-    )
-    content_key: str = Field(
-        default="content", description="Name of the key that contains the content to be filtered"
-    )
-    verbosity_key: str = Field(
-        default="verbosity", description="Name of the key that specifies the verbosity level"
-    )
-    target_verbosity: float = Field(default=1.0, description="Target verbosity level for filtering")
-    tags_key: str = Field(
-        default="tags", description="Name of the key that specifies the tags for filtering"
-    )
-    include_tags: Optional[List[str]] = Field(default=None, description="List of tags to include")
-    exclude_tags: Optional[List[str]] = Field(default=None, description="List of tags to exclude")
-    include_mode: str = Field(default="any", description="Mode for including tags")
-    exclude_mode: str = Field(default="any", description="Mode for excluding tags")
+# Modules that only some commands need are imported inside those commands, so that every run of
+# the CLI does not pay for them at startup (see tests/test_import_time.py)
+from cvgen.config import CollapseConfig, FilterConfig
+from cvgen.formats import (
+    DATA_FORMATS,
+    check_format,
+    is_binary_format,
+    load_data,
+    load_documents,
+    transform_data,
+    transform_documents,
+)
+from cvgen.output import atomic_open, open_output, stdout_pipe, write_data, write_output
+from cvgen.profiling import profiled
+from cvgen.yaml_handler import YAML_ENGINE_ENV, get_yaml_handler, select_yaml_engine
 
 
 class CompareResult(BaseModel):
     is_equal: bool
-    diff: Dict
+    changes: List[Any] = Field(
+        default_factory=list,
+        description="The `Change`s from the first document to the second, in document order",
+    )
+
+    @property
+    def diff(self) -> List[Any]:
+        """Deprecated, the old name of `changes`."""
+        warnings.warn(
+            "CompareResult.diff is deprecated, use CompareResult.changes",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return self.changes
 
 
 def filter_yaml(data: Dict, config: FilterConfig) -> Dict:
+    from cvgen.utils.filter_compound import filter_compound
+
     return filter_compound(
         data=data,
         config_key=config.config_key,
@@ -69,10 +61,13 @@ def filter_yaml(data: Dict, config: FilterConfig) -> Dict:
         exclude_tags=config.exclude_tags,
         include_mode=config.include_mode,
         exclude_mode=config.exclude_mode,
+        tag_expr=config.tag_expr,
     )
 
 
 def collapse_yaml(data: Dict, config: CollapseConfig) -> Dict:
+    from cvgen.utils.collapse import collapse_keys
+
     return collapse_keys(
         data=data,
         config_key=config.config_key,
@@ -83,49 +78,355 @@ def collapse_yaml(data: Dict, config: CollapseConfig) -> Dict:
 
 
 def load_yaml(file_path: str) -> Dict:
-    with open(file_path, "r", encoding="utf-8") as file:
-        return yaml.safe_load(file)
+    return get_yaml_handler().load_from_file(Path(file_path))
 
 
 def compare_yaml_files(file1: Path, file2: Path) -> CompareResult:
-    data1 = load_yaml(str(file1))
-    data2 = load_yaml(str(file2))
-    if data1 == data2:
-        return CompareResult(is_equal=True, diff={})
-    else:
-        diff = DeepDiff(data1, data2, view="tree")
-        return CompareResult(is_equal=False, diff=diff)
+    return compare_yaml_content(load_yaml(str(file1)), load_yaml(str(file2)))
 
 
-def load_yaml_from_file_or_stdin(file_path: Optional[Path]) -> Dict:
-    yaml_handler = get_yaml_handler()
+def load_yaml_from_file_or_stdin(
+    file_path: Optional[Path], input_format: Optional[str] = None
+) -> Dict:
+    return load_data(read_input_bytes(file_path), input_format, get_yaml_handler())
+
+
+def compare_yaml_content(data1: Any, data2: Any, quick: bool = False) -> CompareResult:
+    """
+    Compare two documents by the hashes of their subtrees, listing the changes between them
+    unless `quick` is set. Values of different types differ even when Python finds them equal,
+    such as 1, 1.0 and true.
+    """
+    from cvgen.utils.tree_diff import diff_trees, node_digest, tree_digests
+
+    digests1 = tree_digests(data1)
+    digests2 = tree_digests(data2)
+    if node_digest(data1, digests1) == node_digest(data2, digests2):
+        return CompareResult(is_equal=True)
+    if quick:
+        return CompareResult(is_equal=False)
+    return CompareResult(is_equal=False, changes=diff_trees(data1, data2, digests1, digests2))
+
+
+def validate_format(value: Optional[str]) -> Optional[str]:
+    try:
+        return value and check_format(value)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+
+def read_input_bytes(file_path: Optional[Path]) -> bytes:
     if file_path is None or str(file_path) == "-":
-        return yaml_handler.load_from_string(sys.stdin.read())
-    else:
-        return yaml_handler.load_from_file(file_path)
+        return sys.stdin.buffer.read()
+    return file_path.read_bytes()
 
 
-def compare_yaml_content(data1: Dict, data2: Dict) -> CompareResult:
-    if data1 == data2:
-        return CompareResult(is_equal=True, diff={})
-    else:
-        diff = DeepDiff(data1, data2, view="tree")
-        return CompareResult(is_equal=False, diff=diff)
+def open_input(file_path: Optional[Path]) -> ContextManager[IO[bytes]]:
+    if file_path is None or str(file_path) == "-":
+        return nullcontext(sys.stdin.buffer)
+    return open(file_path, "rb")
+
+
+# The end of the documents of a stream
+_END = object()
 
 
-def output_yaml(processed_dict: Dict, output_file: Optional[Path]):
+def compare_documents(
+    documents1: Iterator[Any], documents2: Iterator[Any], quick: bool = False
+) -> Iterator[CompareResult]:
+    """
+    Compare two streams of documents pair by pair, reading one pair at a time. A document that
+    only one of the streams has is compared with null.
+    """
+    while True:
+        data1 = next(documents1, _END)
+        data2 = next(documents2, _END)
+        if data1 is _END and data2 is _END:
+            return
+        yield compare_yaml_content(
+            None if data1 is _END else data1, None if data2 is _END else data2, quick
+        )
+
+
+REPORT_FORMATS = ("text", "json")
+
+
+def validate_report_format(value: str) -> str:
+    if value not in REPORT_FORMATS:
+        raise typer.BadParameter(f"Use one of: {', '.join(REPORT_FORMATS)}")
+    return value
+
+
+def echo_changes(result: CompareResult) -> None:
+    from cvgen.utils.tree_diff import format_change
+
+    for change in result.changes:
+        typer.echo(format_change(change))
+
+
+def explaining() -> bool:
+    from cvgen.explain import active_tracer
+
+    return active_tracer() is not None
+
+
+def process_yaml(
+    command: str,
+    input_file: Optional[Path],
+    config: BaseModel,
+    transform: Callable[[Any], Any],
+    output_file: Optional[Path],
+    cache_dir: Optional[Path],
+    input_format: Optional[str] = None,
+    output_format: str = "yaml",
+) -> None:
+    """
+    Load, transform and output each document of a YAML stream, one document at a time. With a
+    cache directory, an unchanged input processed with the same config is answered from the cache
+    without parsing it. A cached output would have nothing to explain, so the cache is not used
+    with --explain.
+    """
     yaml_handler = get_yaml_handler()
-    processed_yaml = yaml_handler.dump_to_string(processed_dict)
+    if cache_dir is None or explaining():
+        # Nothing else needs the serialized output, so it is streamed straight out
+        with open_input(input_file) as source:
+            documents = load_documents(source, input_format, yaml_handler)
+            with open_output(output_file, output_format) as stream:
+                transform_documents(documents, transform, output_format, yaml_handler, stream)
+        if output_file:
+            typer.echo(f"Processed YAML has been written to {output_file}")
+        return
+
+    from cvgen.cache import ResultCache
+
+    source = read_input_bytes(input_file)
+    cache = ResultCache(cache_dir)
+    key = cache.key(f"{command}:{input_format or 'auto'}:{output_format}", source, config)
+    processed = profiled("cache", cache.get, key)
+
+    if processed is None:
+        processed = transform_data(source, transform, input_format, output_format, yaml_handler)
+        cache.put(key, processed)
+
     if output_file:
-        yaml_handler.dump_to_file(processed_dict, output_file)
+        write_output(output_file, processed)
         typer.echo(f"Processed YAML has been written to {output_file}")
+    elif is_binary_format(output_format):
+        sys.stdout.buffer.write(processed)
+        sys.stdout.buffer.flush()
     else:
-        typer.echo(processed_yaml)
+        # Cached YAML is echoed like freshly serialized YAML, with an extra newline
+        typer.echo(processed.decode("utf-8"), nl=output_format == "yaml")
+
+
+def stream_yaml(
+    input_file: Optional[Path],
+    transform_events: Callable[[Iterable[Any]], Iterator[Any]],
+    output_file: Optional[Path],
+    cache_dir: Optional[Path],
+    input_format: Optional[str] = None,
+    output_format: str = "yaml",
+) -> None:
+    """
+    Transform a YAML document as a stream of parse events (see `cvgen.streaming`), writing the
+    output while the input is still being read instead of holding the whole document in memory.
+    """
+    from cvgen.streaming import emit_events, parse_events
+
+    if cache_dir is not None or input_format not in (None, "yaml") or output_format != "yaml":
+        raise ValueError("--stream reads and writes YAML and cannot be used with --cache-dir")
+    if explaining():
+        raise ValueError("--explain cannot be used with --stream")
+
+    with open_input(input_file) as source:
+        events = transform_events(parse_events(source))
+        if output_file:
+            with atomic_open(output_file) as file:
+                profiled("stream", emit_events, events, file)
+            typer.echo(f"Processed YAML has been written to {output_file}")
+            return
+        with stdout_pipe():
+            profiled("stream", emit_events, events, sys.stdout)
+            # Matches the trailing newline of the YAML written without --stream
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+
+
+def check_batch_options(
+    input_file: Optional[Path], output_file: Optional[Path], cache_dir: Optional[Path], stream: bool
+) -> None:
+    if input_file is not None or output_file is not None or cache_dir is not None or stream:
+        raise ValueError(
+            "--batch cannot be combined with an input file, --output-file, --cache-dir or --stream"
+        )
+
+
+def process_batch(
+    batch_dir: Path,
+    out_dir: Optional[Path],
+    stages: List[BaseModel],
+    jobs: Optional[int],
+    input_format: Optional[str] = None,
+    output_format: str = "yaml",
+) -> bool:
+    """Run the stages on every file of `batch_dir` and report how each file went."""
+    from cvgen.batch import batch_input_files, format_summary, run_batch
+    from cvgen.pipeline import Pipeline
+
+    if out_dir is None:
+        raise ValueError("--batch needs --out-dir")
+    if explaining():
+        raise ValueError(
+            "--explain cannot be used with --batch, whose files are processed in other processes"
+        )
+    start = time.perf_counter()
+    input_files = batch_input_files(batch_dir, input_format)
+    results = profiled(
+        "batch",
+        run_batch,
+        input_files,
+        out_dir,
+        Pipeline(stages),
+        jobs,
+        input_format,
+        output_format,
+    )
+    for result in results:
+        if not result.ok:
+            typer.echo(f"Processing {result.input_file} failed: {result.error}", err=True)
+    typer.echo(format_summary(results, time.perf_counter() - start))
+    return all(result.ok for result in results)
+
+
+def lang_output_file(output_file: Path, lang: str) -> Path:
+    """The output file for one language: `{lang}` in the name is replaced, or `_<lang>` added."""
+    if "{lang}" in output_file.name:
+        return output_file.with_name(output_file.name.replace("{lang}", lang))
+    return output_file.with_name(f"{output_file.stem}_{lang}{output_file.suffix}")
+
+
+def collapse_all_langs(
+    input_file: Optional[Path],
+    config: CollapseConfig,
+    output_file: Optional[Path],
+    input_format: Optional[str] = None,
+    output_format: str = "yaml",
+) -> None:
+    """Collapse a document into every language of its config in one pass, one file each."""
+    from cvgen.utils.collapse import collapse_all_keys
+
+    if output_file is None:
+        raise ValueError("--all-langs writes one file per language and needs --output-file")
+    yaml_handler = get_yaml_handler()
+    data = profiled("parse", load_data, read_input_bytes(input_file), input_format, yaml_handler)
+    outputs = profiled(
+        "collapse",
+        collapse_all_keys,
+        data,
+        config.config_key,
+        config.keys_key,
+        config.default_key,
+    )
+    if not outputs:
+        raise ValueError(f"No languages found under {config.config_key}.{config.keys_key}")
+    for lang, collapsed in outputs.items():
+        lang_file = lang_output_file(output_file, str(lang))
+        profiled("dump", write_data, yaml_handler, collapsed, lang_file, output_format)
+        typer.echo(f"Processed YAML has been written to {lang_file}")
+
+
+def parse_stage(spec: str) -> BaseModel:
+    """
+    Parse a stage given as a command line of the command that runs it on its own, such as
+    "filter --target-verbosity 2 --exclude-tags detail" or "collapse -k ko".
+    """
+    from cvgen.pipeline import STAGE_CONFIGS
+
+    name, *args = shlex.split(spec) or [""]
+    if name not in STAGE_CONFIGS:
+        raise ValueError(f"Unknown stage '{name}'. Use one of: {', '.join(STAGE_CONFIGS)}")
+    command = typer.main.get_command(app).commands[name]
+    with command.make_context(name, args) as ctx:
+        params = ctx.params
+    if any(params.get(name) is not None for name in ("input_file", "output_file", "batch")):
+        raise ValueError(f"Stage '{spec}' cannot name files; pass them to 'run' instead")
+    config_class = STAGE_CONFIGS[name]
+    # Typer only turns an unset list option into None when it calls the command itself, and an
+    # empty include list would drop every tagged node
+    return config_class(
+        **{
+            key: None if isinstance(params[key], (list, tuple)) and not params[key] else params[key]
+            for key in config_class.model_fields
+        }
+    )
+
+
+def render_outputs(input_files: List[Path], jobs: Optional[int]) -> bool:
+    from cvgen.render import format_summary, render_files
+
+    start = time.perf_counter()
+    results = profiled("render", render_files, input_files, jobs)
+    for result in results:
+        if not result.ok:
+            typer.echo(f"Rendering {result.input_file} failed:\n{result.output}", err=True)
+    typer.echo(format_summary(results, time.perf_counter() - start))
+    return all(result.ok for result in results)
 
 
 app = typer.Typer()
 
 
+@app.callback()
+def main(
+    ctx: typer.Context,
+    yaml_engine: Optional[str] = typer.Option(
+        None,
+        "--yaml-engine",
+        envvar=YAML_ENGINE_ENV,
+        help="YAML library to read and write with: pyyaml, pyyaml-pure or ruamel",
+    ),
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        envvar="CVGEN_PROFILE",
+        help="Print time, node counts and memory per stage to stderr as JSON",
+    ),
+    profile_top: int = typer.Option(
+        0,
+        "--profile-top",
+        envvar="CVGEN_PROFILE_TOP",
+        help="Add the N functions with the most cumulative time according to cProfile",
+    ),
+    explain: bool = typer.Option(
+        False,
+        "--explain",
+        help="Write why each node was kept, dropped or collapsed to stderr as JSON lines",
+    ),
+    explain_file: Optional[Path] = typer.Option(
+        None, "--explain-file", help="Write the --explain trace to this file instead of stderr"
+    ),
+):
+    try:
+        select_yaml_engine(yaml_engine)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--yaml-engine")
+    if profile or profile_top:
+        from cvgen.profiling import start_profiling, stop_profiling
+
+        start_profiling(profile_top)
+        ctx.call_on_close(lambda: stop_profiling(ctx.invoked_subcommand))
+    if explain or explain_file is not None:
+        from cvgen.explain import start_explaining, stop_explaining
+
+        stream = None
+        if explain_file is not None:
+            stream = explain_file.open("w", encoding="utf-8")
+            ctx.call_on_close(stream.close)
+        start_explaining(stream)
+        # Runs before the file is closed, as close callbacks run last first
+        ctx.call_on_close(stop_explaining)
+
+
 @app.command("filter")
 def filter_command(
     input_file: Optional[Path] = typer.Argument(
@@ -148,13 +449,54 @@ def filter_command(
     exclude_tags: Optional[List[str]] = typer.Option(None, help="List of tags to exclude"),
     include_mode: str = typer.Option("any", help="Mode for including tags"),
     exclude_mode: str = typer.Option("any", help="Mode for excluding tags"),
+    tag_expr: Optional[str] = typer.Option(
+        None,
+        help="Boolean tag expression to filter by, e.g. '(backend & !intern) | leadership'",
+    ),
     output_file: Optional[Path] = typer.Option(
         None, "--output-file", "-o", help="Path to the output YAML file"
     ),
+    cache_dir: Optional[Path] = typer.Option(
+        None,
+        "--cache-dir",
+        envvar="CVGEN_CACHE_DIR",
+        help="Directory for caching results of unchanged inputs",
+    ),
+    stream: bool = typer.Option(
+        False,
+        "--stream",
+        help="Process the YAML as a stream of events, writing the output as the input is read, "
+        "so that documents larger than memory can be processed",
+    ),
+    batch: Optional[Path] = typer.Option(
+        None,
+        "--batch",
+        help="Process every YAML, JSON or MessagePack file of this directory, in worker processes",
+    ),
+    out_dir: Optional[Path] = typer.Option(
+        None, "--out-dir", help="Directory for the outputs of --batch, named after their inputs"
+    ),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        help="Number of files of --batch to process at the same time [default: number of CPUs]",
+    ),
+    input_format: Optional[str] = typer.Option(
+        None,
+        help=f"Format of the input: {', '.join(DATA_FORMATS)} (detected if not given)",
+        callback=validate_format,
+    ),
+    output_format: str = typer.Option(
+        "yaml",
+        help=f"Format of the output: {', '.join(DATA_FORMATS)}",
+        callback=validate_format,
+    ),
 ):
     """
     Filter YAML content based on verbosity levels and tags.
     """
+    processed = True
     try:
         filter_config = FilterConfig(
             config_key=config_key,
@@ -166,15 +508,42 @@ def filter_command(
             exclude_tags=exclude_tags,
             include_mode=include_mode,
             exclude_mode=exclude_mode,
+            tag_expr=tag_expr,
         )
 
-        data = load_yaml_from_file_or_stdin(input_file)
-        processed_dict = filter_compound(data, **filter_config.dict())
-        output_yaml(processed_dict, output_file)
+        if batch is not None:
+            check_batch_options(input_file, output_file, cache_dir, stream)
+            processed = process_batch(
+                batch, out_dir, [filter_config], jobs, input_format, output_format
+            )
+        elif stream:
+            from cvgen.streaming import filter_events
+
+            stream_yaml(
+                input_file,
+                lambda events: filter_events(events, filter_config),
+                output_file,
+                cache_dir,
+                input_format,
+                output_format,
+            )
+        else:
+            process_yaml(
+                "filter",
+                input_file,
+                filter_config,
+                lambda data: profiled("filter", filter_yaml, data, filter_config),
+                output_file,
+                cache_dir,
+                input_format,
+                output_format,
+            )
 
     except Exception as e:
         typer.echo(f"An error occurred: {str(e)}", err=True)
         raise typer.Exit(code=1)
+    if not processed:
+        raise typer.Exit(code=1)
 
 
 @app.command("collapse")
@@ -198,25 +567,103 @@ def collapse_command(
         "-k",
         help="Name of the key within the config that specifies the user's selected language",
     ),
+    all_langs: bool = typer.Option(
+        False,
+        "--all-langs",
+        help="Collapse into every language of the config in one pass, writing one file per "
+        "language: the output file name with '{lang}' replaced, or with '_<lang>' added",
+    ),
     output_file: Optional[Path] = typer.Option(
         None, "--output-file", "-o", help="Path to the output YAML file"
     ),
+    cache_dir: Optional[Path] = typer.Option(
+        None,
+        "--cache-dir",
+        envvar="CVGEN_CACHE_DIR",
+        help="Directory for caching results of unchanged inputs",
+    ),
+    stream: bool = typer.Option(
+        False,
+        "--stream",
+        help="Process the YAML as a stream of events, writing the output as the input is read, "
+        "so that documents larger than memory can be processed",
+    ),
+    batch: Optional[Path] = typer.Option(
+        None,
+        "--batch",
+        help="Process every YAML, JSON or MessagePack file of this directory, in worker processes",
+    ),
+    out_dir: Optional[Path] = typer.Option(
+        None, "--out-dir", help="Directory for the outputs of --batch, named after their inputs"
+    ),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        help="Number of files of --batch to process at the same time [default: number of CPUs]",
+    ),
+    input_format: Optional[str] = typer.Option(
+        None,
+        help=f"Format of the input: {', '.join(DATA_FORMATS)} (detected if not given)",
+        callback=validate_format,
+    ),
+    output_format: str = typer.Option(
+        "yaml",
+        help=f"Format of the output: {', '.join(DATA_FORMATS)}",
+        callback=validate_format,
+    ),
 ):
     """
     Collapse multi-language keys in YAML content.
     """
+    processed = True
     try:
         collapse_config = CollapseConfig(
             config_key=config_key, keys_key=keys_key, default_key=default_key, user_key=user_key
         )
 
-        data = load_yaml_from_file_or_stdin(input_file)
-        processed_dict = collapse_keys(data, **collapse_config.dict())
-        output_yaml(processed_dict, output_file)
+        if all_langs:
+            if user_key is not None or cache_dir is not None or stream or batch is not None:
+                raise ValueError(
+                    "--all-langs cannot be combined with --user-key, --cache-dir, --stream or "
+                    "--batch"
+                )
+            collapse_all_langs(
+                input_file, collapse_config, output_file, input_format, output_format
+            )
+        elif batch is not None:
+            check_batch_options(input_file, output_file, cache_dir, stream)
+            processed = process_batch(
+                batch, out_dir, [collapse_config], jobs, input_format, output_format
+            )
+        elif stream:
+            from cvgen.streaming import collapse_events
+
+            stream_yaml(
+                input_file,
+                lambda events: collapse_events(events, collapse_config),
+                output_file,
+                cache_dir,
+                input_format,
+                output_format,
+            )
+        else:
+            process_yaml(
+                "collapse",
+                input_file,
+                collapse_config,
+                lambda data: profiled("collapse", collapse_yaml, data, collapse_config),
+                output_file,
+                cache_dir,
+                input_format,
+                output_format,
+            )
 
     except Exception as e:
         typer.echo(f"An error occurred: {str(e)}", err=True)
         raise typer.Exit(code=1)
+    if not processed:
+        raise typer.Exit(code=1)
 
 
 @app.command("compare")
@@ -225,22 +672,473 @@ def compare_command(
         None, help="Path to the source YAML file (or use stdin if not provided or '-')"
     ),
     to: Path = typer.Option(..., help="Path to the target YAML file to compare against"),
+    report_format: str = typer.Option(
+        "text",
+        "--format",
+        help=f"Format of the report: {', '.join(REPORT_FORMATS)}. JSON writes one line per "
+        "document, with the changes by path",
+        callback=validate_report_format,
+    ),
+    quick: bool = typer.Option(
+        False,
+        "--quick",
+        help="Only tell whether the contents are identical: print nothing, and exit with 0 if "
+        "they are, 1 if they are not and 2 on errors",
+    ),
 ):
     """
     Compare two YAML files or compare YAML from stdin/file with another file.
     If 'from_file' is not provided or is '-', input will be read from stdin.
     The 'to' option specifies the file to compare against.
+    Multi-document streams are compared document by document.
+    Changes are listed by the path of the node that changed.
+    Values of different types are different, so 1, 1.0 and true do not match.
+    """
+    is_equal = True
+    try:
+        yaml_handler = get_yaml_handler()
+        with open_input(from_file) as source1, open_input(to) as source2, stdout_pipe():
+            results = compare_documents(
+                load_documents(source1, None, yaml_handler),
+                load_documents(source2, None, yaml_handler),
+                quick,
+            )
+            if quick:
+                # Stops reading at the first difference
+                is_equal = all(result.is_equal for result in results)
+            elif report_format == "json":
+                for number, result in enumerate(results, 1):
+                    report = {
+                        "document": number,
+                        "is_equal": result.is_equal,
+                        "changes": [change.to_dict() for change in result.changes],
+                    }
+                    typer.echo(json.dumps(report, ensure_ascii=False, default=str))
+            else:
+                first = next(results)
+                second = next(results, None)
+                if second is None:
+                    if first.is_equal:
+                        typer.echo("The YAML contents are identical.")
+                    else:
+                        typer.echo("The YAML contents are different:")
+                        echo_changes(first)
+                    return
+
+                for number, result in enumerate(chain([first, second], results), 1):
+                    if result.is_equal:
+                        continue
+                    if is_equal:
+                        typer.echo("The YAML contents are different:")
+                        is_equal = False
+                    typer.echo(f"Document {number}:")
+                    echo_changes(result)
+                if is_equal:
+                    typer.echo("The YAML contents are identical.")
+    except Exception as e:
+        typer.echo(f"An error occurred: {str(e)}", err=True)
+        raise typer.Exit(code=2 if quick else 1)
+    if quick and not is_equal:
+        raise typer.Exit(code=1)
+
+
+@app.command("tags")
+def tags_command(
+    input_file: Optional[Path] = typer.Argument(
+        None, help="Path to the input YAML file (or use stdin if not provided or '-')"
+    ),
+    config_key: str = typer.Option(
+        "filter_config", help="Name of the key that contains the filtering configuration"
+    ),
+    content_key: str = typer.Option(
+        "content", help="Name of the key that contains the content to be filtered"
+    ),
+    verbosity_key: str = typer.Option(
+        "verbosity", help="Name of the key that specifies the verbosity level"
+    ),
+    tags_key: str = typer.Option(
+        "tags", help="Name of the key that specifies the tags for filtering"
+    ),
+    paths: bool = typer.Option(
+        False, "--paths", help="List the path of every node under its tag and verbosity level"
+    ),
+    report_format: str = typer.Option(
+        "text",
+        "--format",
+        help=f"Format of the report: {', '.join(REPORT_FORMATS)}. JSON writes one line per "
+        "document",
+        callback=validate_report_format,
+    ),
+    input_format: Optional[str] = typer.Option(
+        None,
+        help=f"Format of the input: {', '.join(DATA_FORMATS)} (detected if not given)",
+        callback=validate_format,
+    ),
+):
+    """
+    Report the tags of a YAML source, the tags used together and the number of nodes at each
+    verbosity level, to choose the tags and verbosity to filter by.
+    Multi-document streams are reported document by document.
+    """
+    from cvgen.utils.tag_index import build_tag_index, format_tag_stats
+
+    def report(data: Any, number: int, numbered: bool) -> None:
+        index = profiled(
+            "index", build_tag_index, data, config_key, content_key, verbosity_key, tags_key
+        )
+        if report_format == "json":
+            line = {"document": number, **index.to_dict(paths)}
+            typer.echo(json.dumps(line, ensure_ascii=False, default=str))
+        else:
+            if numbered:
+                typer.echo(f"Document {number}:")
+            typer.echo(format_tag_stats(index, paths))
+
+    try:
+        yaml_handler = get_yaml_handler()
+        with open_input(input_file) as source, stdout_pipe():
+            documents = load_documents(source, input_format, yaml_handler)
+            first = next(documents, None)
+            second = next(documents, _END)
+            if second is _END:
+                report(first, 1, False)
+            else:
+                for number, data in enumerate(chain([first, second], documents), 1):
+                    report(data, number, True)
+    except Exception as e:
+        typer.echo(f"An error occurred: {str(e)}", err=True)
+        raise typer.Exit(code=1)
+
+
+@app.command("build")
+def build_command(
+    manifest_file: Optional[Path] = typer.Argument(
+        None, help="Path to the build manifest YAML file describing the variant matrix"
+    ),
+    input_file: Optional[Path] = typer.Option(
+        None, "--input-file", "-i", help="Path to the source YAML file (overrides the manifest)"
+    ),
+    langs: Optional[List[str]] = typer.Option(
+        None, "--lang", "-k", help="Language to collapse into (overrides the manifest)"
+    ),
+    target_verbosity: Optional[List[float]] = typer.Option(
+        None, help="Target verbosity level for filtering (overrides the manifest)"
+    ),
+    include_tags: Optional[List[str]] = typer.Option(None, help="List of tags to include"),
+    exclude_tags: Optional[List[str]] = typer.Option(None, help="List of tags to exclude"),
+    tag_expr: Optional[str] = typer.Option(None, help="Boolean tag expression to filter by"),
+    out_dir: Optional[Path] = typer.Option(
+        None, "--out-dir", help="Directory for the outputs (overrides the manifest)"
+    ),
+    render: bool = typer.Option(False, "--render", help="Render every output with rendercv"),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        help="Number of renders to run at the same time [default: number of CPUs]",
+    ),
+):
     """
+    Build every (language, verbosity, tag set) variant of a YAML source in one process.
+    The source is parsed once, filtered once per verbosity and tag set, and then collapsed
+    into each language.
+    """
+    from cvgen.build import plan_build, resolve_manifest, run_build
+
     try:
-        data1 = load_yaml_from_file_or_stdin(from_file)
-        data2 = load_yaml_from_file_or_stdin(to)
+        yaml_handler = get_yaml_handler()
+        manifest = resolve_manifest(
+            yaml_handler,
+            manifest_file,
+            input_file,
+            langs,
+            target_verbosity,
+            include_tags,
+            exclude_tags,
+            tag_expr,
+            out_dir,
+        )
+        if manifest.source is None:
+            raise ValueError("No source file given in the manifest or with --input-file")
+
+        data = profiled("parse", yaml_handler.load_from_file, manifest.source)
+        outputs = run_build(data, plan_build(manifest))
+        for output_file, processed_dict in outputs.items():
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            profiled(
+                "dump", lambda data: write_data(yaml_handler, data, output_file), processed_dict
+            )
+            typer.echo(f"Processed YAML has been written to {output_file}")
+
+        rendered = not render or render_outputs(list(outputs), jobs)
+    except Exception as e:
+        typer.echo(f"An error occurred: {str(e)}", err=True)
+        raise typer.Exit(code=1)
+    if not rendered:
+        raise typer.Exit(code=1)
 
-        compare_result = compare_yaml_content(data1, data2)
-        if compare_result.is_equal:
-            typer.echo("The YAML contents are identical.")
+
+@app.command("verify")
+def verify_command(
+    manifest_file: Optional[Path] = typer.Argument(
+        None, help="Path to the build manifest YAML file describing the variant matrix"
+    ),
+    input_file: Optional[Path] = typer.Option(
+        None, "--input-file", "-i", help="Path to the source YAML file (overrides the manifest)"
+    ),
+    langs: Optional[List[str]] = typer.Option(
+        None, "--lang", "-k", help="Language to collapse into (overrides the manifest)"
+    ),
+    target_verbosity: Optional[List[float]] = typer.Option(
+        None, help="Target verbosity level for filtering (overrides the manifest)"
+    ),
+    include_tags: Optional[List[str]] = typer.Option(None, help="List of tags to include"),
+    exclude_tags: Optional[List[str]] = typer.Option(None, help="List of tags to exclude"),
+    tag_expr: Optional[str] = typer.Option(None, help="Boolean tag expression to filter by"),
+    out_dir: Optional[Path] = typer.Option(
+        None, "--out-dir", help="Directory of the stored outputs (overrides the manifest)"
+    ),
+    snapshot_file: Optional[Path] = typer.Option(
+        None,
+        "--snapshot",
+        help="Snapshot manifest of output hashes [default: snapshot.json in the output directory]",
+    ),
+    update: bool = typer.Option(
+        False, "--update", help="Store the generated outputs and their hashes as the snapshot"
+    ),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        help="Number of processes diffing the changed outputs [default: number of CPUs]",
+    ),
+):
+    """
+    Regenerate every variant of a build in memory and check it against the snapshot of stored
+    output hashes. Stored outputs are only loaded and diffed when their hash does not match.
+    Exits with code 1 if any variant changed, is new, or is no longer built.
+    """
+    from cvgen.build import plan_build, resolve_manifest, run_build
+    from cvgen.utils.tree_diff import format_change
+    from cvgen.verify import (
+        DEFAULT_SNAPSHOT_NAME,
+        load_snapshot,
+        update_snapshot,
+        verify_outputs,
+    )
+
+    verified = True
+    try:
+        start = time.perf_counter()
+        yaml_handler = get_yaml_handler()
+        manifest = resolve_manifest(
+            yaml_handler,
+            manifest_file,
+            input_file,
+            langs,
+            target_verbosity,
+            include_tags,
+            exclude_tags,
+            tag_expr,
+            out_dir,
+        )
+        if manifest.source is None:
+            raise ValueError("No source file given in the manifest or with --input-file")
+        if snapshot_file is None:
+            snapshot_file = manifest.out_dir / DEFAULT_SNAPSHOT_NAME
+
+        data = profiled("parse", yaml_handler.load_from_file, manifest.source)
+        outputs = run_build(data, plan_build(manifest))
+        if update:
+            for written in update_snapshot(yaml_handler, outputs, manifest.out_dir, snapshot_file):
+                typer.echo(f"Updated {written}")
+            typer.echo(f"Snapshot of {len(outputs)} variants written to {snapshot_file}")
         else:
-            typer.echo("The YAML contents are different:")
-            typer.echo(compare_result.diff)
+            snapshot = load_snapshot(snapshot_file)
+            results = verify_outputs(yaml_handler, outputs, manifest.out_dir, snapshot, jobs)
+            for result in results:
+                typer.echo(f"{result.status:<8} {result.name}")
+                for change in result.changes:
+                    typer.echo(textwrap.indent(format_change(change), "    "))
+                if result.error:
+                    typer.echo(f"    could not diff the stored output: {result.error}")
+            passed = sum(result.ok for result in results)
+            typer.echo(
+                f"Verified {passed}/{len(results)} variants in {time.perf_counter() - start:.2f}s"
+            )
+            verified = passed == len(results)
+    except Exception as e:
+        typer.echo(f"An error occurred: {str(e)}", err=True)
+        raise typer.Exit(code=1)
+    if not verified:
+        raise typer.Exit(code=1)
+
+
+@app.command("render")
+def render_command(
+    input_files: List[Path] = typer.Argument(..., help="Collapsed YAML files to render"),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        help="Number of renders to run at the same time [default: number of CPUs]",
+    ),
+):
+    """
+    Render collapsed YAML files with rendercv, several at a time.
+    Each file is rendered into its own output folder next to it. A failed render does not stop
+    the others; the command exits with an error once all of them have finished.
+    """
+    try:
+        rendered = render_outputs(input_files, jobs)
+    except Exception as e:
+        typer.echo(f"An error occurred: {str(e)}", err=True)
+        raise typer.Exit(code=1)
+    if not rendered:
+        raise typer.Exit(code=1)
+
+
+@app.command("watch")
+def watch_command(
+    manifest_file: Optional[Path] = typer.Argument(
+        None, help="Path to the build manifest YAML file describing the variant matrix"
+    ),
+    input_file: Optional[Path] = typer.Option(
+        None, "--input-file", "-i", help="Path to the source YAML file (overrides the manifest)"
+    ),
+    langs: Optional[List[str]] = typer.Option(
+        None, "--lang", "-k", help="Language to collapse into (overrides the manifest)"
+    ),
+    target_verbosity: Optional[List[float]] = typer.Option(
+        None, help="Target verbosity level for filtering (overrides the manifest)"
+    ),
+    include_tags: Optional[List[str]] = typer.Option(None, help="List of tags to include"),
+    exclude_tags: Optional[List[str]] = typer.Option(None, help="List of tags to exclude"),
+    tag_expr: Optional[str] = typer.Option(None, help="Boolean tag expression to filter by"),
+    out_dir: Optional[Path] = typer.Option(
+        None, "--out-dir", help="Directory for the outputs (overrides the manifest)"
+    ),
+    interval: float = typer.Option(0.2, help="Seconds between checks for changed files"),
+    debounce: float = typer.Option(
+        0.3, help="Seconds the files must stay unchanged before rebuilding"
+    ),
+):
+    """
+    Build the variants like 'build', then rebuild them whenever the source or manifest changes.
+    The parsed source and all variants stay in memory, and only outputs whose content changed
+    are written.
+    """
+    from cvgen.build import resolve_manifest
+    from cvgen.watch import IncrementalBuild, watch_files
+
+    yaml_handler = get_yaml_handler()
+    build = IncrementalBuild(
+        yaml_handler,
+        lambda: resolve_manifest(
+            yaml_handler,
+            manifest_file,
+            input_file,
+            langs,
+            target_verbosity,
+            include_tags,
+            exclude_tags,
+            tag_expr,
+            out_dir,
+        ),
+    )
+
+    def rebuild():
+        start = time.perf_counter()
+        try:
+            written = build.rebuild()
+        except Exception as e:
+            typer.echo(f"An error occurred: {str(e)}", err=True)
+            return
+        for output_file in written:
+            typer.echo(f"Processed YAML has been written to {output_file}")
+        typer.echo(f"Rebuilt in {time.perf_counter() - start:.3f}s, {len(written)} file(s) changed")
+
+    def watched_files() -> List[Path]:
+        paths = build.watched_files()
+        if manifest_file is not None:
+            paths.append(manifest_file)
+        return paths
+
+    rebuild()
+    if not watched_files():
+        raise typer.Exit(code=1)
+    typer.echo("Watching for changes, press Ctrl+C to stop")
+    try:
+        watch_files(watched_files, rebuild, interval, debounce)
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command("run")
+def run_command(
+    input_file: Optional[Path] = typer.Argument(
+        None, help="Path to the input YAML file (or use stdin if not provided or '-')"
+    ),
+    stages: List[str] = typer.Option(
+        ...,
+        "--stage",
+        "-s",
+        help="A stage to run, written like its own command, e.g. 'filter --target-verbosity 2' "
+        "or 'collapse -k ko'. Repeat to run several stages in order",
+    ),
+    output_file: Optional[Path] = typer.Option(
+        None, "--output-file", "-o", help="Path to the output YAML file"
+    ),
+    cache_dir: Optional[Path] = typer.Option(
+        None,
+        "--cache-dir",
+        envvar="CVGEN_CACHE_DIR",
+        help="Directory for caching results of unchanged inputs",
+    ),
+    stream: bool = typer.Option(
+        False,
+        "--stream",
+        help="Process the YAML as a stream of events, writing the output as the input is read, "
+        "so that documents larger than memory can be processed",
+    ),
+    input_format: Optional[str] = typer.Option(
+        None,
+        help=f"Format of the input: {', '.join(DATA_FORMATS)} (detected if not given)",
+        callback=validate_format,
+    ),
+    output_format: str = typer.Option(
+        "yaml",
+        help=f"Format of the output: {', '.join(DATA_FORMATS)}",
+        callback=validate_format,
+    ),
+):
+    """
+    Run several stages on the same document in one process.
+    The input is parsed once and the output is written once, so
+    'cvgen run cv.yaml -s "filter --target-verbosity 2" -s "collapse -k ko"' gives the same
+    result as piping 'cvgen filter' into 'cvgen collapse'.
+    """
+    from cvgen.pipeline import Pipeline
+
+    try:
+        pipeline = Pipeline([parse_stage(stage) for stage in stages])
+        if stream:
+            stream_yaml(
+                input_file, pipeline.stream, output_file, cache_dir, input_format, output_format
+            )
+            return
+
+        process_yaml(
+            "run",
+            input_file,
+            pipeline.config,
+            pipeline.run,
+            output_file,
+            cache_dir,
+            input_format,
+            output_format,
+        )
+
     except Exception as e:
         typer.echo(f"An error occurred: {str(e)}", err=True)
         raise typer.Exit(code=1)
@@ -0,0 +1,47 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class CollapseConfig(BaseModel):
+    config_key: str = Field(
+        default="multi_lang_config",
+        description="Name of the key that contains the collapsing configuration",
+    )
+    keys_key: str = Field(
+        default="lang_keys",
+        description="Name of the key within the config that specifies the collapsible keys",
+    )
+    default_key: str = Field(
+        default="default_lang",
+        description="Name of the key within the config that specifies the default key to use",
+    )
+    user_key: Optional[str] = Field(
+        default=None,
+        description="Name of the key within the config that specifies the user's selected language",
+    )
+
+
+class FilterConfig(BaseModel):
+    config_key: str = Field(
+        default="filter_config",
+        description="Name of the key that contains the filtering configuration",
+    )
+    content_key: str = Field(
+        default="content", description="Name of the key that contains the content to be filtered"
+    )
+    verbosity_key: str = Field(
+        default="verbosity", description="Name of the key that specifies the verbosity level"
+    )
+    target_verbosity: float = Field(default=1.0, description="Target verbosity level for filtering")
+    tags_key: str = Field(
+        default="tags", description="Name of the key that specifies the tags for filtering"
+    )
+    include_tags: Optional[List[str]] = Field(default=None, description="List of tags to include")
+    exclude_tags: Optional[List[str]] = Field(default=None, description="List of tags to exclude")
+    include_mode: str = Field(default="any", description="Mode for including tags")
+    exclude_mode: str = Field(default="any", description="Mode for excluding tags")
+    tag_expr: Optional[str] = Field(
+        default=None,
+        description="Boolean tag expression to filter by, e.g. '(backend & !intern) | leadership'",
+    )
@@ -0,0 +1,83 @@
+import json
+import sys
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+# The tracer of the running command, or None when --explain is off
+_active: Optional["Tracer"] = None
+
+
+class Tracer:
+    """
+    Records why the filter and collapse stages kept, dropped or collapsed each node, and writes
+    the records as JSON lines.
+
+    Stages only hold on to the node and the values behind a decision while they run. The key
+    path of each node is looked up in the stage's input and the records are formatted when the
+    stage is done, so a stage that is not traced pays for nothing but a `None` check.
+    """
+
+    def __init__(self, stream: IO[str]):
+        self.stream = stream
+        self.records: List[Tuple[Any, str, str, Dict[str, Any]]] = []
+
+    def record(self, node: Any, action: str, reason: str, **detail: Any) -> None:
+        self.records.append((node, action, reason, detail))
+
+    def flush(self, stage: str, data: Any) -> None:
+        """Write the records of a stage that ran on `data`, in the order they were made."""
+        records, self.records = self.records, []
+        if not records:
+            return
+        paths = node_paths(data, {id(node) for node, _, _, _ in records})
+        for node, action, reason, detail in records:
+            record = {
+                "stage": stage,
+                "path": paths.get(id(node)),
+                "action": action,
+                "reason": reason,
+                **detail,
+            }
+            self.stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def node_paths(data: Any, node_ids: set) -> Dict[int, List[Any]]:
+    """
+    The key path of each node of `data` whose id is in `node_ids`. A node that appears more than
+    once, through a YAML alias, gets its first path in document order.
+    """
+    paths: Dict[int, List[Any]] = {}
+    stack: List[Tuple[Any, List[Any]]] = [(data, [])]
+    while stack and len(paths) < len(node_ids):
+        node, path = stack.pop()
+        if id(node) in node_ids:
+            paths.setdefault(id(node), path)
+        if isinstance(node, dict):
+            children = node.items()
+        elif isinstance(node, list):
+            children = enumerate(node)
+        else:
+            continue
+        stack.extend(
+            (child, [*path, slot])
+            for slot, child in reversed(list(children))
+            if isinstance(child, (dict, list))
+        )
+    return paths
+
+
+def active_tracer() -> Optional[Tracer]:
+    return _active
+
+
+def start_explaining(stream: Optional[IO[str]] = None) -> Tracer:
+    """Trace the decisions of every stage from now on, to `stream` or stderr."""
+    global _active
+    _active = Tracer(sys.stderr if stream is None else stream)
+    return _active
+
+
+def stop_explaining() -> None:
+    global _active
+    if _active is not None:
+        _active.stream.flush()
+        _active = None
@@ -0,0 +1,217 @@
+import codecs
+import datetime
+import io
+import json
+import re
+from typing import IO, Any, Callable, Iterator, Optional
+
+from cvgen.profiling import profiled
+from cvgen.yaml_handler import YAMLHandler
+
+DATA_FORMATS = ("yaml", "json", "msgpack")
+
+# How much of a stream `load_documents` looks at to detect its format
+_DETECT_BYTES = 4096
+# No document was read from a stream, or no more are left
+_NO_DOCUMENT = object()
+
+# Whitespace between the documents of a JSON stream
+_JSON_SPACE = re.compile(r"[ \t\n\r]*")
+
+# First bytes of a MessagePack map or array: fixmap, fixarray, array 16/32 and map 16/32
+_MSGPACK_CONTAINERS = {*range(0x80, 0xA0), 0xDC, 0xDD, 0xDE, 0xDF}
+
+
+def _import_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise ValueError(
+            "The msgpack format needs the 'msgpack' package (pip install 'cvgen[msgpack]')"
+        )
+    return msgpack
+
+
+def _encode_default(value: Any) -> Any:
+    # YAML loads unquoted dates as date objects, which JSON and MessagePack have no type for
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} cannot be serialized")
+
+
+def check_format(data_format: str) -> str:
+    if data_format not in DATA_FORMATS:
+        raise ValueError(f"Unknown format '{data_format}'. Use one of: {', '.join(DATA_FORMATS)}")
+    return data_format
+
+
+def detect_format(source: bytes, truncated: bool = False) -> str:
+    """
+    Guess the format of `source` from its first bytes.
+
+    MessagePack documents start with a container marker that cannot begin valid UTF-8 text, and
+    a document starting with '{' or '[' is read as JSON. Anything else is YAML. When `source` is
+    only the start of the input, a character cut off at its end is not taken as invalid UTF-8.
+    """
+    stripped = source.lstrip()
+    if not stripped:
+        return "yaml"
+    if stripped[0] in _MSGPACK_CONTAINERS:
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(source, final=not truncated)
+        except UnicodeDecodeError:
+            return "msgpack"
+    if stripped[:1] in (b"{", b"["):
+        return "json"
+    return "yaml"
+
+
+def load_data(source: bytes, data_format: Optional[str], yaml_handler: YAMLHandler) -> Any:
+    """Parse `source`, detecting its format when `data_format` is None."""
+    if data_format is None:
+        data_format = detect_format(source)
+        if data_format == "json":
+            try:
+                return json.loads(source)
+            except ValueError:
+                # Flow-style YAML also starts with '{' or '['
+                data_format = "yaml"
+    check_format(data_format)
+    if data_format == "json":
+        return json.loads(source)
+    if data_format == "msgpack":
+        return _import_msgpack().unpackb(source, raw=False, strict_map_key=False)
+    return yaml_handler.load_from_string(source.decode("utf-8"))
+
+
+def _json_documents(text: str) -> Iterator[Any]:
+    """The JSON documents of `text`, which follow each other like the lines of NDJSON."""
+    decoder = json.JSONDecoder()
+    position = _JSON_SPACE.match(text).end()
+    while position < len(text):
+        document, position = decoder.raw_decode(text, position)
+        yield document
+        position = _JSON_SPACE.match(text, position).end()
+
+
+def load_documents(
+    source: IO[bytes], data_format: Optional[str], yaml_handler: YAMLHandler
+) -> Iterator[Any]:
+    """
+    Parse the documents of the binary stream `source` one at a time, detecting its format when
+    `data_format` is None.
+
+    YAML can hold several documents separated by '---'. They are read from the stream as they are
+    asked for, so only one is in memory at a time. An empty YAML stream is a single null document,
+    as `load_data` reads it. JSON streams hold one document per line, and MessagePack streams
+    documents packed one after the other, as `dump_data_to_stream` writes them.
+    """
+    if not hasattr(source, "peek"):
+        source = io.BufferedReader(source)
+    if data_format is None:
+        data_format = detect_format(source.peek(_DETECT_BYTES)[:_DETECT_BYTES], truncated=True)
+        if data_format == "json":
+            content = source.read()
+            try:
+                json_documents = [json.loads(content)]
+            except ValueError:
+                try:
+                    # Parsed before the first is returned, so that YAML can still be tried
+                    json_documents = list(_json_documents(content.decode("utf-8-sig")))
+                except ValueError:
+                    # Flow-style YAML also starts with '{' or '['
+                    json_documents = None
+            if json_documents is not None:
+                yield from json_documents
+                return
+            source, data_format = io.BytesIO(content), "yaml"
+    check_format(data_format)
+    if data_format == "json":
+        yield from _json_documents(source.read().decode("utf-8-sig"))
+        return
+    if data_format == "msgpack":
+        yield from _import_msgpack().Unpacker(source, raw=False, strict_map_key=False)
+        return
+    documents = yaml_handler.load_all_from_stream(source)
+    document = next(documents, _NO_DOCUMENT)
+    yield None if document is _NO_DOCUMENT else document
+    # Not kept while the next document is parsed
+    del document
+    yield from documents
+
+
+def dump_data(data: Any, data_format: str, yaml_handler: YAMLHandler) -> bytes:
+    check_format(data_format)
+    if data_format == "json":
+        text = json.dumps(data, ensure_ascii=False, default=_encode_default) + "\n"
+        return text.encode("utf-8")
+    if data_format == "msgpack":
+        return _import_msgpack().packb(data, default=_encode_default, use_bin_type=True)
+    return yaml_handler.dump_to_string(data).encode("utf-8")
+
+
+def is_binary_format(data_format: str) -> bool:
+    return data_format == "msgpack"
+
+
+def dump_data_to_stream(
+    data: Any,
+    data_format: str,
+    yaml_handler: YAMLHandler,
+    stream: IO,
+    explicit_start: bool = False,
+) -> None:
+    """
+    Serialize `data` straight into `stream`, which is a binary stream for binary formats and a
+    text stream otherwise. With `explicit_start`, YAML starts with '---' so that it can follow
+    other documents. JSON is written on one line, so that a stream has one document per line, and
+    MessagePack documents simply follow each other.
+    """
+    check_format(data_format)
+    if data_format == "json":
+        json.dump(data, stream, ensure_ascii=False, default=_encode_default)
+        stream.write("\n")
+    elif data_format == "msgpack":
+        _import_msgpack().pack(data, stream, default=_encode_default, use_bin_type=True)
+    else:
+        yaml_handler.dump_to_stream(data, stream, explicit_start)
+
+
+def transform_documents(
+    documents: Iterator[Any],
+    transform: Callable[[Any], Any],
+    data_format: str,
+    yaml_handler: YAMLHandler,
+    stream: IO,
+) -> None:
+    """Transform and write the documents of a stream one at a time, each as soon as it is read."""
+    explicit_start = False
+    while True:
+        data = profiled("parse", next, documents, _NO_DOCUMENT)
+        if data is _NO_DOCUMENT:
+            return
+        data = transform(data)
+        profiled(
+            "dump", dump_data_to_stream, data, data_format, yaml_handler, stream, explicit_start
+        )
+        # Not kept while the next document is parsed
+        del data
+        explicit_start = True
+
+
+def transform_data(
+    source: bytes,
+    transform: Callable[[Any], Any],
+    input_format: Optional[str],
+    output_format: str,
+    yaml_handler: YAMLHandler,
+) -> bytes:
+    """Transform every document of `source` and return the serialized output."""
+    documents = load_documents(io.BytesIO(source), input_format, yaml_handler)
+    if is_binary_format(output_format):
+        buffer = io.BytesIO()
+        transform_documents(documents, transform, output_format, yaml_handler, buffer)
+        return buffer.getvalue()
+    text = io.StringIO()
+    transform_documents(documents, transform, output_format, yaml_handler, text)
+    return text.getvalue().encode("utf-8")
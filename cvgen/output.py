@@ -0,0 +1,102 @@
+import os
+import secrets
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Iterator, Optional, Tuple, Union
+
+from cvgen.formats import dump_data_to_stream, is_binary_format
+from cvgen.yaml_handler import YAMLHandler
+
+
+@contextmanager
+def atomic_open(file_path: Path, binary: bool = False) -> Iterator[IO]:
+    """
+    Open a temporary file next to `file_path` for writing, and move it into place on success.
+
+    Readers see either the old file or the complete new one, never a partial write, and a failed
+    write leaves the old file untouched.
+    """
+    file_path = Path(file_path)
+    fd, tmp_name = _create_temp(file_path)
+    try:
+        with os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8") as file:
+            yield file
+        # A new file gets the umask applied by the kernel, a replaced one keeps its mode
+        try:
+            os.chmod(tmp_name, os.stat(file_path).st_mode & 0o777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_name, file_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def write_data(
+    yaml_handler: YAMLHandler,
+    data: Any,
+    output_file: Optional[Path],
+    output_format: str = "yaml",
+) -> None:
+    """Serialize `data` once, straight into `output_file` or to stdout."""
+    with open_output(output_file, output_format) as stream:
+        dump_data_to_stream(data, output_format, yaml_handler, stream)
+
+
+@contextmanager
+def open_output(output_file: Optional[Path], output_format: str = "yaml") -> Iterator[IO]:
+    """
+    The stream to serialize `output_format` into: `output_file`, replaced atomically when the
+    block succeeds, or stdout.
+    """
+    binary = is_binary_format(output_format)
+    if output_file:
+        with atomic_open(output_file, binary) as file:
+            yield file
+        return
+    with stdout_pipe():
+        if binary:
+            sys.stdout.flush()
+            yield sys.stdout.buffer
+            sys.stdout.buffer.flush()
+        else:
+            yield sys.stdout
+            if output_format == "yaml":
+                # Matches the trailing newline that echoing the whole string used to add
+                sys.stdout.write("\n")
+            sys.stdout.flush()
+
+
+@contextmanager
+def stdout_pipe() -> Iterator[None]:
+    """Stop writing to stdout quietly when its reader, e.g. `head`, exits early."""
+    try:
+        yield
+    except BrokenPipeError:
+        # Point stdout at devnull so that flushing it again at exit does not raise as well
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+def write_output(output_file: Path, content: Union[str, bytes]) -> bool:
+    """Write `content` unless the file already holds it, and return whether it was written."""
+    binary = isinstance(content, bytes)
+    if output_file.is_file():
+        current = output_file.read_bytes() if binary else output_file.read_text(encoding="utf-8")
+        if current == content:
+            return False
+    with atomic_open(output_file, binary) as file:
+        file.write(content)
+    return True
+
+
+def _create_temp(file_path: Path) -> Tuple[int, str]:
+    # Unlike mkstemp, which creates files readable only by their owner, this lets the kernel
+    # apply the umask
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        tmp_name = str(file_path.parent / f".{file_path.name}.{secrets.token_hex(4)}.tmp")
+        try:
+            return os.open(tmp_name, flags, 0o666), tmp_name
+        except FileExistsError:
+            continue
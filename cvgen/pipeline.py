@@ -0,0 +1,66 @@
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Type, Union
+
+from pydantic import BaseModel, Field
+
+from cvgen.config import CollapseConfig, FilterConfig
+from cvgen.profiling import profiled
+from cvgen.streaming import collapse_events, filter_events
+from cvgen.utils.collapse import collapse_keys
+from cvgen.utils.filter_compound import filter_compound
+
+Stage = Union[FilterConfig, CollapseConfig]
+
+# Stage configs by the name of the command that runs the same stage on its own
+STAGE_CONFIGS: Dict[str, Type[BaseModel]] = {"filter": FilterConfig, "collapse": CollapseConfig}
+
+
+class PipelineConfig(BaseModel):
+    stages: List[Stage] = Field(default_factory=list, description="Stages to run, in order")
+
+
+def stage_name(stage: Stage) -> str:
+    return next(name for name, config in STAGE_CONFIGS.items() if isinstance(stage, config))
+
+
+def run_stage(data: Any, stage: Stage) -> Any:
+    if isinstance(stage, FilterConfig):
+        return filter_compound(data, **stage.model_dump())
+    if isinstance(stage, CollapseConfig):
+        return collapse_keys(data, **stage.model_dump())
+    raise TypeError(f"Unknown pipeline stage {type(stage).__name__}")
+
+
+def stream_stage(events: Iterable[Any], stage: Stage) -> Iterator[Any]:
+    if isinstance(stage, FilterConfig):
+        return filter_events(events, stage)
+    if isinstance(stage, CollapseConfig):
+        return collapse_events(events, stage)
+    raise TypeError(f"Unknown pipeline stage {type(stage).__name__}")
+
+
+class Pipeline:
+    """
+    An ordered list of filter and collapse stages, run one after the other on the same in-memory
+    tree. This is what `cvgen filter ... | cvgen collapse ...` does, without serializing and
+    parsing the document between the stages.
+    """
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.config = PipelineConfig(stages=list(stages))
+
+    @property
+    def stages(self) -> List[Stage]:
+        return self.config.stages
+
+    def run(self, data: Any) -> Any:
+        for stage in self.stages:
+            data = profiled(stage_name(stage), run_stage, data, stage)
+        return data
+
+    def stream(self, events: Iterable[Any]) -> Iterator[Any]:
+        """Run the stages on a stream of YAML parse events, see `cvgen.streaming`."""
+        for stage in self.stages:
+            events = stream_stage(events, stage)
+        return iter(events)
+
+    __call__ = run
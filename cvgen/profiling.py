@@ -0,0 +1,135 @@
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# The profiler of the running command, or None when profiling is off
+_active: Optional["Profiler"] = None
+
+
+def count_nodes(data: Any) -> int:
+    """Count every dict, list and leaf in a tree."""
+    count = 0
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return count
+
+
+class Profiler:
+    """
+    Records wall time, node counts and memory for each stage of a command, and optionally the
+    functions that took the most time according to cProfile.
+
+    `nodes_in` counts the nodes of a stage's first argument and `nodes_out` those of its result,
+    each only when it is a dict or a list, so a parse stage has no `nodes_in` and a dump stage no
+    `nodes_out`. The difference is not the number of nodes a filter dropped, since unwrapping and
+    collapsing also replace nodes by their content.
+
+    Node counts and memory tracing happen around the timed region, so they do not skew the
+    stage times, but they do make a profiled run slower overall.
+    """
+
+    def __init__(self, top: int = 0):
+        self.top = top
+        self.stages: List[Dict[str, Any]] = []
+        self.start = time.perf_counter()
+        self.cprofile = None
+        tracemalloc.start()
+        if top:
+            import cProfile
+
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def run(self, stage: str, function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        data = args[0] if args else None
+        nodes_in = count_nodes(data) if isinstance(data, (dict, list)) else None
+
+        tracemalloc.reset_peak()
+        memory_before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        memory_after, peak = tracemalloc.get_traced_memory()
+
+        nodes_out = count_nodes(result) if isinstance(result, (dict, list)) else None
+        self.stages.append(
+            {
+                "stage": stage,
+                "seconds": seconds,
+                "nodes_in": nodes_in,
+                "nodes_out": nodes_out,
+                "allocated_bytes": memory_after - memory_before,
+                "peak_bytes": peak - memory_before,
+            }
+        )
+        return result
+
+    def stop(self, command: Optional[str]) -> Dict[str, Any]:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        totals: Dict[str, Dict[str, float]] = {}
+        for record in self.stages:
+            total = totals.setdefault(record["stage"], {"count": 0, "seconds": 0.0})
+            total["count"] += 1
+            total["seconds"] += record["seconds"]
+        report = {
+            "command": command,
+            "seconds": time.perf_counter() - self.start,
+            "peak_bytes": peak,
+            "stages": self.stages,
+            "totals": totals,
+        }
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            report["cprofile"] = top_functions(self.cprofile, self.top)
+        return report
+
+
+def top_functions(profile: Any, top: int) -> List[Dict[str, Any]]:
+    import pstats
+
+    stats = pstats.Stats(profile).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "total_seconds": total_time,
+            "cumulative_seconds": cumulative_time,
+        }
+        for (filename, line, name), (_, calls, total_time, cumulative_time, _) in ranked
+    ]
+
+
+def start_profiling(top: int = 0) -> Profiler:
+    global _active
+    _active = Profiler(top)
+    return _active
+
+
+def stop_profiling(command: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Stop profiling and print the report to stderr as one line of JSON."""
+    global _active
+    if _active is None:
+        return None
+    report = _active.stop(command)
+    _active = None
+    sys.stderr.write(json.dumps(report) + "\n")
+    return report
+
+
+def profiled(stage: str, function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call `function`, recording it as `stage` when profiling is on."""
+    if _active is None:
+        return function(*args, **kwargs)
+    return _active.run(stage, function, *args, **kwargs)
@@ -0,0 +1,96 @@
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+RENDERCV_COMMAND = ("rendercv", "render")
+
+
+class RenderResult(BaseModel):
+    input_file: Path
+    returncode: Optional[int] = Field(
+        default=None, description="Exit code of the render, or None if it could not be started"
+    )
+    duration: float = Field(description="Wall-clock seconds spent on this render")
+    output: str = Field(default="", description="Combined stdout and stderr of the render")
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+def render_args(input_file: Path, command: Sequence[str] = RENDERCV_COMMAND) -> List[str]:
+    """
+    Build the command line for rendering one file.
+
+    rendercv writes into `rendercv_output` by default, so each file gets an output folder named
+    after it; renders that run at the same time in one directory would otherwise overwrite each
+    other's files.
+    """
+    return [*command, input_file.name, "--output-folder-name", f"rendercv_output_{input_file.stem}"]
+
+
+def render_file(input_file: Path, command: Sequence[str] = RENDERCV_COMMAND) -> RenderResult:
+    """Render one file in its own directory. Failures are returned, never raised."""
+    start = time.perf_counter()
+    try:
+        completed = subprocess.run(
+            render_args(input_file, command),
+            cwd=input_file.parent,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            check=False,
+        )
+    except OSError as e:
+        return RenderResult(
+            input_file=input_file, duration=time.perf_counter() - start, output=str(e)
+        )
+    return RenderResult(
+        input_file=input_file,
+        returncode=completed.returncode,
+        duration=time.perf_counter() - start,
+        output=completed.stdout,
+    )
+
+
+def render_files(
+    input_files: Sequence[Path],
+    jobs: Optional[int] = None,
+    command: Sequence[str] = RENDERCV_COMMAND,
+) -> List[RenderResult]:
+    """
+    Render every file, running up to `jobs` renders at once.
+
+    Each render is its own rendercv process, so the pool only has to wait on them and threads are
+    enough to keep every core busy. Results are returned in the order of `input_files`.
+    """
+    if jobs is None:
+        jobs = default_jobs()
+    if jobs < 1:
+        raise ValueError("jobs must be at least 1")
+    input_files = [Path(f).resolve() for f in input_files]
+    with ThreadPoolExecutor(max_workers=min(jobs, max(len(input_files), 1))) as executor:
+        return list(executor.map(lambda f: render_file(f, command), input_files))
+
+
+def format_summary(results: Sequence[RenderResult], elapsed: float) -> str:
+    lines = []
+    for result in results:
+        status = "ok" if result.ok else "FAILED"
+        lines.append(f"{status:<6} {result.duration:7.2f}s  {result.input_file}")
+    succeeded = sum(result.ok for result in results)
+    total = sum(result.duration for result in results)
+    lines.append(
+        f"Rendered {succeeded}/{len(results)} files in {elapsed:.2f}s "
+        f"({total:.2f}s if run one at a time)"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,570 @@
+"""
+Filter and collapse YAML as a stream of parse events, without loading the whole document.
+
+Lists and plain dicts are passed through as events while their children are transformed one at a
+time. A node that has to be judged as a whole, such as a dict with a content key or a dict of
+language keys, is loaded into Python values, transformed with the in-memory functions and turned
+back into events. Memory is therefore bounded by the nesting depth plus the largest such node,
+and each part of the output is written as soon as it is transformed, so the next command in a
+pipe can start before this one finishes.
+
+Keys are only seen in order, so in a streamed dict:
+
+- a content key must come before the other keys, since it makes the dict a wrapper
+- a config key that comes after other keys may not change the settings they were handled with,
+  except that the default config keys of all the stages are read ahead together
+
+otherwise a `StreamingError` is raised. YAML aliases are not supported.
+"""
+
+from abc import ABC, abstractmethod
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+import yaml
+from yaml.composer import Composer
+from yaml.constructor import SafeConstructor
+from yaml.events import (
+    AliasEvent,
+    DocumentEndEvent,
+    DocumentStartEvent,
+    Event,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+    StreamStartEvent,
+)
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+from yaml.representer import SafeRepresenter
+from yaml.resolver import Resolver
+
+from cvgen.config import CollapseConfig, FilterConfig
+from cvgen.utils.collapse import collapse_keys, collapse_scope_resolver
+from cvgen.utils.filter_by_tags import compile_tags_filter
+from cvgen.utils.filter_engine import (
+    TAGS_DROP,
+    VERBOSITY_DROP,
+    filter_scope_resolver,
+    filter_tree,
+    unwrap_scope_resolver,
+)
+from cvgen.yaml_handler import PyYAMLHandler
+
+MAP_TAG = "tag:yaml.org,2002:map"
+SEQ_TAG = "tag:yaml.org,2002:seq"
+
+# The keys that `unwrap_content` uses by default, as in `filter_compound`
+UNWRAP_CONFIG_KEY = "filter_config"
+UNWRAP_CONTENT_KEY = "content"
+
+# The default config keys of all the stages. Each stage reads them all ahead at the start of a dict,
+# so that a document with the configs of several stages streams through any of them, whatever
+# order the configs are in.
+STAGE_CONFIG_KEYS = frozenset(
+    (
+        FilterConfig.model_fields["config_key"].default,
+        CollapseConfig.model_fields["config_key"].default,
+    )
+)
+# Returned by a stage for a node that is left out of the output
+DROP = object()
+# No key has been read ahead for a streamed dict
+_NO_KEY = object()
+
+
+class StreamingError(ValueError):
+    """The document cannot be transformed as a stream."""
+
+
+class EventReader:
+    """The events of a parse, with one event of lookahead."""
+
+    __slots__ = ("_events", "_next")
+
+    def __init__(self, events: Iterable[Event]):
+        self._events = iter(events)
+        self._next: Optional[Event] = None
+
+    def peek(self) -> Event:
+        if self._next is None:
+            self._next = next(self._events)
+        return self._next
+
+    def next(self) -> Event:
+        event = self.peek()
+        self._next = None
+        return event
+
+
+class _EventLoader(Composer, SafeConstructor, Resolver):
+    """Builds the Python value of one node at a time from events that were already parsed."""
+
+    def __init__(self, reader: EventReader):
+        Composer.__init__(self)
+        SafeConstructor.__init__(self)
+        Resolver.__init__(self)
+        self.reader = reader
+
+    # The parser interface that the composer reads events through
+    def check_event(self, *choices: type) -> bool:
+        event = self.reader.peek()
+        if isinstance(event, AliasEvent):
+            raise StreamingError(f"YAML aliases are not supported when streaming: *{event.anchor}")
+        return not choices or isinstance(event, choices)
+
+    def peek_event(self) -> Event:
+        return self.reader.peek()
+
+    def get_event(self) -> Event:
+        return self.reader.next()
+
+    def load(self) -> Any:
+        value = self.construct_document(self.compose_node(None, None))
+        self.anchors = {}
+        return value
+
+
+class _EventDumper(SafeRepresenter, Resolver):
+    """Turns Python values into the events that `yaml.dump` emits for them."""
+
+    def __init__(self):
+        SafeRepresenter.__init__(self, default_flow_style=False, sort_keys=False)
+        Resolver.__init__(self)
+
+    def events(self, value: Any) -> Iterator[Event]:
+        root = self.represent_data(value)
+        self.represented_objects = {}
+        self.object_keeper = []
+        self.alias_key = None
+
+        stack: List[Any] = [root]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Event):
+                # The end of a collection, queued after its children
+                yield node
+            elif isinstance(node, ScalarNode):
+                implicit = (
+                    node.tag == self.resolve(ScalarNode, node.value, (True, False)),
+                    node.tag == self.resolve(ScalarNode, node.value, (False, True)),
+                )
+                yield ScalarEvent(None, node.tag, implicit, node.value, style=node.style)
+            elif isinstance(node, SequenceNode):
+                implicit = node.tag == self.resolve(SequenceNode, node.value, True)
+                yield SequenceStartEvent(None, node.tag, implicit, flow_style=node.flow_style)
+                stack.append(SequenceEndEvent())
+                stack.extend(reversed(node.value))
+            else:
+                implicit = node.tag == self.resolve(MappingNode, node.value, True)
+                yield MappingStartEvent(None, node.tag, implicit, flow_style=node.flow_style)
+                stack.append(MappingEndEvent())
+                for key, item in reversed(node.value):
+                    stack.append(item)
+                    stack.append(key)
+
+
+class _Open:
+    """A list or dict being streamed, and for a dict, the key that was read ahead."""
+
+    __slots__ = ("is_mapping", "context", "key")
+
+    def __init__(self, is_mapping: bool, context: Any, key: Any = _NO_KEY):
+        self.is_mapping = is_mapping
+        self.context = context
+        self.key = key
+
+
+class _Streamed:
+    """The start of a dict that is streamed, as decided by `_EventStage.open_mapping`."""
+
+    __slots__ = ("context", "events", "key")
+
+    def __init__(self, context: Any, events: List[Event], key: Any):
+        self.context = context
+        self.events = events
+        self.key = key
+
+
+def _is_plain(event: Union[MappingStartEvent, SequenceStartEvent], default_tag: str) -> bool:
+    return event.tag is None or event.tag in ("!", default_tag)
+
+
+class _EventStage(ABC):
+    """
+    Transforms a stream of events into another, streaming lists and the dicts that
+    `open_mapping` allows, and loading everything else. The context of a node holds the scope
+    it is transformed in.
+    """
+
+    def __init__(self, events: Iterable[Event], config_keys: Tuple[Any, ...]):
+        self.config_keys = config_keys
+        self.leading_keys = STAGE_CONFIG_KEYS.union(config_keys)
+        self.reader = EventReader(events)
+        self.loader = _EventLoader(self.reader)
+        self.dumper = _EventDumper()
+
+    @abstractmethod
+    def root_context(self) -> Any:
+        pass
+
+    @abstractmethod
+    def transform(self, value: Any, context: Any) -> Any:
+        """Transform a loaded node, returning `DROP` to leave it out."""
+
+    @abstractmethod
+    def open_mapping(self, context: Any) -> Union[Dict[Any, Any], _Streamed]:
+        """
+        Read the start of a dict whose start event was consumed, and either load all of it or
+        return how it is streamed.
+        """
+
+    @abstractmethod
+    def late_key(self, key: Any, frame: _Open) -> Optional[List[Event]]:
+        """
+        Check a key of a streamed dict after the first. Returns None to handle its value as
+        usual, or the events for the entry after reading its value.
+        """
+
+    def __iter__(self) -> Iterator[Event]:
+        while True:
+            event = self.reader.next()
+            if isinstance(event, StreamStartEvent):
+                yield StreamStartEvent()
+            elif isinstance(event, DocumentStartEvent):
+                yield DocumentStartEvent(explicit=False)
+                yield from self.document()
+            elif isinstance(event, DocumentEndEvent):
+                yield DocumentEndEvent(explicit=False)
+            elif isinstance(event, StreamEndEvent):
+                yield StreamEndEvent()
+                return
+
+    def document(self) -> Iterator[Event]:
+        reader = self.reader
+        stack: List[_Open] = []
+        context = self.root_context()
+        while True:
+            key_events: List[Event] = []
+            if stack:
+                frame = stack[-1]
+                event = reader.peek()
+                if isinstance(event, (MappingEndEvent, SequenceEndEvent)):
+                    reader.next()
+                    stack.pop()
+                    yield type(event)()
+                    if not stack:
+                        return
+                    continue
+                if frame.is_mapping:
+                    key = frame.key
+                    if key is _NO_KEY:
+                        key = self.loader.load()
+                        entry = self.late_key(key, frame)
+                        if entry is not None:
+                            yield from entry
+                            continue
+                    else:
+                        frame.key = _NO_KEY
+                    key_events = list(self.dumper.events(key))
+                context = frame.context
+
+            event = reader.peek()
+            if isinstance(event, SequenceStartEvent) and _is_plain(event, SEQ_TAG):
+                reader.next()
+                yield from key_events
+                yield SequenceStartEvent(None, SEQ_TAG, True, flow_style=False)
+                stack.append(_Open(False, context))
+                continue
+            if isinstance(event, MappingStartEvent) and _is_plain(event, MAP_TAG):
+                reader.next()
+                opened = self.open_mapping(context)
+                if type(opened) is _Streamed:
+                    yield from key_events
+                    yield MappingStartEvent(None, MAP_TAG, True, flow_style=False)
+                    yield from opened.events
+                    stack.append(_Open(True, opened.context, opened.key))
+                    continue
+                value = opened
+            else:
+                value = self.loader.load()
+            try:
+                result = self.transform(value, context)
+            except StreamingError:
+                raise
+            except Exception as error:
+                # It may have failed only for lack of a config key that the stream has not reached
+                key = self.late_config_key(stack)
+                if key is not None:
+                    raise StreamingError(
+                        f"{key!r} comes after other keys of its dict, which could not be "
+                        "transformed without it; move it first, or run without streaming"
+                    ) from error
+                raise
+
+            if result is not DROP:
+                yield from key_events
+                yield from self.dumper.events(result)
+            elif not stack:
+                # A dropped document is written as null, like the in-memory transforms do
+                yield from self.dumper.events(None)
+            if not stack:
+                return
+
+    def late_config_key(self, stack: List[_Open]) -> Any:
+        """
+        Read the rest of the document for a config key that comes late in one of the open dicts
+        and changes its settings. Returns the key, or None.
+        """
+        reader = self.reader
+        try:
+            for frame in reversed(stack):
+                while not isinstance(reader.peek(), (MappingEndEvent, SequenceEndEvent)):
+                    if frame.is_mapping:
+                        key = self.loader.load()
+                        if key in self.config_keys:
+                            try:
+                                self.late_key(key, frame)
+                            except StreamingError:
+                                return key
+                            continue
+                    self.loader.load()
+                reader.next()
+        except Exception:
+            # The document cannot be read further, which the failed transform is reported for
+            pass
+        return None
+
+    def load_rest(self, entries: Iterable[Tuple[Any, Any]]) -> Dict[Any, Any]:
+        """Load the rest of a dict whose first `entries` were already read."""
+        value = dict(entries)
+        while not isinstance(self.reader.peek(), MappingEndEvent):
+            key = self.loader.load()
+            value[key] = self.loader.load()
+        self.reader.next()
+        return value
+
+    def read_leading(self) -> Tuple[List[Tuple[Any, Any]], Any]:
+        """
+        Read the config entries at the start of a dict, and the first other key. The key is
+        `_NO_KEY` at the end of the dict or at a key that is not a scalar.
+        """
+        entries = []
+        while isinstance(self.reader.peek(), ScalarEvent):
+            key = self.loader.load()
+            if key not in self.leading_keys:
+                return entries, key
+            entries.append((key, self.loader.load()))
+        return entries, _NO_KEY
+
+
+class _FilterStage(_EventStage):
+    """`filter_compound` on a stream. The context is the (scope, unwrap scope) pair."""
+
+    def __init__(self, events: Iterable[Event], config: FilterConfig, should_unwrap: bool):
+        super().__init__(
+            events,
+            (config.config_key, UNWRAP_CONFIG_KEY) if should_unwrap else (config.config_key,),
+        )
+        self.config = config
+        self.should_unwrap = should_unwrap
+        self.tags_filter = compile_tags_filter(
+            config.include_tags,
+            config.exclude_tags,
+            config.include_mode,
+            config.exclude_mode,
+            config.tag_expr,
+        )
+        self.resolver = filter_scope_resolver(
+            config.config_key, config.content_key, config.verbosity_key, config.tags_key
+        )
+        self.unwrap_resolver = unwrap_scope_resolver(UNWRAP_CONFIG_KEY, UNWRAP_CONTENT_KEY)
+
+    def root_context(self) -> Any:
+        return self.resolver.root(), self.unwrap_resolver.root()
+
+    def transform(self, value: Any, context: Any, should_unwrap: Optional[bool] = None) -> Any:
+        scope, unwrap_scope = context
+        config = self.config
+        result = filter_tree(
+            value,
+            config.config_key,
+            config.content_key,
+            config.verbosity_key,
+            config.tags_key,
+            config.target_verbosity,
+            self.tags_filter,
+            scope.config,
+            self.should_unwrap if should_unwrap is None else should_unwrap,
+            UNWRAP_CONFIG_KEY,
+            UNWRAP_CONTENT_KEY,
+            unwrap_scope.config,
+        )
+        if result is VERBOSITY_DROP or result is TAGS_DROP:
+            return DROP
+        return result
+
+    def enter(self, context: Any, entries: Dict[Any, Any]) -> Any:
+        scope, unwrap_scope = context
+        if self.config.config_key in entries:
+            scope = self.resolver.child(scope, entries[self.config.config_key])
+        # Like `filter_tree`, where the tags stage always runs and so drops the filter config
+        if self.should_unwrap and UNWRAP_CONFIG_KEY in entries:
+            if UNWRAP_CONFIG_KEY != self.config.config_key:
+                new_config = self.transform(
+                    entries[UNWRAP_CONFIG_KEY], (scope, unwrap_scope), False
+                )
+                if new_config is not DROP:
+                    unwrap_scope = self.unwrap_resolver.child(unwrap_scope, new_config)
+        return scope, unwrap_scope
+
+    def entry_events(self, key: Any, value: Any, context: Any) -> List[Event]:
+        if key in self.config_keys:
+            return []
+        result = self.transform(value, context)
+        if result is DROP:
+            return []
+        return [*self.dumper.events(key), *self.dumper.events(result)]
+
+    def loads_whole(self, key: Any, context: Any) -> bool:
+        """Whether a dict that has `key` can be dropped or unwrapped."""
+        scope, unwrap_scope = context
+        return key in scope.values or (self.should_unwrap and key == unwrap_scope.values)
+
+    def open_mapping(self, context: Any) -> Union[Dict[Any, Any], _Streamed]:
+        entries, key = self.read_leading()
+        if key is _NO_KEY:
+            return self.load_rest(entries)
+        new_context = self.enter(context, dict(entries))
+        if self.loads_whole(key, new_context) or any(
+            self.loads_whole(k, new_context) for k, _ in entries
+        ):
+            return self.load_rest([*entries, (key, self.loader.load())])
+        events = [event for k, v in entries for event in self.entry_events(k, v, new_context)]
+        return _Streamed(new_context, events, key)
+
+    def late_key(self, key: Any, frame: _Open) -> Optional[List[Event]]:
+        if key in self.config_keys:
+            value = self.loader.load()
+            context = self.enter(frame.context, {key: value})
+            if [scope.values for scope in context] != [scope.values for scope in frame.context]:
+                raise StreamingError(
+                    f"{key!r} comes after other keys of its dict and changes how they are "
+                    "filtered; move it first, or filter without streaming"
+                )
+            frame.context = context
+            return self.entry_events(key, value, context)
+        scope, unwrap_scope = frame.context
+        if key == scope.values[0] or (self.should_unwrap and key == unwrap_scope.values):
+            raise StreamingError(
+                f"{key!r} comes after other keys of its dict, which is then filtered as a whole; "
+                "move it first, or filter without streaming"
+            )
+        return None
+
+
+class _CollapseStage(_EventStage):
+    """`collapse_keys` on a stream. The context is the (user key, scope) pair."""
+
+    def __init__(
+        self,
+        events: Iterable[Event],
+        config: CollapseConfig,
+        raise_on_missing_user_key: bool,
+    ):
+        super().__init__(events, (config.config_key,))
+        self.config = config
+        self.raise_on_missing_user_key = raise_on_missing_user_key
+        self.resolver = collapse_scope_resolver(
+            config.config_key, config.keys_key, config.default_key
+        )
+
+    def root_context(self) -> Any:
+        return self.config.user_key, self.resolver.root()
+
+    def transform(self, value: Any, context: Any) -> Any:
+        user_key, scope = context
+        config = self.config
+        return collapse_keys(
+            value,
+            config.config_key,
+            config.keys_key,
+            config.default_key,
+            user_key,
+            scope.config,
+            self.raise_on_missing_user_key,
+        )
+
+    def check_user_key(self, user_key: Optional[str], scope: Any) -> Optional[str]:
+        """The user key check that `collapse_keys` makes at each dict."""
+        collapsible_keys, key_set, default_value_key = scope.values
+        if user_key and key_set and user_key not in key_set:
+            if self.raise_on_missing_user_key:
+                keys_key = self.config.keys_key
+                raise ValueError(
+                    f"{user_key=} is not in {collapsible_keys=}. Please add it to {keys_key=}"
+                )
+            return default_value_key
+        return user_key
+
+    def open_mapping(self, context: Any) -> Union[Dict[Any, Any], _Streamed]:
+        user_key, scope = context
+        entries, key = self.read_leading()
+        if key is _NO_KEY:
+            return self.load_rest(entries)
+        new_scope = self.resolver.enter(scope, dict(entries))
+        key_set = new_scope.values[1]
+        if key in key_set or any(k in key_set for k, _ in entries):
+            return self.load_rest([*entries, (key, self.loader.load())])
+        new_context = (self.check_user_key(user_key, new_scope), new_scope)
+        # The config is left out of the output, and the configs of other stages are collapsed
+        events = []
+        for k, v in entries:
+            if k != self.config.config_key:
+                events += [
+                    *self.dumper.events(k),
+                    *self.dumper.events(self.transform(v, new_context)),
+                ]
+        return _Streamed(new_context, events, key)
+
+    def late_key(self, key: Any, frame: _Open) -> Optional[List[Event]]:
+        user_key, scope = frame.context
+        if key == self.config.config_key:
+            new_scope = self.resolver.child(scope, self.loader.load())
+            if new_scope.values != scope.values:
+                raise StreamingError(
+                    f"{key!r} comes after other keys of its dict and changes how they are "
+                    "collapsed; move it first, or collapse without streaming"
+                )
+            frame.context = (user_key, new_scope)
+            return []
+        collapsible_keys = scope.values[0]
+        if key in scope.values[1]:
+            raise ValueError(
+                f"Data contains both collapsible keys and other keys: {key=}, {collapsible_keys=}"
+            )
+        return None
+
+
+def parse_events(stream: Union[IO[bytes], TextIO, str]) -> Iterator[Event]:
+    return yaml.parse(stream, Loader=PyYAMLHandler.loader)
+
+
+def emit_events(events: Iterable[Event], stream: TextIO) -> None:
+    """Write events as YAML, formatted like `PyYAMLHandler.dump_to_stream`."""
+    yaml.emit(events, stream, Dumper=PyYAMLHandler.dumper, allow_unicode=True)
+
+
+def filter_events(
+    events: Iterable[Event], config: FilterConfig, should_unwrap: bool = True
+) -> Iterator[Event]:
+    """`filter_compound` with `config`, applied to a stream of events."""
+    return iter(_FilterStage(events, config, should_unwrap))
+
+
+def collapse_events(
+    events: Iterable[Event], config: CollapseConfig, raise_on_missing_user_key: bool = True
+) -> Iterator[Event]:
+    """`collapse_keys` with `config`, applied to a stream of events."""
+    return iter(_CollapseStage(events, config, raise_on_missing_user_key))
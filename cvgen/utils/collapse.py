@@ -1,4 +1,22 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Union
+
+from cvgen.explain import active_tracer
+from cvgen.utils.scope import Scope, ScopeResolver
+from cvgen.utils.traversal import Frame, traverse
+
+
+def collapse_scope_resolver(
+    config_key: str, keys_key: str, default_key: str
+) -> ScopeResolver[Tuple[List[Any], FrozenSet[Any], Optional[str]]]:
+    """Resolves the collapsible keys, as given and as a frozenset, and the default key."""
+    return ScopeResolver(
+        config_key,
+        lambda config: (
+            config.get(keys_key, []),
+            frozenset(config.get(keys_key, [])),
+            config.get(default_key),
+        ),
+    )
 
 
 def collapse_keys(
@@ -10,57 +28,233 @@ def collapse_keys(
     config: Optional[Dict[str, Any]] = None,
     raise_on_missing_user_key: bool = True,
 ) -> Any:
+    """
+    Replace each dict of collapsible keys by its value for `user_key`.
+
+    Parts of `data` with nothing to collapse are returned as they are rather than copied, so the
+    result may share objects with `data` and neither should be modified in place.
+
+    With `--explain`, the key each dict is collapsed to is traced (see `cvgen.explain`).
+    """
     if config is None:
         config = {}
 
-    if isinstance(data, dict):
+    if not isinstance(data, (dict, list)):
+        return data
+
+    tracer = active_tracer()
+    resolver = collapse_scope_resolver(config_key, keys_key, default_key)
+
+    def open_node(item: Any, state: Tuple[Optional[str], Scope]) -> Any:
+        if isinstance(item, list):
+            pending = [
+                (i, element, state)
+                for i, element in enumerate(item)
+                if isinstance(element, (dict, list))
+            ]
+            return Frame(item, pending, shared=True) if pending else item
+
+        user_key, scope = state
+
         # Check if there's a new config at this level
-        if config_key in data:
-            new_config = data[config_key]
-            # Merge the new config with the existing one, prioritizing the new values
-            config = {**config, **new_config}
+        has_config = config_key in item
+        if has_config:
+            scope = resolver.child(scope, item[config_key])
+            state = (user_key, scope)
 
-        collapsible_keys = config.get(keys_key, [])
-        default_value_key = config.get(default_key)
+        collapsible_keys, key_set, default_value_key = scope.values
 
-        if user_key and collapsible_keys and user_key not in collapsible_keys:
+        if user_key and key_set and user_key not in key_set:
             if raise_on_missing_user_key:
                 raise ValueError(
                     f"{user_key=} is not in {collapsible_keys=}. Please add it to {keys_key=}"
                 )
             else:
                 user_key = default_value_key
+                state = (user_key, scope)
 
-        if set(data.keys()).intersection(set(collapsible_keys)) and set(data.keys()) - set(
-            collapsible_keys
-        ):
-            raise ValueError(
-                f"Data contains both collapsible keys and other keys: {data.keys()=}, {collapsible_keys=}"
-            )
-
-        if set(data.keys()).issubset(set(collapsible_keys)):
-            if user_key and user_key in data:
-                return data[user_key]
-            elif default_value_key and default_value_key in data:
-                return data[default_value_key]
+        # An empty dict counts as collapsible, and then has no value to collapse to
+        if not item or not key_set.isdisjoint(item):
+            if not key_set.issuperset(item):
+                raise ValueError(
+                    f"Data contains both collapsible keys and other keys: {item.keys()=}, {collapsible_keys=}"
+                )
+            if user_key and user_key in item:
+                chosen, reason = user_key, "user_key"
+            elif default_value_key and default_value_key in item:
+                chosen, reason = default_value_key, "default"
             else:
                 raise ValueError(
-                    f"Data does not have values for either {user_key=} or {default_value_key=}: {data=}"
+                    f"Data does not have values for either {user_key=} or {default_value_key=}: {item=}"
                 )
+            if tracer is not None:
+                tracer.record(item, "collapse", reason, key=chosen, user_key=user_key)
+            return item[chosen]
 
-        return {
-            k: collapse_keys(
-                v, config_key, keys_key, default_key, user_key, config, raise_on_missing_user_key
-            )
-            for k, v in data.items()
-            if k != config_key
-        }
-    elif isinstance(data, list):
-        return [
-            collapse_keys(
-                item, config_key, keys_key, default_key, user_key, config, raise_on_missing_user_key
-            )
-            for item in data
-        ]
-    else:
-        return data
+        if not has_config:
+            pending = [(k, v, state) for k, v in item.items() if isinstance(v, (dict, list))]
+            return Frame(item, pending, shared=True) if pending else item
+
+        collapsed = {}
+        pending = []
+        for k, v in item.items():
+            if k != config_key:
+                if isinstance(v, (dict, list)):
+                    pending.append((k, v, state))
+                collapsed[k] = v
+        return Frame(collapsed, pending) if pending else collapsed
+
+    try:
+        return traverse(data, (user_key, resolver.root(config)), open_node)
+    finally:
+        if tracer is not None:
+            tracer.flush("collapse", data)
+
+
+class _PerKey:
+    """Node results that differ between the collapsed outputs, one per user key."""
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: Tuple[Any, ...]):
+        self.values = values
+
+
+def find_collapsible_keys(
+    data: Any, config_key: str, keys_key: str, config: Optional[Dict[str, Any]] = None
+) -> List[Any]:
+    """The collapsible keys of the first config that sets them, in document order."""
+    if config and keys_key in config:
+        return list(config[keys_key])
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            new_config = node.get(config_key)
+            if isinstance(new_config, dict) and keys_key in new_config:
+                return list(new_config[keys_key])
+            stack.extend(reversed(node.values()))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return []
+
+
+def collapse_all_keys(
+    data: Any,
+    config_key: str,
+    keys_key: str,
+    default_key: str,
+    user_keys: Optional[List[str]] = None,
+    config: Optional[Dict[str, Any]] = None,
+    raise_on_missing_user_key: bool = True,
+) -> Dict[str, Any]:
+    """
+    Collapse `data` for each of `user_keys` in a single traversal, returning the outputs by user
+    key. Each output equals `collapse_keys` with that user key.
+
+    `user_keys` defaults to the collapsible keys of the first config in the document. Parts of
+    the document that collapse the same way for every user key are built once and shared by all
+    outputs, and may be shared with `data`, so the outputs must not be modified in place.
+
+    With `--explain`, the key each dict is collapsed to is traced once per user key.
+    """
+    if user_keys is None:
+        user_keys = find_collapsible_keys(data, config_key, keys_key, config)
+    user_keys = tuple(user_keys)
+    if not isinstance(data, (dict, list)) or not user_keys:
+        return {user_key: data for user_key in user_keys}
+
+    tracer = active_tracer()
+    resolver = collapse_scope_resolver(config_key, keys_key, default_key)
+
+    def split(output: Union[dict, list]) -> Any:
+        """Turn a container with per-key children into one container per user key."""
+        slots = output.items() if isinstance(output, dict) else enumerate(output)
+        per_key = [(slot, value.values) for slot, value in slots if type(value) is _PerKey]
+        if not per_key:
+            return output
+        outputs = []
+        for i in range(len(user_keys)):
+            copy = output.copy()
+            for slot, values in per_key:
+                copy[slot] = values[i]
+            outputs.append(copy)
+        return _PerKey(tuple(outputs))
+
+    def open_node(item: Any, state: Tuple[Tuple[Optional[str], ...], Scope, bool]) -> Any:
+        if isinstance(item, list):
+            pending = [
+                (i, element, state)
+                for i, element in enumerate(item)
+                if isinstance(element, (dict, list))
+            ]
+            return Frame(item, pending, split, shared=True) if pending else item
+
+        keys, scope, checked = state
+
+        has_config = config_key in item
+        if has_config:
+            scope = resolver.child(scope, item[config_key])
+            checked = False
+
+        collapsible_keys, key_set, default_value_key = scope.values
+
+        # The user keys only change when the scope does, so they are checked once per scope
+        if not checked and key_set:
+            for user_key in keys:
+                if user_key and user_key not in key_set:
+                    if raise_on_missing_user_key:
+                        raise ValueError(
+                            f"{user_key=} is not in {collapsible_keys=}. Please add it to {keys_key=}"
+                        )
+            if not raise_on_missing_user_key:
+                keys = tuple(
+                    default_value_key if user_key and user_key not in key_set else user_key
+                    for user_key in keys
+                )
+        state = (keys, scope, True)
+
+        if not item or not key_set.isdisjoint(item):
+            if not key_set.issuperset(item):
+                raise ValueError(
+                    f"Data contains both collapsible keys and other keys: {item.keys()=}, {collapsible_keys=}"
+                )
+            values = []
+            for user_key in keys:
+                if user_key and user_key in item:
+                    chosen, reason = user_key, "user_key"
+                elif default_value_key and default_value_key in item:
+                    chosen, reason = default_value_key, "default"
+                else:
+                    raise ValueError(
+                        f"Data does not have values for either {user_key=} or {default_value_key=}: {item=}"
+                    )
+                if tracer is not None:
+                    tracer.record(item, "collapse", reason, key=chosen, user_key=user_key)
+                values.append(item[chosen])
+            first = values[0]
+            if all(value is first for value in values):
+                return first
+            return _PerKey(tuple(values))
+
+        if not has_config:
+            pending = [(k, v, state) for k, v in item.items() if isinstance(v, (dict, list))]
+            return Frame(item, pending, split, shared=True) if pending else item
+
+        collapsed = {}
+        pending = []
+        for k, v in item.items():
+            if k != config_key:
+                if isinstance(v, (dict, list)):
+                    pending.append((k, v, state))
+                collapsed[k] = v
+        return Frame(collapsed, pending, split) if pending else collapsed
+
+    try:
+        result = traverse(data, (user_keys, resolver.root(config), False), open_node)
+    finally:
+        if tracer is not None:
+            tracer.flush("collapse", data)
+    if type(result) is _PerKey:
+        return dict(zip(user_keys, result.values))
+    return {user_key: result for user_key in user_keys}
@@ -1,5 +1,8 @@
-from typing import Any, Dict, List, Optional, Union
+from collections.abc import Hashable
+from typing import Any, Dict, FrozenSet, List, Optional, Union
 
+from cvgen.utils.filter_engine import TAGS_DROP, SubtreeTagsCheck, TagsFilter, filter_single_stage
+from cvgen.utils.tag_expr import parse_tag_expr
 from cvgen.utils.unwrap import unwrap_content
 
 
@@ -14,6 +17,7 @@ def filter_by_tags(
     exclude_mode: str = "any",
     config: Optional[Dict[str, Any]] = None,
     should_unwrap: bool = True,
+    tag_expr: Optional[str] = None,
 ) -> Any:
     filtered = _filter_by_tags(
         data,
@@ -25,6 +29,7 @@ def filter_by_tags(
         include_mode,
         exclude_mode,
         config,
+        tag_expr,
     )
 
     if should_unwrap:
@@ -43,77 +48,17 @@ def _filter_by_tags(
     include_mode: str = "any",
     exclude_mode: str = "any",
     config: Optional[Dict[str, Any]] = None,
+    tag_expr: Optional[str] = None,
 ) -> Any:
-    if config is None:
-        config = {}
-
-    if isinstance(data, dict):
-        if config_key in data:
-            new_config = data[config_key]
-            config = {**config, **new_config}
-
-        local_content_key = config.get("content_key", content_key)
-        local_tags_key = config.get("tags_key", tags_key)
-
-        if local_content_key in data and local_tags_key in data:
-            item_tags = data[local_tags_key]
-            if should_include(item_tags, include_tags, exclude_tags, include_mode, exclude_mode):
-                filtered_content = _filter_by_tags(
-                    data[local_content_key],
-                    config_key,
-                    local_content_key,
-                    local_tags_key,
-                    include_tags,
-                    exclude_tags,
-                    include_mode,
-                    exclude_mode,
-                    config,
-                )
-                return {**data, local_content_key: filtered_content}
-            else:
-                return None
-
-        filtered = {}
-        for k, v in data.items():
-            if k != config_key:
-                filtered_v = _filter_by_tags(
-                    v,
-                    config_key,
-                    local_content_key,
-                    local_tags_key,
-                    include_tags,
-                    exclude_tags,
-                    include_mode,
-                    exclude_mode,
-                    config,
-                )
-                if filtered_v is not None:
-                    filtered[k] = filtered_v
-        return filtered
-
-    elif isinstance(data, list):
-        filtered = [
-            filtered_item
-            for item in data
-            if (
-                filtered_item := _filter_by_tags(
-                    item,
-                    config_key,
-                    content_key,
-                    tags_key,
-                    include_tags,
-                    exclude_tags,
-                    include_mode,
-                    exclude_mode,
-                    config,
-                )
-            )
-            is not None
-        ]
-        return filtered
-
-    else:
-        return data
+    tags_filter = compile_tags_filter(
+        include_tags, exclude_tags, include_mode, exclude_mode, tag_expr
+    )
+    filtered = filter_single_stage(
+        data, config_key, content_key, "verbosity", tags_key, None, tags_filter, config
+    )
+    if filtered is TAGS_DROP:
+        return None
+    return filtered
 
 
 def should_include(
@@ -123,30 +68,119 @@ def should_include(
     include_mode: str,
     exclude_mode: str,
 ) -> bool:
-    if isinstance(item_tags, str):
-        item_tags = [item_tags]
+    return compile_tags_filter(include_tags, exclude_tags, include_mode, exclude_mode)(item_tags)
 
-    if include_tags is None and exclude_tags is None:
-        return True
 
-    result: Optional[bool] = None
+def compile_tags_filter(
+    include_tags: Optional[List[str]],
+    exclude_tags: Optional[List[str]],
+    include_mode: str = "any",
+    exclude_mode: str = "any",
+    tag_expr: Optional[str] = None,
+) -> TagsFilter:
+    """
+    Build the per-node tag check once, so that filtering only has to test set membership.
+
+    The include/exclude options and the optional `tag_expr` (see `parse_tag_expr`) must all
+    hold for an item to be kept.
+    """
+    checks = []
+    # An empty tag list decides the outcome without looking at the item's tags
+    always_excluded = False
 
     if include_tags is not None:
-        result = False if result is None else result
+        include = frozenset(include_tags)
         if include_mode == "all":
-            result |= all(tag in item_tags for tag in include_tags)
+            if include:
+                checks.append(include.issubset)
         elif include_mode == "any":
-            result |= any(tag in item_tags for tag in include_tags)
+            if include:
+                checks.append(lambda tags: not include.isdisjoint(tags))
+            else:
+                always_excluded = True
         else:
             raise ValueError("Invalid include_mode. Use 'any' or 'all'.")
 
     if exclude_tags is not None:
-        result = True if result is None else result
+        exclude = frozenset(exclude_tags)
         if exclude_mode == "all":
-            result &= any(tag not in item_tags for tag in exclude_tags)
+            if exclude:
+                checks.append(lambda tags: not exclude.issubset(tags))
+            else:
+                always_excluded = True
         elif exclude_mode == "any":
-            result &= all(tag not in item_tags for tag in exclude_tags)
+            if exclude:
+                checks.append(exclude.isdisjoint)
         else:
             raise ValueError("Invalid exclude_mode. Use 'any' or 'all'.")
 
-    return result
+    if tag_expr is not None:
+        checks.append(parse_tag_expr(tag_expr))
+
+    if always_excluded:
+        return lambda item_tags: False
+    if not checks:
+        return lambda item_tags: True
+
+    def tags_filter(item_tags: Union[List[str], str]) -> bool:
+        tags = _as_tag_set(item_tags)
+        return all(check(tags) for check in checks)
+
+    return tags_filter
+
+
+def compile_subtree_tags_check(
+    include_tags: Optional[List[str]],
+    exclude_tags: Optional[List[str]],
+    include_mode: str = "any",
+    exclude_mode: str = "any",
+    tag_expr: Optional[str] = None,
+) -> SubtreeTagsCheck:
+    """
+    Build the check of `compile_tags_filter` for a whole subtree, from the tags used anywhere in
+    it. The tags of each wrapper are some of those, so if no wrapper can match the include tags
+    they are all dropped, and if none can match the exclude tags and nothing else is checked,
+    they are all kept. Otherwise the check returns None. Each set of tags is decided once.
+    """
+    include = None if include_tags is None else frozenset(include_tags)
+    exclude = None if exclude_tags is None else frozenset(exclude_tags)
+    decisions: Dict[FrozenSet[Any], Optional[bool]] = {}
+
+    def decide(tags: FrozenSet[Any]) -> Optional[bool]:
+        undecided = tag_expr is not None
+        if include is not None:
+            if include_mode == "all":
+                if not include <= tags:
+                    return False
+                undecided = undecided or bool(include)
+            elif include.isdisjoint(tags):
+                return False
+            else:
+                undecided = True
+        if exclude is not None:
+            if exclude_mode == "all":
+                if not exclude:
+                    return False
+                undecided = undecided or exclude <= tags
+            elif not exclude.isdisjoint(tags):
+                undecided = True
+        return None if undecided else True
+
+    def subtree_tags_check(tags: FrozenSet[Any]) -> Optional[bool]:
+        try:
+            return decisions[tags]
+        except KeyError:
+            decision = decisions[tags] = decide(tags)
+            return decision
+
+    return subtree_tags_check
+
+
+def _as_tag_set(item_tags: Union[List[str], str]) -> FrozenSet[Any]:
+    if isinstance(item_tags, str):
+        return frozenset((item_tags,))
+    try:
+        return frozenset(item_tags)
+    except TypeError:
+        # Unhashable entries can never match a tag, so they are left out
+        return frozenset(tag for tag in item_tags if isinstance(tag, Hashable))
@@ -1,5 +1,6 @@
 from typing import Any, Dict, Optional
 
+from cvgen.utils.filter_engine import VERBOSITY_DROP, filter_single_stage
 from cvgen.utils.unwrap import unwrap_content
 
 
@@ -16,7 +17,6 @@ def filter_by_verbosity(
         data, config_key, content_key, verbosity_key, target_verbosity, config
     )
 
-    print(f"{filtered=}")
     if should_unwrap:
         # FIXME: there is no way to check if the data was valid for filtering
         return unwrap_content(filtered)
@@ -31,52 +31,9 @@ def _filter_by_verbosity(
     target_verbosity: float = 1.0,
     config: Optional[Dict[str, Any]] = None,
 ) -> Any:
-    if config is None:
-        config = {}
-
-    if isinstance(data, dict):
-        if config_key in data:
-            new_config = data[config_key]
-            config = {**config, **new_config}
-
-        local_content_key = config.get("content_key", content_key)
-        local_verbosity_key = config.get("verbosity_key", verbosity_key)
-
-        if local_content_key in data and local_verbosity_key in data:
-            if data[local_verbosity_key] <= target_verbosity:
-                filtered_content = _filter_by_verbosity(
-                    data[local_content_key],
-                    config_key,
-                    local_content_key,
-                    local_verbosity_key,
-                    target_verbosity,
-                    config,
-                )
-                return {**data, local_content_key: filtered_content}
-            else:
-                return None
-
-        filtered = {}
-        for k, v in data.items():
-            filtered_v = _filter_by_verbosity(
-                v, config_key, local_content_key, local_verbosity_key, target_verbosity, config
-            )
-            if filtered_v is not None:
-                filtered[k] = filtered_v
-        return filtered
-
-    elif isinstance(data, list):
-        filtered = [
-            filtered_item
-            for item in data
-            if (
-                filtered_item := _filter_by_verbosity(
-                    item, config_key, content_key, verbosity_key, target_verbosity, config
-                )
-            )
-            is not None
-        ]
-        return filtered
-
-    else:
-        return data
+    filtered = filter_single_stage(
+        data, config_key, content_key, verbosity_key, "tags", target_verbosity, None, config
+    )
+    if filtered is VERBOSITY_DROP:
+        return None
+    return filtered
@@ -1,8 +1,10 @@
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
-from cvgen.utils.filter_by_tags import _filter_by_tags
-from cvgen.utils.filter_by_verbosity import _filter_by_verbosity
-from cvgen.utils.unwrap import unwrap_content
+from cvgen.utils.filter_by_tags import compile_subtree_tags_check, compile_tags_filter
+from cvgen.utils.filter_engine import TAGS_DROP, VERBOSITY_DROP, Drop, filter_tree
+
+if TYPE_CHECKING:
+    from cvgen.utils.tag_index import TagIndex
 
 
 def filter_compound(
@@ -18,6 +20,9 @@ def filter_compound(
     exclude_mode: str = "any",
     config: Optional[Dict[str, Any]] = None,
     should_unwrap: bool = True,
+    tag_expr: Optional[str] = None,
+    index: Optional["TagIndex"] = None,
+    dropped: Optional[Dict[int, Drop]] = None,
 ) -> Any:
     filtered = _filter_compound(
         data,
@@ -31,10 +36,14 @@ def filter_compound(
         include_mode,
         exclude_mode,
         config,
+        should_unwrap,
+        tag_expr,
+        index,
+        dropped,
     )
 
-    if should_unwrap:
-        return unwrap_content(filtered)
+    if filtered is VERBOSITY_DROP or filtered is TAGS_DROP:
+        return None
     return filtered
 
 
@@ -50,89 +59,30 @@ def _filter_compound(
     include_mode: str = "any",
     exclude_mode: str = "any",
     config: Optional[Dict[str, Any]] = None,
+    should_unwrap: bool = True,
+    tag_expr: Optional[str] = None,
+    index: Optional["TagIndex"] = None,
+    dropped: Optional[Dict[int, Drop]] = None,
 ) -> Any:
-    if config is None:
-        config = {}
-
-    def apply_filters(item: Any) -> Any:
-        # Apply verbosity filter
-        filtered_by_verbosity = _filter_by_verbosity(
-            item, config_key, content_key, verbosity_key, target_verbosity, config
-        )
-
-        if filtered_by_verbosity is None:
-            return None
-
-        # Apply tags filter
-        filtered_by_tags = _filter_by_tags(
-            filtered_by_verbosity,
-            config_key,
-            content_key,
-            tags_key,
-            include_tags,
-            exclude_tags,
-            include_mode,
-            exclude_mode,
-            config,
+    tags_filter = compile_tags_filter(
+        include_tags, exclude_tags, include_mode, exclude_mode, tag_expr
+    )
+    # unwrap_content is applied with its own default keys after filtering
+    return filter_tree(
+        data,
+        config_key,
+        content_key,
+        verbosity_key,
+        tags_key,
+        target_verbosity,
+        tags_filter,
+        config,
+        should_unwrap,
+        index=index,
+        dropped=dropped,
+        subtree_tags_check=compile_subtree_tags_check(
+            include_tags, exclude_tags, include_mode, exclude_mode, tag_expr
         )
-
-        return filtered_by_tags
-
-    if isinstance(data, dict):
-        if config_key in data:
-            new_config = data[config_key]
-            config = {**config, **new_config}
-
-        local_content_key = config.get("content_key", content_key)
-
-        if local_content_key in data:
-            filtered_content = apply_filters(data)
-            if filtered_content is None:
-                return None
-            return filtered_content
-
-        filtered = {}
-        for k, v in data.items():
-            if k != config_key:
-                filtered_v = _filter_compound(
-                    v,
-                    config_key,
-                    content_key,
-                    verbosity_key,
-                    tags_key,
-                    target_verbosity,
-                    include_tags,
-                    exclude_tags,
-                    include_mode,
-                    exclude_mode,
-                    config,
-                )
-                if filtered_v is not None:
-                    filtered[k] = filtered_v
-        return filtered
-
-    elif isinstance(data, list):
-        filtered = [
-            filtered_item
-            for item in data
-            if (
-                filtered_item := _filter_compound(
-                    item,
-                    config_key,
-                    content_key,
-                    verbosity_key,
-                    tags_key,
-                    target_verbosity,
-                    include_tags,
-                    exclude_tags,
-                    include_mode,
-                    exclude_mode,
-                    config,
-                )
-            )
-            is not None
-        ]
-        return filtered
-
-    else:
-        return data
+        if index is not None
+        else None,
+    )
@@ -0,0 +1,493 @@
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+
+from cvgen.explain import active_tracer
+from cvgen.utils.scope import Scope, ScopeResolver
+from cvgen.utils.traversal import REMOVE, Frame, Redirect, traverse
+
+if TYPE_CHECKING:
+    from cvgen.utils.tag_index import TagIndex
+
+TagsFilter = Callable[[Union[List[str], str]], bool]
+# Whether the tags filter keeps every wrapper of a subtree, from the tags used in the subtree, or
+# None when it depends on the wrapper
+SubtreeTagsCheck = Callable[[FrozenSet[Any]], Optional[bool]]
+
+# Markers for nodes removed by the verbosity stage or by the tags stage. The two are kept apart
+# because a wrapper keeps a dropped child as `None` in one stage and removes it in the other.
+VERBOSITY_DROP = object()
+TAGS_DROP = object()
+_MARKERS = (VERBOSITY_DROP, TAGS_DROP)
+
+
+def filter_scope_resolver(
+    config_key: str, content_key: str, verbosity_key: str, tags_key: str
+) -> ScopeResolver[Tuple[str, str, str]]:
+    """Resolves the content, verbosity and tags keys of each scope."""
+    return ScopeResolver(
+        config_key,
+        lambda config: (
+            config.get("content_key", content_key),
+            config.get("verbosity_key", verbosity_key),
+            config.get("tags_key", tags_key),
+        ),
+    )
+
+
+def unwrap_scope_resolver(config_key: str, content_key: str) -> ScopeResolver[str]:
+    """Resolves the content key of each scope."""
+    return ScopeResolver(config_key, lambda config: config.get("content_key", content_key))
+
+
+class Drop:
+    """
+    Why a wrapper was dropped: the stage that dropped it, the scope it was decided in, and
+    whether that depended on its content, which the tags stage only looks past when the content
+    is not dropped by the verbosity stage.
+    """
+
+    __slots__ = ("stage", "scope", "checked_content")
+
+    def __init__(self, stage: str, scope: Scope, checked_content: bool):
+        self.stage = stage
+        self.scope = scope
+        self.checked_content = checked_content
+
+
+def filter_tree(
+    data: Any,
+    config_key: str,
+    content_key: str,
+    verbosity_key: str,
+    tags_key: str,
+    target_verbosity: Optional[float],
+    tags_filter: Optional[TagsFilter],
+    config: Optional[Dict[str, Any]] = None,
+    should_unwrap: bool = False,
+    unwrap_config_key: str = "filter_config",
+    unwrap_content_key: str = "content",
+    unwrap_config: Optional[Dict[str, Any]] = None,
+    index: Optional["TagIndex"] = None,
+    dropped: Optional[Dict[int, Drop]] = None,
+    subtree_tags_check: Optional[SubtreeTagsCheck] = None,
+) -> Any:
+    """
+    Apply the verbosity filter, the tags filter and `unwrap_content` in a single traversal.
+
+    The verbosity stage runs unless `target_verbosity` is None and the tags stage runs unless
+    `tags_filter` is None. The result is the same as running the enabled stages one after the
+    other. Each node is visited with the set of stages that still apply to it: inside a wrapper,
+    only the content goes through every stage, while the wrapper's other keys are passed through
+    the stages that would have copied them unchanged.
+
+    Returns `VERBOSITY_DROP` or `TAGS_DROP` when the root itself is filtered out. Parts of `data`
+    that no stage changes are returned as they are rather than copied, so the result may share
+    objects with `data` and neither should be modified in place.
+
+    With `--explain`, each verbosity and tags decision is traced (see `cvgen.explain`).
+
+    An `index` of `data` (see `build_tag_index`) lets the filter return the subtrees that no
+    stage can change without visiting them, which pays off when one document is filtered many
+    times. It is only used if it was built with the same keys. With a `subtree_tags_check` of
+    the tags filter, the tags the index has for a subtree can also decide every tags check in it.
+
+    `dropped`, if given, is filled with the id of every wrapper the filter drops and the `Drop`
+    that tells why.
+    """
+    tracer = active_tracer()
+    inert = tags_below = None
+    if index is not None:
+        if index.data is not data:
+            raise ValueError("The tag index was built for another document")
+        if index.applies_to(config_key, content_key, config) and (
+            not should_unwrap
+            or index.applies_to(unwrap_config_key, unwrap_content_key, unwrap_config)
+        ):
+            inert = index.inert
+        if (
+            tags_filter is not None
+            and subtree_tags_check is not None
+            and index.tags_key == tags_key
+            and index.applies_to(config_key, content_key, config)
+        ):
+            tags_below = index.tags_below
+    resolver = filter_scope_resolver(config_key, content_key, verbosity_key, tags_key)
+    unwrap_resolver = unwrap_scope_resolver(unwrap_config_key, unwrap_content_key)
+    no_unwrap_scope = unwrap_resolver.root()
+
+    def is_dropped_by_verbosity(item: Any, scope: Scope) -> bool:
+        if item is None:
+            return True
+        if not isinstance(item, dict):
+            return False
+        local_content_key, local_verbosity_key, _ = resolver.enter(scope, item).values
+        return (
+            local_content_key in item
+            and local_verbosity_key in item
+            and not item[local_verbosity_key] <= target_verbosity
+        )
+
+    def run(item: Any, context: Tuple) -> Any:
+        if isinstance(item, (dict, list)):
+            return traverse(item, context, open_node)
+        if item is None and context[0]:
+            return context[5]
+        if item is None and context[1]:
+            return context[6]
+        return item
+
+    def open_node(item: Any, context: Tuple) -> Any:
+        (
+            by_verbosity,
+            by_tags,
+            unwrap,
+            scope,
+            unwrap_scope,
+            on_verbosity_drop,
+            on_tags_drop,
+            nested,
+            tags_decision,
+        ) = context
+
+        if inert is not None and id(item) in inert:
+            return item
+        if tags_below is not None and by_tags and tags_decision is None:
+            subtree_tags = tags_below.get(id(item))
+            if subtree_tags is not None:
+                tags_decision = subtree_tags_check(subtree_tags)
+
+        if isinstance(item, list):
+            # Lists leave out every child that is dropped
+            element_context = (
+                by_verbosity,
+                by_tags,
+                unwrap,
+                scope,
+                unwrap_scope,
+                REMOVE,
+                REMOVE,
+                False,
+                tags_decision,
+            )
+            drops_none = by_verbosity or by_tags
+            # The input is copied only once an element is left out of it
+            filtered = None
+            pending = []
+            for position, element in enumerate(item):
+                if isinstance(element, (dict, list)):
+                    slot = position if filtered is None else len(filtered)
+                    pending.append((slot, element, element_context))
+                elif element is None and drops_none:
+                    if filtered is None:
+                        filtered = item[:position]
+                    continue
+                if filtered is not None:
+                    filtered.append(element)
+            if filtered is None:
+                return Frame(item, pending, shared=True) if pending else item
+            return Frame(filtered, pending) if pending else filtered
+
+        is_verbosity_wrapper = is_tags_wrapper = False
+        local_content_key = None
+        if tracer is not None and nested:
+            records_before = len(tracer.records)
+
+        if by_verbosity or by_tags:
+            if config_key in item:
+                scope = resolver.child(scope, item[config_key])
+            local_content_key, local_verbosity_key, local_tags_key = scope.values
+
+        if by_verbosity:
+            if local_content_key in item and local_verbosity_key in item:
+                verbosity = item[local_verbosity_key]
+                kept = verbosity <= target_verbosity
+                if tracer is not None:
+                    tracer.record(
+                        item,
+                        "keep" if kept else "drop",
+                        "verbosity",
+                        verbosity=verbosity,
+                        target_verbosity=target_verbosity,
+                    )
+                if not kept:
+                    if dropped is not None:
+                        dropped[id(item)] = Drop("verbosity", scope, False)
+                    return on_verbosity_drop
+                is_verbosity_wrapper = True
+
+        # Children of a plain dict are removed by the verbosity stage when they filter to None
+        verbosity_removes = by_verbosity and not is_verbosity_wrapper
+
+        if by_tags:
+            if (
+                local_content_key in item
+                and local_tags_key in item
+                and not (
+                    verbosity_removes
+                    and (
+                        is_dropped_by_verbosity(item[local_content_key], scope)
+                        or is_dropped_by_verbosity(item[local_tags_key], scope)
+                    )
+                )
+            ):
+                item_tags = item[local_tags_key]
+                if verbosity_removes:
+                    item_tags = run(
+                        item_tags,
+                        (True, False, False, scope, no_unwrap_scope, *_MARKERS, False, None),
+                    )
+                kept = tags_filter(item_tags) if tags_decision is None else tags_decision
+                if tracer is not None:
+                    tracer.record(item, "keep" if kept else "drop", "tags", tags=item_tags)
+                if not kept:
+                    if dropped is not None:
+                        dropped[id(item)] = Drop("tags", scope, verbosity_removes)
+                    return on_tags_drop
+                is_tags_wrapper = True
+
+        # A child that filters to a drop marker is either removed or kept as None
+        tags_removes = by_tags and not is_tags_wrapper
+        drop_removes = verbosity_removes or tags_removes
+        on_content_verbosity_drop = REMOVE if drop_removes else None
+        on_content_tags_drop = REMOVE if tags_removes else None
+
+        if unwrap:
+            if unwrap_config_key in item and not (tags_removes and unwrap_config_key == config_key):
+                if unwrap_config_key == local_content_key:
+                    stages = (by_verbosity, by_tags)
+                else:
+                    stages = (verbosity_removes, tags_removes)
+                new_config = _settle(
+                    run(
+                        item[unwrap_config_key],
+                        (*stages, False, scope, unwrap_scope, *_MARKERS, False, tags_decision),
+                    ),
+                    on_content_verbosity_drop,
+                    on_content_tags_drop,
+                )
+                if new_config is not REMOVE:
+                    unwrap_scope = unwrap_resolver.child(unwrap_scope, new_config)
+
+            local_unwrap_key = unwrap_scope.values
+            if local_unwrap_key in item and not (tags_removes and local_unwrap_key == config_key):
+                if nested:
+                    # Let the caller come back to this node, so wrapper chains are not recursed.
+                    # It makes its records again then.
+                    if tracer is not None:
+                        del tracer.records[records_before:]
+                    return Redirect(item, (*context[:7], False, tags_decision))
+                if local_unwrap_key == local_content_key:
+                    stages = (by_verbosity, by_tags)
+                else:
+                    stages = (verbosity_removes, tags_removes)
+                content = item[local_unwrap_key]
+                if isinstance(content, (dict, list)):
+                    result = open_node(
+                        content,
+                        (*stages, True, scope, unwrap_scope, *_MARKERS, True, tags_decision),
+                    )
+                else:
+                    result = run(
+                        content,
+                        (*stages, True, scope, unwrap_scope, *_MARKERS, False, tags_decision),
+                    )
+                result = _settle(result, on_content_verbosity_drop, on_content_tags_drop)
+                if result is not REMOVE:
+                    return result
+
+        content_drops_none = by_verbosity or by_tags
+        content_none = on_content_verbosity_drop if by_verbosity else on_content_tags_drop
+        content_context = other_context = None
+
+        # The input is copied only once an entry is left out of it
+        filtered = None
+        pending = []
+        for position, (k, v) in enumerate(item.items()):
+            if (tags_removes and k == config_key) or (unwrap and k == unwrap_config_key):
+                keep = False
+            elif isinstance(v, (dict, list)):
+                keep = True
+                if k == local_content_key:
+                    if content_context is None:
+                        content_context = (
+                            by_verbosity,
+                            by_tags,
+                            unwrap,
+                            scope,
+                            unwrap_scope,
+                            on_content_verbosity_drop,
+                            on_content_tags_drop,
+                            False,
+                            tags_decision,
+                        )
+                    pending.append((k, v, content_context))
+                else:
+                    if other_context is None:
+                        other_context = (
+                            verbosity_removes,
+                            tags_removes,
+                            unwrap,
+                            scope,
+                            unwrap_scope,
+                            REMOVE,
+                            REMOVE,
+                            False,
+                            tags_decision,
+                        )
+                    pending.append((k, v, other_context))
+            elif v is None:
+                # A None content is kept as None or removed, and other None values are removed
+                # where dropped children are
+                if k == local_content_key:
+                    keep = not (content_drops_none and content_none is REMOVE)
+                else:
+                    keep = not drop_removes
+            else:
+                keep = True
+            if not keep:
+                if filtered is None:
+                    filtered = dict(islice(item.items(), position))
+            elif filtered is not None:
+                filtered[k] = v
+        if filtered is None:
+            return Frame(item, pending, shared=True) if pending else item
+        return Frame(filtered, pending) if pending else filtered
+
+    try:
+        return run(
+            data,
+            (
+                target_verbosity is not None,
+                tags_filter is not None,
+                should_unwrap,
+                resolver.root(config),
+                unwrap_resolver.root(unwrap_config),
+                *_MARKERS,
+                False,
+                None,
+            ),
+        )
+    finally:
+        if tracer is not None:
+            tracer.flush("filter", data)
+
+
+def _settle(result: Any, on_verbosity_drop: Any, on_tags_drop: Any) -> Any:
+    if result is VERBOSITY_DROP:
+        return on_verbosity_drop
+    if result is TAGS_DROP:
+        return on_tags_drop
+    return result
+
+
+def filter_single_stage(
+    data: Any,
+    config_key: str,
+    content_key: str,
+    verbosity_key: str,
+    tags_key: str,
+    target_verbosity: Optional[float],
+    tags_filter: Optional[TagsFilter],
+    config: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """
+    `filter_tree` with only the tags stage if `tags_filter` is given, else only the verbosity
+    stage, as a recursive walk.
+
+    With one stage, recursion does less per node than the explicit-stack engine, which is only
+    used when decisions are traced or `data` is nested deeper than the recursion limit.
+    """
+    if active_tracer() is None:
+        resolver = filter_scope_resolver(config_key, content_key, verbosity_key, tags_key)
+        root = resolver.root(config)
+        try:
+            return _filter_recursive(
+                data, config_key, resolver, root, target_verbosity, tags_filter
+            )
+        except RecursionError:
+            pass
+    return filter_tree(
+        data,
+        config_key,
+        content_key,
+        verbosity_key,
+        tags_key,
+        target_verbosity,
+        tags_filter,
+        config,
+    )
+
+
+def _filter_recursive(
+    data: Any,
+    config_key: str,
+    resolver: ScopeResolver[Tuple[str, str, str]],
+    root: Scope,
+    target_verbosity: Optional[float],
+    tags_filter: Optional[TagsFilter],
+) -> Any:
+    by_tags = tags_filter is not None
+
+    def visit(item: Any, scope: Scope, on_drop: Any) -> Any:
+        if isinstance(item, list):
+            # The input is copied only once an element is changed or left out
+            filtered = None
+            for position, element in enumerate(item):
+                if element is None:
+                    result = REMOVE
+                elif isinstance(element, (dict, list)):
+                    result = visit(element, scope, REMOVE)
+                else:
+                    result = element
+                if filtered is None:
+                    if result is element:
+                        continue
+                    filtered = item[:position]
+                if result is not REMOVE:
+                    filtered.append(result)
+            return item if filtered is None else filtered
+
+        if config_key in item:
+            scope = resolver.child(scope, item[config_key])
+        local_content_key, local_verbosity_key, local_tags_key = scope.values
+        if local_content_key in item:
+            if by_tags:
+                is_wrapper = local_tags_key in item
+                kept = is_wrapper and tags_filter(item[local_tags_key])
+            else:
+                is_wrapper = local_verbosity_key in item
+                kept = is_wrapper and item[local_verbosity_key] <= target_verbosity
+            if is_wrapper:
+                if not kept:
+                    return on_drop
+                # Only the content of a wrapper is filtered, and a dropped content is kept as None
+                content = item[local_content_key]
+                if not isinstance(content, (dict, list)):
+                    return item
+                result = visit(content, scope, None)
+                return item if result is content else {**item, local_content_key: result}
+
+        # The tags stage leaves the config out of a dict that is not a wrapper
+        removes_config = by_tags and config_key in item
+        filtered = None
+        for position, (k, v) in enumerate(item.items()):
+            if v is None or (removes_config and k == config_key):
+                result = REMOVE
+            elif isinstance(v, (dict, list)):
+                result = visit(v, scope, REMOVE)
+            else:
+                result = v
+            if filtered is None:
+                if result is v:
+                    continue
+                filtered = dict(islice(item.items(), position))
+            if result is not REMOVE:
+                filtered[k] = result
+        return item if filtered is None else filtered
+
+    drop = TAGS_DROP if by_tags else VERBOSITY_DROP
+    if data is None:
+        return drop
+    if not isinstance(data, (dict, list)):
+        return data
+    return visit(data, root, drop)
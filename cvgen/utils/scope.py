@@ -0,0 +1,57 @@
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class Scope(Generic[T]):
+    """
+    The effective config at one level of a document, and the settings a transform reads from it.
+
+    `values` is computed from `config` once, when the scope is created, so a traversal reads
+    ready-made settings at each node instead of looking them up in the config again.
+    """
+
+    __slots__ = ("config", "values", "_children")
+
+    def __init__(self, config: Dict[str, Any], values: T):
+        self.config = config
+        self.values = values
+        # Scopes opened below this one, by the id of the config dict that opened them
+        self._children: Dict[int, Tuple[Any, "Scope[T]"]] = {}
+
+
+class ScopeResolver(Generic[T]):
+    """
+    Resolves the scopes of a document for one transform.
+
+    A dict that has `config_key` opens a new scope whose config is the enclosing config updated
+    with the dict's config, the values of the new config taking priority. `resolve` turns a merged
+    config into the transform's settings. Each scope is resolved once, and entering the same
+    config dict again from the same enclosing scope returns the scope that was already resolved.
+    """
+
+    __slots__ = ("config_key", "resolve")
+
+    def __init__(self, config_key: str, resolve: Callable[[Dict[str, Any]], T]):
+        self.config_key = config_key
+        self.resolve = resolve
+
+    def root(self, config: Optional[Dict[str, Any]] = None) -> Scope[T]:
+        config = {} if config is None else config
+        return Scope(config, self.resolve(config))
+
+    def enter(self, scope: Scope[T], item: Dict[str, Any]) -> Scope[T]:
+        """The scope that applies inside `item`."""
+        if self.config_key not in item:
+            return scope
+        return self.child(scope, item[self.config_key])
+
+    def child(self, scope: Scope[T], new_config: Dict[str, Any]) -> Scope[T]:
+        cached = scope._children.get(id(new_config))
+        # The config is kept with the scope, so its id cannot be reused while it is cached
+        if cached is not None and cached[0] is new_config:
+            return cached[1]
+        config = {**scope.config, **new_config}
+        child = Scope(config, self.resolve(config))
+        scope._children[id(new_config)] = (new_config, child)
+        return child
@@ -0,0 +1,85 @@
+import re
+from typing import Callable, FrozenSet, List, Tuple
+
+TagPredicate = Callable[[FrozenSet[str]], bool]
+
+_TOKEN_PATTERN = re.compile(r"\s*(?:([()&|!])|([^\s()&|!]+))")
+
+
+def parse_tag_expr(expr: str) -> TagPredicate:
+    """
+    Compile a boolean tag expression such as `(backend & !intern) | leadership` into a predicate
+    over a frozenset of tags. `!` binds tighter than `&`, which binds tighter than `|`.
+    """
+    tokens = _tokenize(expr)
+    if not tokens:
+        raise ValueError("Tag expression is empty.")
+
+    predicate, position = _parse_or(expr, tokens, 0)
+    if position != len(tokens):
+        raise ValueError(f"Unexpected {tokens[position][1]!r} in tag expression {expr!r}")
+    return predicate
+
+
+def _tokenize(expr: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    expr = expr.rstrip()
+    while position < len(expr):
+        match = _TOKEN_PATTERN.match(expr, position)
+        if match is None:
+            raise ValueError(f"Invalid tag expression {expr!r} at position {position}")
+        operator, tag = match.groups()
+        tokens.append(("op", operator) if operator else ("tag", tag))
+        position = match.end()
+    return tokens
+
+
+def _parse_or(expr: str, tokens: List[Tuple[str, str]], position: int) -> Tuple[TagPredicate, int]:
+    predicate, position = _parse_and(expr, tokens, position)
+    while position < len(tokens) and tokens[position] == ("op", "|"):
+        right, position = _parse_and(expr, tokens, position + 1)
+        predicate = _either(predicate, right)
+    return predicate, position
+
+
+def _parse_and(expr: str, tokens: List[Tuple[str, str]], position: int) -> Tuple[TagPredicate, int]:
+    predicate, position = _parse_not(expr, tokens, position)
+    while position < len(tokens) and tokens[position] == ("op", "&"):
+        right, position = _parse_not(expr, tokens, position + 1)
+        predicate = _both(predicate, right)
+    return predicate, position
+
+
+def _parse_not(expr: str, tokens: List[Tuple[str, str]], position: int) -> Tuple[TagPredicate, int]:
+    if position >= len(tokens):
+        raise ValueError(f"Unexpected end of tag expression {expr!r}")
+
+    kind, value = tokens[position]
+    if (kind, value) == ("op", "!"):
+        operand, position = _parse_not(expr, tokens, position + 1)
+        return _negate(operand), position
+    if (kind, value) == ("op", "("):
+        predicate, position = _parse_or(expr, tokens, position + 1)
+        if position >= len(tokens) or tokens[position] != ("op", ")"):
+            raise ValueError(f"Missing ')' in tag expression {expr!r}")
+        return predicate, position + 1
+    if kind == "tag":
+        return _has_tag(value), position + 1
+    raise ValueError(f"Unexpected {value!r} in tag expression {expr!r}")
+
+
+def _has_tag(tag: str) -> TagPredicate:
+    return lambda tags: tag in tags
+
+
+def _negate(operand: TagPredicate) -> TagPredicate:
+    return lambda tags: not operand(tags)
+
+
+def _both(left: TagPredicate, right: TagPredicate) -> TagPredicate:
+    return lambda tags: left(tags) and right(tags)
+
+
+def _either(left: TagPredicate, right: TagPredicate) -> TagPredicate:
+    return lambda tags: left(tags) or right(tags)
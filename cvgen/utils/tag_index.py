@@ -0,0 +1,264 @@
+from collections.abc import Hashable
+from itertools import combinations
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from cvgen.utils.filter_engine import filter_scope_resolver
+
+# Dict keys and list indexes from the root to a node
+KeyPath = List[Any]
+
+
+class TagIndex:
+    """
+    The tags and verbosity levels of the content wrappers of one document, by key path, the
+    subtrees of the document that no filter stage can change, and the tags used in each subtree.
+
+    A subtree cannot be changed by filtering when none of its dicts has the config key or a
+    content key of its scope or of a scope above it, and none of its values is None. The tags
+    stage drops the configs that unwrapping would otherwise read, so a wrapper may be unwrapped
+    with the content key of an outer scope. `filter_tree` returns the subtrees that cannot change
+    as they are, without visiting them.
+
+    `tags_below` has the tags of every wrapper in a subtree, for the subtrees that have tagged
+    wrappers, all of them with a tag string or a tag list, and are not reached through a YAML
+    alias. When those tags decide the tags filter for every wrapper at once, `filter_tree` skips
+    the check of each wrapper.
+
+    The index refers to the nodes of `data` by id, so it is only valid for as long as `data` is
+    neither modified nor freed.
+    """
+
+    __slots__ = (
+        "data",
+        "keys",
+        "tags_key",
+        "tags",
+        "verbosity",
+        "co_occurrence",
+        "inert",
+        "tags_below",
+    )
+
+    def __init__(
+        self, data: Any, keys: Tuple[str, str, Optional[Dict[str, Any]]], tags_key: str = "tags"
+    ):
+        self.data = data
+        # The config key, content key and root config the scopes were resolved with
+        self.keys = keys
+        self.tags_key = tags_key
+        self.tags: Dict[Any, List[KeyPath]] = {}
+        self.verbosity: Dict[Any, List[KeyPath]] = {}
+        self.co_occurrence: Dict[Tuple[Any, Any], int] = {}
+        self.inert: FrozenSet[int] = frozenset()
+        self.tags_below: Dict[int, FrozenSet[Any]] = {}
+
+    def applies_to(
+        self, config_key: str, content_key: str, config: Optional[Dict[str, Any]]
+    ) -> bool:
+        """Whether a filter with these keys and root config resolves the same scopes."""
+        indexed_config_key, indexed_content_key, indexed_config = self.keys
+        return (
+            indexed_config_key == config_key
+            and indexed_content_key == content_key
+            and (indexed_config or None) == (config or None)
+        )
+
+    def sorted_tags(self) -> List[Tuple[Any, List[KeyPath]]]:
+        """The tags with their wrappers, the most used first."""
+        return sorted(self.tags.items(), key=lambda item: (-len(item[1]), str(item[0])))
+
+    def sorted_co_occurrence(self) -> List[Tuple[Tuple[Any, Any], int]]:
+        return sorted(self.co_occurrence.items(), key=lambda item: (-item[1], str(item[0])))
+
+    def sorted_verbosity(self) -> List[Tuple[Any, List[KeyPath]]]:
+        """The verbosity levels with their wrappers, from the lowest level."""
+        return sorted(self.verbosity.items(), key=lambda item: _sort_key(item[0]))
+
+    def to_dict(self, paths: bool = False) -> Dict[str, Any]:
+        report: Dict[str, Any] = {
+            "tags": {str(tag): len(nodes) for tag, nodes in self.sorted_tags()},
+            "co_occurrence": [
+                {"tags": [str(tag) for tag in pair], "count": count}
+                for pair, count in self.sorted_co_occurrence()
+            ],
+            "verbosity": {str(level): len(nodes) for level, nodes in self.sorted_verbosity()},
+        }
+        if paths:
+            report["tag_paths"] = {str(tag): nodes for tag, nodes in self.sorted_tags()}
+            report["verbosity_paths"] = {
+                str(level): nodes for level, nodes in self.sorted_verbosity()
+            }
+        return report
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    # Numbers first, in order, then anything else by its text
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value)
+    return (1, str(value))
+
+
+def _tag_list(item_tags: Any) -> List[Any]:
+    if isinstance(item_tags, str):
+        return [item_tags]
+    if not isinstance(item_tags, list):
+        return []
+    tags = []
+    for tag in item_tags:
+        if isinstance(tag, Hashable) and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def _tag_set(item_tags: Any) -> Optional[FrozenSet[Any]]:
+    # The tags the tags filter sees, or None when it does not take them as a tag list
+    if isinstance(item_tags, str):
+        return frozenset((item_tags,))
+    if isinstance(item_tags, list):
+        return frozenset(tag for tag in item_tags if isinstance(tag, Hashable))
+    return None
+
+
+def build_tag_index(
+    data: Any,
+    config_key: str = "filter_config",
+    content_key: str = "content",
+    verbosity_key: str = "verbosity",
+    tags_key: str = "tags",
+    config: Optional[Dict[str, Any]] = None,
+    stats: bool = True,
+) -> TagIndex:
+    """
+    Index `data` in one pass, resolving the keys of each scope the way the filter stages do.
+    Wrappers are listed in document order, and a node reached through a YAML alias is listed
+    under each of its paths. Without `stats`, only what the filter uses is indexed.
+    """
+    index = TagIndex(data, (config_key, content_key, config), tags_key)
+    resolver = filter_scope_resolver(config_key, content_key, verbosity_key, tags_key)
+    seen: Set[int] = set()
+    aliased: Set[int] = set()
+    # Nodes that filtering can change, which makes every node above them changeable as well
+    active: Set[int] = set()
+    tags_below = index.tags_below
+    no_tags: FrozenSet[Any] = frozenset()
+    # Whether each finished subtree can change and its tags, for the node above it
+    results: List[Tuple[bool, Optional[FrozenSet[Any]]]] = []
+
+    if not isinstance(data, (dict, list)):
+        return index
+
+    root = resolver.root(config)
+    # The content keys of a scope and of the scopes above it, and once the children of the node
+    # are pushed, their number with what the node itself adds
+    stack: List[Tuple[Any, Optional[KeyPath], Any, FrozenSet[Any], Any]] = [
+        (data, [] if stats else None, root, frozenset(root.values[:1]), None)
+    ]
+    while stack:
+        node, path, scope, content_keys, pending = stack.pop()
+        node_id = id(node)
+        if pending is None:
+            if node_id in seen:
+                aliased.add(node_id)
+            seen.add(node_id)
+            tags: Optional[FrozenSet[Any]] = no_tags
+            if isinstance(node, dict):
+                if config_key in node:
+                    scope = resolver.child(scope, node[config_key])
+                    content_keys = content_keys | {scope.values[0]}
+                    changes = True
+                else:
+                    changes = not content_keys.isdisjoint(node)
+                local_content_key, local_verbosity_key, local_tags_key = scope.values
+                if local_content_key in node:
+                    if (
+                        stats
+                        and local_verbosity_key in node
+                        and isinstance(node[local_verbosity_key], Hashable)
+                    ):
+                        index.verbosity.setdefault(node[local_verbosity_key], []).append(path)
+                    if local_tags_key in node:
+                        item_tags = node[local_tags_key]
+                        tags = _tag_set(item_tags)
+                        if stats:
+                            tag_list = _tag_list(item_tags)
+                            for tag in tag_list:
+                                index.tags.setdefault(tag, []).append(path)
+                            for pair in combinations(sorted(tag_list, key=str), 2):
+                                index.co_occurrence[pair] = index.co_occurrence.get(pair, 0) + 1
+                children = node.items() if stats else node.values()
+                changes = changes or None in node.values()
+            else:
+                children = enumerate(node) if stats else node
+                changes = None in node
+
+            if stats:
+                containers = [
+                    (slot, child) for slot, child in children if isinstance(child, (dict, list))
+                ]
+            else:
+                containers = [child for child in children if isinstance(child, (dict, list))]
+            if containers:
+                stack.append((node, path, scope, content_keys, (len(containers), changes, tags)))
+                if stats:
+                    stack.extend(
+                        (child, [*path, slot], scope, content_keys, None)
+                        for slot, child in reversed(containers)
+                    )
+                else:
+                    stack.extend((child, None, scope, content_keys, None) for child in containers)
+                continue
+        else:
+            count, changes, tags = pending
+            for child_changes, child_tags in results[-count:]:
+                changes = changes or child_changes
+                if tags is None or child_tags is None:
+                    tags = None
+                elif not tags:
+                    tags = child_tags
+                elif child_tags and not child_tags <= tags:
+                    tags = tags | child_tags
+            del results[-count:]
+
+        if changes:
+            active.add(node_id)
+        if tags:
+            tags_below[node_id] = tags
+        results.append((changes, tags))
+
+    # The tags of a subtree that is reached through an alias depend on its path
+    for node_id in aliased:
+        tags_below.pop(node_id, None)
+    index.inert = frozenset(seen - active)
+    return index
+
+
+def format_tag_stats(index: TagIndex, paths: bool = False) -> str:
+    """Write the tag counts, the tags used together and the wrappers per verbosity level."""
+    from cvgen.utils.tree_diff import format_path
+
+    def section(title: str, rows: List[Tuple[str, int, List[KeyPath]]]) -> List[str]:
+        lines = [f"{title}:"]
+        for label, count, nodes in rows:
+            lines.append(f"  {label:<24} {count:>5}")
+            if paths:
+                lines.extend(f"      {format_path(path)}" for path in nodes)
+        if not rows:
+            lines.append("  (none)")
+        return lines
+
+    return "\n".join(
+        [
+            *section("Tags", [(str(tag), len(nodes), nodes) for tag, nodes in index.sorted_tags()]),
+            *section(
+                "Tags used together",
+                [
+                    (" + ".join(str(tag) for tag in pair), count, [])
+                    for pair, count in index.sorted_co_occurrence()
+                ],
+            ),
+            *section(
+                "Nodes by verbosity",
+                [(str(level), len(nodes), nodes) for level, nodes in index.sorted_verbosity()],
+            ),
+        ]
+    )
@@ -0,0 +1,109 @@
+from typing import Any, Callable, Hashable, List, Optional, Tuple, Union
+
+# Returned for a child that should be left out of its parent's output
+REMOVE = object()
+
+
+class Frame:
+    """
+    The output being built for one container, plus the container children still to transform.
+
+    `output` is a dict or list that already holds the transformed leaves. Each entry of `pending`
+    is `(slot, child, context)`: the result for `child` is stored at `output[slot]`, where slot
+    already holds `child` itself so that the original ordering is kept.
+
+    With `shared`, `output` is the input container itself. It is copied the first time a child
+    result differs from the child, and returned as it is when no result does, so that unchanged
+    subtrees are not rebuilt.
+
+    When `close` is given, it is called with the output once all children are done, and its
+    return value becomes the result of the node instead of the output.
+    """
+
+    __slots__ = ("output", "pending", "has_removed", "close", "shared")
+
+    def __init__(
+        self,
+        output: Union[dict, list],
+        pending: List[Tuple[Hashable, Any, Any]],
+        close: Optional[Callable[[Union[dict, list]], Any]] = None,
+        shared: bool = False,
+    ):
+        self.output = output
+        self.pending = pending
+        self.has_removed = False
+        self.close = close
+        self.shared = shared
+
+    def set(self, slot: Hashable, value: Any) -> None:
+        if self.shared:
+            self.output = self.output.copy()
+            self.shared = False
+        self.output[slot] = value
+
+
+class Redirect:
+    """The node's result is the result of transforming `node` with `context` instead."""
+
+    __slots__ = ("node", "context")
+
+    def __init__(self, node: Any, context: Any):
+        self.node = node
+        self.context = context
+
+
+OpenNode = Callable[[Any, Any], Any]
+
+
+def traverse(root: Any, context: Any, open_node: OpenNode) -> Any:
+    """
+    Run a tree transform without recursion.
+
+    `open_node(node, context)` is called for every dict and list that has to be transformed and
+    returns one of: a `Frame` whose pending children are transformed next, a `Redirect`, `REMOVE`,
+    or the final value for the node. Frames are kept on an explicit stack, so nesting depth is not
+    limited by the interpreter, and leaves are handled by `open_node` without a call of their own.
+
+    The result may share unchanged subtrees with `root` (see `Frame`), so it should be treated as
+    read-only, like the input.
+    """
+    result = open_node(root, context)
+    while type(result) is Redirect:
+        result = open_node(result.node, result.context)
+    if type(result) is not Frame:
+        return result
+
+    # Each entry also holds the parent frame, and the slot and child the frame's result is for
+    stack = [(result, iter(result.pending), None, None, None)]
+    while True:
+        frame, pending, parent, parent_slot, node = stack[-1]
+        for slot, child, child_context in pending:
+            result = open_node(child, child_context)
+            while type(result) is Redirect:
+                result = open_node(result.node, result.context)
+            if type(result) is Frame:
+                stack.append((result, iter(result.pending), frame, slot, child))
+                break
+            if result is not child:
+                if result is REMOVE:
+                    frame.has_removed = True
+                frame.set(slot, result)
+        else:
+            stack.pop()
+            output = frame.output
+            if frame.has_removed:
+                _compact(output)
+            if frame.close is not None:
+                output = frame.close(output)
+            if parent is None:
+                return output
+            if output is not node:
+                parent.set(parent_slot, output)
+
+
+def _compact(output: Union[dict, list]) -> None:
+    if isinstance(output, dict):
+        for key in [k for k, v in output.items() if v is REMOVE]:
+            del output[key]
+    else:
+        output[:] = [v for v in output if v is not REMOVE]
@@ -0,0 +1,250 @@
+import json
+import re
+import textwrap
+from difflib import SequenceMatcher
+from hashlib import blake2b
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Dict keys, which YAML allows to be any scalar, and list indexes
+KeyPath = List[Any]
+
+# Keys written as `.key` in a path; any other key is written as `[...]`
+_PLAIN_KEY = re.compile(r"[A-Za-z_][A-Za-z0-9_-]*")
+# The other side of a list item that was added or removed
+_MISSING = object()
+
+
+class Change:
+    """
+    One difference between two trees: a node that was "added", "removed" or "changed" at `path`,
+    the keys and list indexes from the root to it. `detail` is the line diff of a changed
+    multi-line string.
+    """
+
+    __slots__ = ("kind", "path", "old", "new", "detail")
+
+    def __init__(
+        self,
+        kind: str,
+        path: KeyPath,
+        old: Any = None,
+        new: Any = None,
+        detail: Optional[str] = None,
+    ):
+        self.kind = kind
+        self.path = path
+        self.old = old
+        self.new = new
+        self.detail = detail
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Change) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"Change({self.kind!r}, {format_path(self.path)!r}, {self.old!r}, {self.new!r})"
+
+
+def _scalar_digest(value: Any) -> bytes:
+    if isinstance(value, str):
+        data = b"s" + value.encode("utf-8", "surrogatepass")
+    else:
+        # The type is part of the digest, so 1, 1.0 and true are different values
+        data = f"\0{type(value).__name__}:{value!r}".encode("utf-8", "surrogatepass")
+    return blake2b(data, digest_size=16).digest()
+
+
+def tree_digests(data: Any, digests: Optional[Dict[int, bytes]] = None) -> Dict[int, bytes]:
+    """
+    Hash every dict and list of `data` bottom-up, returning the digests by the id of the node.
+
+    A node's digest is computed from the digests of its children, so two subtrees are equal
+    exactly when their digests are, and comparing them takes one lookup whatever their size. The
+    digest of a dict does not depend on the order of its keys, as dict equality does not.
+
+    Passing the `digests` of other trees that are still alive adds to them, and the subtrees
+    these trees share with `data` are not hashed again.
+    """
+    if digests is None:
+        digests = {}
+    if not isinstance(data, (dict, list)):
+        return digests
+    stack = [(data, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if id(node) in digests:
+            # Aliased by a YAML anchor
+            continue
+        children = node.values() if isinstance(node, dict) else node
+        if not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children if isinstance(child, (dict, list)))
+            continue
+        digest = blake2b(digest_size=16)
+        if isinstance(node, dict):
+            digest.update(b"d")
+            pairs = [
+                node_digest(key, digests) + node_digest(value, digests)
+                for key, value in node.items()
+            ]
+            for pair in sorted(pairs):
+                digest.update(pair)
+        else:
+            digest.update(b"l")
+            for item in node:
+                digest.update(node_digest(item, digests))
+        digests[id(node)] = digest.digest()
+    return digests
+
+
+def node_digest(node: Any, digests: Dict[int, bytes]) -> bytes:
+    if isinstance(node, (dict, list)):
+        return digests[id(node)]
+    return _scalar_digest(node)
+
+
+def _leaf_detail(old: Any, new: Any) -> Optional[str]:
+    if not (isinstance(old, str) and isinstance(new, str) and ("\n" in old or "\n" in new)):
+        return None
+    # Only imported for the few leaves that need a line diff, as it is slow to import
+    from deepdiff import DeepDiff
+
+    return DeepDiff(old, new).get("values_changed", {}).get("root", {}).get("diff")
+
+
+def diff_trees(
+    old: Any,
+    new: Any,
+    old_digests: Optional[Dict[int, bytes]] = None,
+    new_digests: Optional[Dict[int, bytes]] = None,
+) -> List[Change]:
+    """
+    The changes that turn `old` into `new`, by path.
+
+    Subtrees whose digests match are skipped without being visited. Dicts are compared key by
+    key, and lists are aligned on the digests of their items, so an item inserted into a list is
+    reported as added instead of every later item being reported as changed. Items that replace
+    the same number of items are compared one by one. Changes are listed in document order.
+    """
+    changes = []
+    for path, pairs in _differences(old, new, old_digests, new_digests):
+        old_node, new_node = pairs[-1]
+        if old_node is _MISSING:
+            changes.append(Change("added", path, new=new_node))
+        elif new_node is _MISSING:
+            changes.append(Change("removed", path, old=old_node))
+        else:
+            detail = _leaf_detail(old_node, new_node)
+            changes.append(Change("changed", path, old_node, new_node, detail))
+    return changes
+
+
+def changed_pairs(
+    old: Any,
+    new: Any,
+    old_digests: Optional[Dict[int, bytes]] = None,
+    new_digests: Optional[Dict[int, bytes]] = None,
+) -> List[List[Tuple[Any, Any]]]:
+    """
+    For each change of `diff_trees`, the old and new nodes that were compared on the way to it,
+    from the roots down to the changed nodes themselves. The missing side of an added or removed
+    node is a placeholder that is neither a dict nor a list.
+    """
+    return [pairs for _, pairs in _differences(old, new, old_digests, new_digests)]
+
+
+def _differences(
+    old: Any,
+    new: Any,
+    old_digests: Optional[Dict[int, bytes]],
+    new_digests: Optional[Dict[int, bytes]],
+) -> Iterator[Tuple[KeyPath, List[Tuple[Any, Any]]]]:
+    if old_digests is None:
+        old_digests = tree_digests(old)
+    if new_digests is None:
+        new_digests = tree_digests(new)
+
+    # Pairs of nodes still to compare, with their path and the pairs above them, popped in
+    # document order
+    stack: List[Tuple[Any, Any, KeyPath, Any]] = [(old, new, [], None)]
+    while stack:
+        old_node, new_node, path, above = stack.pop()
+        if (
+            old_node is not _MISSING
+            and new_node is not _MISSING
+            and node_digest(old_node, old_digests) == node_digest(new_node, new_digests)
+        ):
+            continue
+        # The pairs from the roots down, linked from the bottom up
+        chain = ((old_node, new_node), above)
+        if isinstance(old_node, dict) and isinstance(new_node, dict):
+            pending = [
+                (value, new_node[key] if key in new_node else _MISSING, [*path, key], chain)
+                for key, value in old_node.items()
+            ]
+            pending.extend(
+                (_MISSING, value, [*path, key], chain)
+                for key, value in new_node.items()
+                if key not in old_node
+            )
+            stack.extend(reversed(pending))
+        elif isinstance(old_node, list) and isinstance(new_node, list):
+            matcher = SequenceMatcher(
+                None,
+                [node_digest(item, old_digests) for item in old_node],
+                [node_digest(item, new_digests) for item in new_node],
+                autojunk=False,
+            )
+            pending = []
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag == "equal":
+                    continue
+                paired = min(i2 - i1, j2 - j1)
+                for offset in range(paired):
+                    position = i1 + offset
+                    pending.append(
+                        (old_node[position], new_node[j1 + offset], [*path, position], chain)
+                    )
+                for position in range(i1 + paired, i2):
+                    pending.append((old_node[position], _MISSING, [*path, position], chain))
+                for position in range(j1 + paired, j2):
+                    pending.append((_MISSING, new_node[position], [*path, position], chain))
+            stack.extend(reversed(pending))
+        else:
+            pairs = []
+            while chain is not None:
+                pair, chain = chain
+                pairs.append(pair)
+            pairs.reverse()
+            yield path, pairs
+
+
+def format_path(path: KeyPath) -> str:
+    """Write a path like `cv.sections.experience[2]`."""
+    parts = []
+    for key in path:
+        if isinstance(key, str) and _PLAIN_KEY.fullmatch(key):
+            parts.append(f".{key}")
+        else:
+            parts.append(f"[{json.dumps(key, ensure_ascii=False, default=str)}]")
+    return "".join(parts).lstrip(".") or "(root)"
+
+
+def _format_value(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def format_change(change: Change) -> str:
+    """Write a change on one line, followed by its detail if it has one."""
+    if change.kind == "added":
+        values = _format_value(change.new)
+    elif change.kind == "removed":
+        values = _format_value(change.old)
+    else:
+        values = f"{_format_value(change.old)} -> {_format_value(change.new)}"
+    text = f"{change.kind:<8} {format_path(change.path)}: {values}"
+    if change.detail:
+        text += "\n" + textwrap.indent(change.detail.rstrip("\n"), "    ")
+    return text
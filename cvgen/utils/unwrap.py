@@ -1,5 +1,10 @@
+from itertools import islice
 from typing import Any, Dict, Optional
 
+from cvgen.utils.filter_engine import unwrap_scope_resolver
+from cvgen.utils.scope import Scope
+from cvgen.utils.traversal import Frame, Redirect, traverse
+
 
 def unwrap_content(
     data: Any,
@@ -7,32 +12,95 @@ def unwrap_content(
     content_key: str = "content",
     config: Optional[Dict[str, Any]] = None,
 ) -> Any:
+    """
+    Replace each dict that has a content key by its content.
+
+    Parts of `data` with nothing to unwrap are returned as they are rather than copied, so the
+    result may share objects with `data` and neither should be modified in place.
+
+    The walk is recursive, which does less per node than the explicit-stack traversal. That one
+    is used instead when `data` is nested deeper than the recursion limit.
+    """
     if config is None:
         config = {}
+    if not isinstance(data, (dict, list)):
+        return data
+
+    resolver = unwrap_scope_resolver(config_key, content_key)
+
+    def visit(item: Any, scope: Scope[str]) -> Any:
+        if isinstance(item, list):
+            # The input is copied only once an element is changed
+            unwrapped = None
+            for position, element in enumerate(item):
+                result = visit(element, scope) if isinstance(element, (dict, list)) else element
+                if unwrapped is None:
+                    if result is element:
+                        continue
+                    unwrapped = item[:position]
+                unwrapped.append(result)
+            return item if unwrapped is None else unwrapped
 
-    if isinstance(data, dict):
-        if config_key in data:
-            new_config = data[config_key]
-            config = {**config, **new_config}
+        has_config = config_key in item
+        if has_config:
+            scope = resolver.child(scope, item[config_key])
+        local_content_key = scope.values
 
-        local_content_key = config.get("content_key", content_key)
+        if local_content_key in item:
+            content = item[local_content_key]
+            return visit(content, scope) if isinstance(content, (dict, list)) else content
 
-        if local_content_key in data:
-            return unwrap_content(
-                data[local_content_key],
-                config_key,
-                local_content_key,
-                config,
-            )
+        if has_config:
+            return {
+                k: visit(v, scope) if isinstance(v, (dict, list)) else v
+                for k, v in item.items()
+                if k != config_key
+            }
+        unwrapped = None
+        for position, (k, v) in enumerate(item.items()):
+            result = visit(v, scope) if isinstance(v, (dict, list)) else v
+            if unwrapped is None:
+                if result is v:
+                    continue
+                unwrapped = dict(islice(item.items(), position))
+            unwrapped[k] = result
+        return item if unwrapped is None else unwrapped
+
+    def open_node(item: Any, scope: Scope[str]) -> Any:
+        if isinstance(item, list):
+            pending = [
+                (i, element, scope)
+                for i, element in enumerate(item)
+                if isinstance(element, (dict, list))
+            ]
+            return Frame(item, pending, shared=True) if pending else item
+
+        has_config = config_key in item
+        if has_config:
+            scope = resolver.child(scope, item[config_key])
+        local_content_key = scope.values
+
+        if local_content_key in item:
+            content = item[local_content_key]
+            if isinstance(content, (dict, list)):
+                return Redirect(content, scope)
+            return content
+
+        if not has_config:
+            pending = [(k, v, scope) for k, v in item.items() if isinstance(v, (dict, list))]
+            return Frame(item, pending, shared=True) if pending else item
 
         unwrapped = {}
-        for k, v in data.items():
+        pending = []
+        for k, v in item.items():
             if k != config_key:
-                unwrapped[k] = unwrap_content(v, config_key, local_content_key, config)
-        return unwrapped
-
-    elif isinstance(data, list):
-        return [unwrap_content(item, config_key, content_key, config) for item in data]
+                if isinstance(v, (dict, list)):
+                    pending.append((k, v, scope))
+                unwrapped[k] = v
+        return Frame(unwrapped, pending) if pending else unwrapped
 
-    else:
-        return data
+    root = resolver.root(config)
+    try:
+        return visit(data, root)
+    except RecursionError:
+        return traverse(data, root, open_node)
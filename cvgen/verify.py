@@ -0,0 +1,160 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from cvgen.output import write_output
+from cvgen.profiling import profiled
+from cvgen.render import default_jobs
+from cvgen.utils.tree_diff import Change, diff_trees, node_digest, tree_digests
+from cvgen.yaml_handler import YAMLHandler
+
+DEFAULT_SNAPSHOT_NAME = "snapshot.json"
+
+# Outcomes of checking one variant against the snapshot
+OK = "ok"
+CHANGED = "changed"
+NEW = "new"
+REMOVED = "removed"
+
+
+class VerifyResult(BaseModel):
+    name: str = Field(description="Path of the output relative to the output directory")
+    status: str = Field(description=f"One of {OK}, {CHANGED}, {NEW} or {REMOVED}")
+    changes: List[Any] = Field(
+        default_factory=list,
+        description="The `Change`s from the stored output to the generated one, when it changed",
+    )
+    error: Optional[str] = Field(
+        default=None, description="Why the stored output could not be diffed, if it could not"
+    )
+
+    @property
+    def ok(self) -> bool:
+        return self.status == OK
+
+
+def load_snapshot(snapshot_file: Path) -> Dict[str, str]:
+    """The content hash of each output by its name, or nothing if there is no snapshot yet."""
+    try:
+        return json.loads(snapshot_file.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def content_hashes(outputs: Dict[Path, Any], out_dir: Path) -> Dict[str, str]:
+    """
+    The content hash of each output, by its path relative to `out_dir`.
+
+    Hashes are the Merkle digests of the data, so they do not depend on how it is formatted. The
+    variants of a build share their unchanged subtrees, and each shared subtree is hashed once.
+    """
+    digests: Dict[int, bytes] = {}
+    hashes = {}
+    for output_file, data in outputs.items():
+        tree_digests(data, digests)
+        hashes[output_name(output_file, out_dir)] = node_digest(data, digests).hex()
+    return hashes
+
+
+def output_name(output_file: Path, out_dir: Path) -> str:
+    try:
+        return Path(output_file).relative_to(out_dir).as_posix()
+    except ValueError:
+        return Path(output_file).as_posix()
+
+
+def _diff_stored(
+    yaml_handler: YAMLHandler, stored_file: Path, data: Any
+) -> Tuple[List[Change], Optional[str]]:
+    """The changes from the stored output to `data`, or why they could not be found."""
+    try:
+        return diff_trees(yaml_handler.load_from_file(stored_file), data), None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+
+# The YAML handler of a worker process, set once when the worker starts
+_worker_yaml_handler: Optional[YAMLHandler] = None
+
+
+def _start_worker(yaml_handler: YAMLHandler) -> None:
+    global _worker_yaml_handler
+    _worker_yaml_handler = yaml_handler
+
+
+def _diff_in_worker(stored_file: Path, data: Any) -> Tuple[List[Change], Optional[str]]:
+    return _diff_stored(_worker_yaml_handler, stored_file, data)
+
+
+def verify_outputs(
+    yaml_handler: YAMLHandler,
+    outputs: Dict[Path, Any],
+    out_dir: Path,
+    snapshot: Dict[str, str],
+    jobs: Optional[int] = None,
+) -> List[VerifyResult]:
+    """
+    Check every output against the hashes of `snapshot`.
+
+    Only outputs whose hash differs are compared with their stored file. When several did, they
+    are loaded and diffed by up to `jobs` worker processes. Results are in the order of `outputs`,
+    followed by the snapshot entries that are no longer built.
+    """
+    if jobs is None:
+        jobs = default_jobs()
+    if jobs < 1:
+        raise ValueError("jobs must be at least 1")
+    hashes = profiled("hash", content_hashes, outputs, out_dir)
+
+    results = []
+    mismatched = []
+    for (output_file, data), (name, digest) in zip(outputs.items(), hashes.items()):
+        stored = snapshot.get(name)
+        if stored == digest:
+            results.append(VerifyResult(name=name, status=OK))
+        elif stored is None:
+            results.append(VerifyResult(name=name, status=NEW))
+        else:
+            result = VerifyResult(name=name, status=CHANGED)
+            results.append(result)
+            mismatched.append((Path(output_file), data, result))
+    results.extend(
+        VerifyResult(name=name, status=REMOVED) for name in snapshot if name not in hashes
+    )
+
+    workers = min(jobs, len(mismatched))
+    stored_files = [stored_file for stored_file, _, _ in mismatched]
+    generated = [data for _, data, _ in mismatched]
+    if workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_start_worker, initargs=(yaml_handler,)
+        ) as pool:
+            diffs = list(pool.map(_diff_in_worker, stored_files, generated))
+    else:
+        diffs = [_diff_stored(yaml_handler, *item) for item in zip(stored_files, generated)]
+    for (_, _, result), (changes, error) in zip(mismatched, diffs):
+        result.changes = changes
+        result.error = error
+    return results
+
+
+def update_snapshot(
+    yaml_handler: YAMLHandler, outputs: Dict[Path, Any], out_dir: Path, snapshot_file: Path
+) -> List[Path]:
+    """
+    Store every output and its hash as the new snapshot, returning the files that were written.
+    Outputs whose stored content is unchanged are not written again.
+    """
+    written = []
+    for output_file, data in outputs.items():
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        if write_output(output_file, yaml_handler.dump_to_string(data)):
+            written.append(output_file)
+    hashes = profiled("hash", content_hashes, outputs, out_dir)
+    snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+    if write_output(snapshot_file, json.dumps(hashes, indent=2, sort_keys=True) + "\n"):
+        written.append(snapshot_file)
+    return written
@@ -0,0 +1,249 @@
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from cvgen.build import BuildManifest, plan_build
+from cvgen.config import FilterConfig
+from cvgen.output import write_output
+from cvgen.profiling import profiled
+from cvgen.utils.collapse import collapse_keys
+from cvgen.utils.filter_compound import filter_compound
+from cvgen.utils.filter_engine import Drop
+from cvgen.utils.tree_diff import changed_pairs, node_digest, tree_digests
+from cvgen.yaml_handler import YAMLHandler
+
+# A key that a wrapper does not have
+_MISSING = object()
+
+FileState = Optional[Tuple[int, int]]
+
+
+class SourceVersion:
+    """
+    A parsed version of the source, with the digests of its nodes and the nodes it reaches by
+    more than one path, through YAML aliases, once they are needed.
+    """
+
+    __slots__ = ("data", "_digests", "_aliased")
+
+    def __init__(self, data: Any):
+        self.data = data
+        self._digests: Optional[Dict[int, bytes]] = None
+        self._aliased: Optional[Set[int]] = None
+
+    def digests(self) -> Dict[int, bytes]:
+        if self._digests is None:
+            self._digests = tree_digests(self.data)
+        return self._digests
+
+    def digest(self) -> bytes:
+        # Versions are compared by digest, as `==` takes 1, 1.0 and true for the same value
+        return node_digest(self.data, self.digests())
+
+    def aliased(self) -> Set[int]:
+        if self._aliased is None:
+            seen: Set[int] = set()
+            self._aliased = set()
+            stack = [self.data]
+            while stack:
+                node = stack.pop()
+                if id(node) in seen:
+                    self._aliased.add(id(node))
+                seen.add(id(node))
+                children = node.values() if isinstance(node, dict) else node
+                stack.extend(child for child in children if isinstance(child, (dict, list)))
+        return self._aliased
+
+
+class FilteredVariant:
+    """A filter result, the source version it was filtered from and the wrappers it dropped."""
+
+    __slots__ = ("source", "filter_config", "filtered", "dropped")
+
+    def __init__(
+        self,
+        source: SourceVersion,
+        filter_config: FilterConfig,
+        filtered: Any,
+        dropped: Dict[int, Drop],
+    ):
+        self.source = source
+        self.filter_config = filter_config
+        self.filtered = filtered
+        self.dropped = dropped
+
+    def is_affected_by(self, changes: List[List[Tuple[Any, Any]]]) -> bool:
+        """
+        Whether filtering the new source could give another result. It cannot if every change
+        lies inside a wrapper that this stage dropped and would drop again the same way, as a
+        dropped wrapper leaves the same marker whatever its content is.
+        """
+        return not all(any(self._drops_again(old, new) for old, new in pairs) for pairs in changes)
+
+    def _drops_again(self, old: Any, new: Any) -> bool:
+        drop = self.dropped.get(id(old))
+        # A wrapper reached by several paths may only have been dropped on some of them
+        if drop is None or not isinstance(new, dict) or id(old) in self.source.aliased():
+            return False
+        content_key, verbosity_key, tags_key = drop.scope.values
+        if content_key not in new:
+            return False
+        config_key = self.filter_config.config_key
+        # The decision only depends on the wrapper's config, verbosity and tags
+        for key in (config_key, verbosity_key, tags_key):
+            if old.get(key, _MISSING) != new.get(key, _MISSING):
+                return False
+        if drop.checked_content:
+            # The tags stage keeps a wrapper whose content the verbosity stage drops, so the new
+            # content must not be one. Content with a config of its own is assumed to be.
+            content = new[content_key]
+            if content is None:
+                return False
+            if isinstance(content, dict) and (
+                config_key in content or (content_key in content and verbosity_key in content)
+            ):
+                return False
+        return True
+
+
+class IncrementalBuild:
+    """
+    A build that keeps the parsed source and every variant in memory between runs.
+
+    Each `rebuild` reloads the manifest, but the source is only parsed again when its file has
+    changed, and filter results and serialized outputs are reused for every variant whose config
+    is unchanged and whose result the change to the source cannot affect: the variants that drop
+    every wrapper the change lies in. Files are only written when their content differs.
+    """
+
+    def __init__(self, yaml_handler: YAMLHandler, load_manifest: Callable[[], BuildManifest]):
+        self.yaml_handler = yaml_handler
+        self.load_manifest = load_manifest
+        self.manifest: Optional[BuildManifest] = None
+        self.source_state: Optional[Tuple[Path, FileState]] = None
+        self.source: Optional[SourceVersion] = None
+        # Filter results by filter config, and serialized outputs by (filter, collapse) config
+        self.filtered: Dict[str, FilteredVariant] = {}
+        self.texts: Dict[Tuple[str, str], str] = {}
+        self.written: Dict[Path, str] = {}
+
+    @property
+    def data(self) -> Any:
+        return self.source.data if self.source is not None else None
+
+    def watched_files(self) -> List[Path]:
+        return [self.manifest.source] if self.manifest is not None else []
+
+    def update_source(self, source: SourceVersion) -> None:
+        """Switch to a new version of the source, forgetting the variants it affects."""
+        # Variants that were kept through earlier changes may come from older versions
+        changes_since: Dict[int, List[List[Tuple[Any, Any]]]] = {}
+        filtered = {}
+        for filter_key, variant in self.filtered.items():
+            old = variant.source
+            if id(old) not in changes_since:
+                changes_since[id(old)] = profiled(
+                    "diff", changed_pairs, old.data, source.data, old.digests(), source.digests()
+                )
+            if not variant.is_affected_by(changes_since[id(old)]):
+                filtered[filter_key] = variant
+        self.source = source
+        self.filtered = filtered
+        self.texts = {key: text for key, text in self.texts.items() if key[0] in filtered}
+
+    def rebuild(self) -> List[Path]:
+        """Bring every output up to date and return the files that were written."""
+        manifest = self.load_manifest()
+        if manifest.source is None:
+            raise ValueError("No source file given in the manifest or with --input-file")
+        self.manifest = manifest
+
+        source_state = (manifest.source, file_state(manifest.source))
+        if source_state != self.source_state:
+            data = self.yaml_handler.load_from_file(manifest.source)
+            self.source_state = source_state
+            source = SourceVersion(data)
+            if self.source is None or source.digest() != self.source.digest():
+                self.update_source(source)
+
+        filtered_by_config = {}
+        texts = {}
+        written = []
+        for stage in plan_build(manifest):
+            filter_key = stage.filter_config.model_dump_json()
+            variant = self.filtered.get(filter_key)
+            if variant is None:
+                dropped: Dict[int, Drop] = {}
+                filtered = profiled(
+                    "filter",
+                    filter_compound,
+                    self.source.data,
+                    **stage.filter_config.model_dump(),
+                    dropped=dropped,
+                )
+                variant = FilteredVariant(self.source, stage.filter_config, filtered, dropped)
+            filtered_by_config[filter_key] = variant
+
+            for target in stage.targets:
+                text_key = (filter_key, target.collapse_config.model_dump_json())
+                text = self.texts.get(text_key)
+                if text is None:
+                    text = self.yaml_handler.dump_to_string(
+                        profiled(
+                            "collapse",
+                            collapse_keys,
+                            variant.filtered,
+                            **target.collapse_config.model_dump(),
+                        )
+                    )
+                texts[text_key] = text
+
+                if self.written.get(target.output_file) != text:
+                    target.output_file.parent.mkdir(parents=True, exist_ok=True)
+                    if write_output(target.output_file, text):
+                        written.append(target.output_file)
+                    self.written[target.output_file] = text
+
+        # Variants that are no longer in the manifest are forgotten
+        self.filtered = filtered_by_config
+        self.texts = texts
+        return written
+
+
+def file_state(path: Path) -> FileState:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def watch_files(
+    get_paths: Callable[[], List[Path]],
+    on_change: Callable[[], None],
+    interval: float = 0.2,
+    debounce: float = 0.3,
+    should_stop: Callable[[], bool] = lambda: False,
+) -> None:
+    """
+    Poll the files returned by `get_paths` and call `on_change` after they change.
+
+    A burst of changes, such as an editor writing a file in several steps, results in one call
+    once the files have been left alone for `debounce` seconds. `get_paths` is asked again after
+    every call, so the set of watched files can change.
+    """
+    paths = get_paths()
+    states = {path: file_state(path) for path in paths}
+    changed_at = None
+    while not should_stop():
+        time.sleep(interval)
+        current = {path: file_state(path) for path in paths}
+        if current != states:
+            states = current
+            changed_at = time.monotonic()
+        elif changed_at is not None and time.monotonic() - changed_at >= debounce:
+            changed_at = None
+            on_change()
+            paths = get_paths()
+            states = {path: file_state(path) for path in paths}
@@ -1,9 +1,9 @@
+import os
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict
+from typing import IO, Any, Dict, Iterator, Optional, TextIO, Type
 
 import yaml
-from ruamel.yaml import YAML
 
 
 class YAMLHandler(ABC):
@@ -15,33 +15,80 @@ class YAMLHandler(ABC):
     def load_from_string(self, content: str) -> Dict:
         pass
 
+    @abstractmethod
+    def load_all_from_stream(self, stream: IO) -> Iterator[Any]:
+        """Load the '---' separated documents of `stream` one at a time, as they are read."""
+
     @abstractmethod
     def dump_to_string(self, data: Dict) -> str:
         pass
 
     @abstractmethod
+    def dump_to_stream(self, data: Dict, stream: TextIO, explicit_start: bool = False) -> None:
+        """
+        Write `data` as one document. With `explicit_start`, it starts with '---' so that it can
+        follow other documents in the same stream.
+        """
+
     def dump_to_file(self, data: Dict, file_path: Path) -> None:
-        pass
+        with open(file_path, "w", encoding="utf-8") as file:
+            self.dump_to_stream(data, file)
+
+
+class _UnaliasedDumper(yaml.SafeDumper):
+    """
+    Writes a value that appears more than once in full each time. The stages share unchanged
+    subtrees with their input, so an input that used YAML aliases would otherwise get anchors and
+    aliases in its output wherever those subtrees are kept.
+    """
+
+    def ignore_aliases(self, data: Any) -> bool:
+        return True
 
 
 class PyYAMLHandler(YAMLHandler):
+    """
+    PyYAML with the libyaml C loader, or the pure-Python one when it is missing. Output is always
+    written by the pure-Python dumper, as libyaml escapes characters outside the BMP and leaves out
+    the '...' that ends a document whose root is a scalar.
+    """
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    dumper = _UnaliasedDumper
+
     def load_from_file(self, file_path: Path) -> Dict:
         with open(file_path, "r", encoding="utf-8") as file:
-            return yaml.safe_load(file)
+            return yaml.load(file, Loader=self.loader)
 
     def load_from_string(self, content: str) -> Dict:
-        return yaml.safe_load(content)
+        return yaml.load(content, Loader=self.loader)
+
+    def load_all_from_stream(self, stream: IO) -> Iterator[Any]:
+        return yaml.load_all(stream, Loader=self.loader)
 
     def dump_to_string(self, data: Dict) -> str:
-        return yaml.dump(data, allow_unicode=True, sort_keys=False)
+        return yaml.dump(data, Dumper=self.dumper, allow_unicode=True, sort_keys=False)
 
-    def dump_to_file(self, data: Dict, file_path: Path) -> None:
-        with open(file_path, "w", encoding="utf-8") as file:
-            yaml.dump(data, file, allow_unicode=True, sort_keys=False)
+    def dump_to_stream(self, data: Dict, stream: TextIO, explicit_start: bool = False) -> None:
+        yaml.dump(
+            data,
+            stream,
+            Dumper=self.dumper,
+            allow_unicode=True,
+            sort_keys=False,
+            explicit_start=explicit_start,
+        )
+
+
+class PurePyYAMLHandler(PyYAMLHandler):
+    loader = yaml.SafeLoader
 
 
 class RuamelYAMLHandler(YAMLHandler):
     def __init__(self):
+        # Only imported when the ruamel engine is used, as it is slow to import
+        from ruamel.yaml import YAML
+
         self.yaml = YAML()
         self.yaml.preserve_quotes = True
         self.yaml.width = 4294967295  # Set to a very large number to prevent line wrapping
@@ -53,17 +100,61 @@ class RuamelYAMLHandler(YAMLHandler):
     def load_from_string(self, content: str) -> Dict:
         return self.yaml.load(content)
 
+    def load_all_from_stream(self, stream: IO) -> Iterator[Any]:
+        return self.yaml.load_all(stream)
+
     def dump_to_string(self, data: Dict) -> str:
         from io import StringIO
 
         string_stream = StringIO()
-        self.yaml.dump(data, string_stream)
+        self.dump_to_stream(data, string_stream)
         return string_stream.getvalue()
 
-    def dump_to_file(self, data: Dict, file_path: Path) -> None:
-        with open(file_path, "w", encoding="utf-8") as file:
-            self.yaml.dump(data, file)
+    def dump_to_stream(self, data: Dict, stream: TextIO, explicit_start: bool = False) -> None:
+        self.yaml.explicit_start = explicit_start
+        self.yaml.dump(data, stream)
+
+
+YAML_ENGINE_ENV = "CVGEN_YAML_ENGINE"
+DEFAULT_YAML_ENGINE = "pyyaml"
+
+YAML_ENGINES: Dict[str, Type[YAMLHandler]] = {
+    "pyyaml": PyYAMLHandler,
+    "pyyaml-pure": PurePyYAMLHandler,
+    "ruamel": RuamelYAMLHandler,
+}
+
+_handlers: Dict[str, YAMLHandler] = {}
+_selected_engine: Optional[str] = None
+
+
+def register_yaml_engine(name: str, handler_class: Type[YAMLHandler]) -> None:
+    YAML_ENGINES[name] = handler_class
+    _handlers.pop(name, None)
+
+
+def select_yaml_engine(name: Optional[str]) -> None:
+    """Set the engine `get_yaml_handler` uses when none is asked for; None restores the default."""
+    if name is not None and name not in YAML_ENGINES:
+        raise ValueError(f"Unknown YAML engine '{name}'. Use one of: {', '.join(YAML_ENGINES)}")
+    global _selected_engine
+    _selected_engine = name
+
+
+def yaml_engine_name(engine: Optional[str] = None) -> str:
+    """
+    The engine `get_yaml_handler(engine)` uses: `engine`, or else the selected engine, the
+    CVGEN_YAML_ENGINE environment variable and then "pyyaml".
+    """
+    return engine or _selected_engine or os.environ.get(YAML_ENGINE_ENV) or DEFAULT_YAML_ENGINE
 
 
-def get_yaml_handler() -> YAMLHandler:
-    return PyYAMLHandler()
+def get_yaml_handler(engine: Optional[str] = None) -> YAMLHandler:
+    """Return the handler for `engine`, see `yaml_engine_name`. Handlers are created once."""
+    name = yaml_engine_name(engine)
+    handler = _handlers.get(name)
+    if handler is None:
+        if name not in YAML_ENGINES:
+            raise ValueError(f"Unknown YAML engine '{name}'. Use one of: {', '.join(YAML_ENGINES)}")
+        handler = _handlers[name] = YAML_ENGINES[name]()
+    return handler
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import pytest
+import yaml
+
+from cvgen.batch import batch_input_files, batch_output_file, format_summary, run_batch
+from cvgen.config import CollapseConfig, FilterConfig
+from cvgen.pipeline import Pipeline
+
+pipeline = Pipeline([FilterConfig(), CollapseConfig(user_key="ko")])
+
+cv = """\
+multi_lang_config: {lang_keys: [en, ko], default_lang: en}
+highlights:
+- {content: {en: Short, ko: 짧은}, verbosity: 1.0}
+- {content: {en: Long, ko: 긴}, verbosity: 2.0}
+"""
+
+
+def test_batch_input_files(tmp_path):
+    for name in ["b.yml", "a.yaml", "c.json", "notes.txt"]:
+        (tmp_path / name).write_text("{}")
+    assert batch_input_files(tmp_path) == [
+        tmp_path / "a.yaml",
+        tmp_path / "b.yml",
+        tmp_path / "c.json",
+    ]
+    assert batch_input_files(tmp_path, "yaml") == [tmp_path / "a.yaml", tmp_path / "b.yml"]
+
+
+def test_batch_output_file():
+    assert batch_output_file(Path("in/cv.yml"), Path("out")) == Path("out/cv.yml")
+    assert batch_output_file(Path("in/cv.json"), Path("out")) == Path("out/cv.yaml")
+    assert batch_output_file(Path("in/cv.yaml"), Path("out"), "json") == Path("out/cv.json")
+
+
+def test_run_batch_isolates_failures(tmp_path):
+    files = [tmp_path / name for name in ["cv_en.yaml", "cv_bad.yaml", "team.yaml"]]
+    files[0].write_text(cv)
+    files[1].write_text("highlights: [\n")
+    files[2].write_text(f"{cv}---\n{cv}")
+
+    results = run_batch(files, tmp_path / "out", pipeline, jobs=2)
+
+    assert [r.input_file for r in results] == files
+    assert [r.ok for r in results] == [True, False, True]
+    assert "ParserError" in results[1].error
+    assert yaml.safe_load(results[0].output_file.read_text()) == {"highlights": ["짧은"]}
+    assert (
+        list(yaml.safe_load_all(results[2].output_file.read_text()))
+        == [{"highlights": ["짧은"]}] * 2
+    )
+    assert not results[1].output_file.exists()
+
+
+def test_run_batch_rejects_clashing_outputs(tmp_path):
+    with pytest.raises(ValueError, match="would be written to"):
+        run_batch([tmp_path / "a/cv.yaml", tmp_path / "b/cv.yaml"], tmp_path / "out", pipeline)
+    with pytest.raises(ValueError, match="overwrite input files"):
+        run_batch([tmp_path / "cv.yaml"], tmp_path, pipeline)
+    with pytest.raises(ValueError):
+        run_batch([tmp_path / "cv.yaml"], tmp_path / "out", pipeline, jobs=0)
+
+
+def test_format_summary(tmp_path):
+    (tmp_path / "cv.yaml").write_text(cv)
+    results = run_batch([tmp_path / "cv.yaml"], tmp_path / "out", pipeline, jobs=1)
+    summary = format_summary(results, elapsed=1.5)
+    assert summary.splitlines()[-1].startswith("Processed 1/1 files in 1.50s")
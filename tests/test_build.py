@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from cvgen.build import BuildManifest, TagSet, plan_build, run_build
+from cvgen.utils.collapse import collapse_keys
+from cvgen.utils.filter_compound import filter_compound
+
+data = {
+    "multi_lang_config": {"lang_keys": ["en", "ko"], "default_lang": "en"},
+    "highlights": [
+        {"content": {"en": "Short", "ko": "짧은"}, "verbosity": 1.0},
+        {"content": {"en": "Long", "ko": "긴"}, "verbosity": 2.0, "tags": ["detail"]},
+    ],
+}
+
+
+def test_plan_build_shares_filter_stages():
+    manifest = BuildManifest(
+        languages=["en", "ko"],
+        verbosity=[1.0, 2.0],
+        tag_sets={"all": TagSet(), "brief": TagSet(exclude_tags=["detail"])},
+        out_dir=Path("out"),
+    )
+    stages = plan_build(manifest)
+
+    assert len(stages) == 4
+    assert [t.lang for t in stages[0].targets] == ["en", "ko"]
+    assert stages[1].filter_config.target_verbosity == 1.0
+    assert stages[1].filter_config.exclude_tags == ["detail"]
+    assert stages[1].targets[1].output_file == Path("out/cv_ko_1_brief.yaml")
+    assert stages[1].targets[1].collapse_config.user_key == "ko"
+
+
+def test_run_build_matches_filter_then_collapse():
+    manifest = BuildManifest(
+        languages=["en", "ko"],
+        verbosity=[2.0],
+        tag_sets={"brief": TagSet(exclude_tags=["detail"])},
+        output_template="{lang}.yaml",
+    )
+    outputs = run_build(data, plan_build(manifest))
+
+    filtered = filter_compound(data, target_verbosity=2.0, exclude_tags=["detail"])
+    assert outputs == {
+        Path("en.yaml"): collapse_keys(
+            filtered, "multi_lang_config", "lang_keys", "default_lang", "en"
+        ),
+        Path("ko.yaml"): collapse_keys(
+            filtered, "multi_lang_config", "lang_keys", "default_lang", "ko"
+        ),
+    }
+    assert outputs[Path("ko.yaml")] == {"highlights": ["짧은"]}
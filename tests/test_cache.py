@@ -0,0 +1,49 @@
+import os
+
+from cvgen.cache import ResultCache
+from cvgen.config import CollapseConfig, FilterConfig
+from cvgen.yaml_handler import select_yaml_engine
+
+
+def test_key_depends_on_command_source_and_config(tmp_path):
+    cache = ResultCache(tmp_path)
+    key = cache.key("filter", b"a: 1\n", FilterConfig())
+
+    assert key == cache.key("filter", b"a: 1\n", FilterConfig())
+    assert key != cache.key("filter", b"a: 2\n", FilterConfig())
+    assert key != cache.key("filter", b"a: 1\n", FilterConfig(target_verbosity=2.0))
+    assert key != cache.key("collapse", b"a: 1\n", CollapseConfig())
+
+
+def test_key_depends_on_yaml_engine(tmp_path, monkeypatch):
+    monkeypatch.delenv("CVGEN_YAML_ENGINE", raising=False)
+    cache = ResultCache(tmp_path)
+    key = cache.key("filter", b"a: 1\n", FilterConfig())
+    select_yaml_engine("ruamel")
+    try:
+        assert cache.key("filter", b"a: 1\n", FilterConfig()) != key
+    finally:
+        select_yaml_engine(None)
+
+
+def test_get_returns_stored_content(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    assert cache.get("missing") is None
+
+    cache.put("k", b"a: 1\n")
+    assert cache.get("k") == b"a: 1\n"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=20)
+    cache.put("old", b"x" * 8)
+    cache.put("used", b"y" * 8)
+    os.utime(tmp_path / "old.bin", (1, 1))
+    os.utime(tmp_path / "used.bin", (2, 2))
+    assert cache.get("used") is not None
+
+    cache.put("new", b"z" * 8)
+
+    assert cache.get("old") is None
+    assert cache.get("used") == b"y" * 8
+    assert cache.get("new") == b"z" * 8
@@ -1,6 +1,8 @@
+import sys
+
 import pytest
 
-from cvgen.utils.collapse import collapse_keys
+from cvgen.utils.collapse import collapse_all_keys, collapse_keys, find_collapsible_keys
 
 
 def test_simple_collapse():
@@ -168,3 +170,102 @@ def test_missing_user_key_fallback():
         raise_on_missing_user_key=False,
     )
     assert result == {"greeting": "Hello"}
+
+
+def test_deeply_nested_structure():
+    depth = sys.getrecursionlimit() * 2
+    data = {"en": "Hello", "es": "Hola"}
+    for _ in range(depth):
+        data = {"nested": [data]}
+    config = {"collapsible_keys": ["en", "es"], "default_key": "en"}
+    result = collapse_keys(data, "config", "collapsible_keys", "default_key", "es", config)
+    for _ in range(depth):
+        result = result["nested"][0]
+    assert result == "Hola"
+
+
+def test_collapse_all_keys_matches_collapse_keys():
+    data = {
+        "config": {"collapsible_keys": ["en", "es", "fr"], "default_key": "en"},
+        "greeting": {"en": "Hello", "es": "Hola", "fr": "Bonjour"},
+        "items": [{"en": "One", "fr": "Un"}, "plain", {"nested": {"en": "Two", "es": "Dos"}}],
+        "section": {
+            "config": {"collapsible_keys": ["en", "es", "fr", "de"]},
+            "title": {"en": "Title", "de": "Titel"},
+        },
+    }
+    results = collapse_all_keys(data, "config", "collapsible_keys", "default_key")
+    assert list(results) == ["en", "es", "fr"]
+    for user_key, result in results.items():
+        assert result == collapse_keys(data, "config", "collapsible_keys", "default_key", user_key)
+
+
+def test_collapse_all_keys_shares_unchanged_parts():
+    data = {
+        "config": {"collapsible_keys": ["en", "es"], "default_key": "en"},
+        "greeting": {"en": "Hello", "es": "Hola"},
+        "contact": {"email": "someone@example.com", "links": ["a", "b"]},
+        "name": {"en": "Name"},
+    }
+    results = collapse_all_keys(data, "config", "collapsible_keys", "default_key")
+    assert results["en"]["greeting"] == "Hello"
+    assert results["es"]["greeting"] == "Hola"
+    assert results["en"]["contact"] is results["es"]["contact"]
+    assert results["es"]["name"] == "Name"
+
+
+def test_collapse_all_keys_given_user_keys():
+    data = {"greeting": {"en": "Hello", "es": "Hola"}}
+    config = {"collapsible_keys": ["en", "es"], "default_key": "en"}
+    results = collapse_all_keys(data, "config", "collapsible_keys", "default_key", ["es"], config)
+    assert results == {"es": {"greeting": "Hola"}}
+
+    with pytest.raises(ValueError, match="user_key='fr' is not in collapsible_keys="):
+        collapse_all_keys(data, "config", "collapsible_keys", "default_key", ["es", "fr"], config)
+    results = collapse_all_keys(
+        data,
+        "config",
+        "collapsible_keys",
+        "default_key",
+        ["es", "fr"],
+        config,
+        raise_on_missing_user_key=False,
+    )
+    assert results == {"es": {"greeting": "Hola"}, "fr": {"greeting": "Hello"}}
+
+
+def test_collapse_all_keys_errors():
+    config = {"collapsible_keys": ["en", "es"], "default_key": "en"}
+    with pytest.raises(ValueError, match="both collapsible keys and other keys"):
+        collapse_all_keys(
+            {"x": {"en": "a", "other": 1}},
+            "config",
+            "collapsible_keys",
+            "default_key",
+            None,
+            config,
+        )
+    with pytest.raises(ValueError, match="does not have values"):
+        collapse_all_keys({"x": {}}, "config", "collapsible_keys", "default_key", None, config)
+
+
+def test_find_collapsible_keys():
+    data = {"a": [{"config": {"keys": ["ko", "en"]}}], "b": {"config": {"keys": ["fr"]}}}
+    assert find_collapsible_keys(data, "config", "keys") == ["ko", "en"]
+    assert find_collapsible_keys(data, "config", "keys", {"keys": ["de"]}) == ["de"]
+    assert find_collapsible_keys({"a": 1}, "config", "keys") == []
+    assert collapse_all_keys({"a": 1}, "config", "keys", "default") == {}
+
+
+def test_collapse_all_keys_deeply_nested_structure():
+    depth = sys.getrecursionlimit() * 2
+    data = {"en": "Hello", "es": "Hola"}
+    for _ in range(depth):
+        data = {"nested": [data]}
+    config = {"collapsible_keys": ["en", "es"], "default_key": "en"}
+    result = collapse_all_keys(data, "config", "collapsible_keys", "default_key", None, config)[
+        "es"
+    ]
+    for _ in range(depth):
+        result = result["nested"][0]
+    assert result == "Hola"
@@ -0,0 +1,102 @@
+import io
+import json
+
+import pytest
+
+from cvgen import explain
+from cvgen.explain import node_paths, start_explaining, stop_explaining
+from cvgen.utils.collapse import collapse_all_keys, collapse_keys
+from cvgen.utils.filter_compound import filter_compound
+
+
+@pytest.fixture(autouse=True)
+def no_leftover_tracer():
+    yield
+    explain._active = None
+
+
+data = {
+    "multi_lang_config": {"lang_keys": ["en", "ko"], "default_lang": "en"},
+    "items": [
+        {"content": "short", "verbosity": 1.0},
+        {"content": "long", "verbosity": 2.0},
+        {"content": "draft", "tags": ["draft"]},
+    ],
+    "title": {"en": "Title", "ko": "제목"},
+    "note": {"en": "Only English"},
+}
+
+
+def trace(function, *args, **kwargs):
+    stream = io.StringIO()
+    start_explaining(stream)
+    function(*args, **kwargs)
+    stop_explaining()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_node_paths():
+    shared = {"x": 1}
+    tree = {"a": [{"b": shared}], "c": shared}
+    assert node_paths(tree, {id(shared), id(tree)}) == {
+        id(tree): [],
+        id(shared): ["a", 0, "b"],
+    }
+
+
+def test_filter_decisions():
+    records = trace(filter_compound, data, target_verbosity=1.0, exclude_tags=["draft"])
+    assert [(r["path"], r["action"], r["reason"]) for r in records] == [
+        (["items", 0], "keep", "verbosity"),
+        (["items", 1], "drop", "verbosity"),
+        (["items", 2], "drop", "tags"),
+    ]
+    assert records[1] == {
+        "stage": "filter",
+        "path": ["items", 1],
+        "action": "drop",
+        "reason": "verbosity",
+        "verbosity": 2.0,
+        "target_verbosity": 1.0,
+    }
+    assert records[2]["tags"] == ["draft"]
+
+
+def test_nested_wrapper_is_recorded_once():
+    nested = {"a": {"content": {"content": "x", "tags": ["t"]}, "verbosity": 1.0, "tags": ["t"]}}
+    records = trace(filter_compound, nested, target_verbosity=1.0, include_tags=["t"])
+    assert [(r["path"], r["action"], r["reason"]) for r in records] == [
+        (["a"], "keep", "verbosity"),
+        (["a"], "keep", "tags"),
+        (["a", "content"], "keep", "tags"),
+    ]
+
+
+def test_records_of_a_failed_stage_are_written_with_it():
+    stream = io.StringIO()
+    tracer = start_explaining(stream)
+    broken = [{"content": "a", "verbosity": 1.0}, {"content": "b", "verbosity": "high"}]
+    with pytest.raises(TypeError):
+        filter_compound(broken, target_verbosity=1.0)
+    assert tracer.records == []
+    assert [json.loads(line)["stage"] for line in stream.getvalue().splitlines()] == ["filter"]
+
+
+def test_collapse_decisions():
+    records = trace(collapse_keys, data, "multi_lang_config", "lang_keys", "default_lang", "ko")
+    assert [(r["path"], r["reason"], r["key"]) for r in records] == [
+        (["title"], "user_key", "ko"),
+        (["note"], "default", "en"),
+    ]
+    records = trace(collapse_all_keys, data, "multi_lang_config", "lang_keys", "default_lang")
+    assert [(r["path"], r["user_key"], r["key"]) for r in records] == [
+        (["title"], "en", "en"),
+        (["title"], "ko", "ko"),
+        (["note"], "en", "en"),
+        (["note"], "ko", "en"),
+    ]
+
+
+def test_nothing_is_recorded_when_off():
+    assert explain.active_tracer() is None
+    assert filter_compound(data, target_verbosity=1.0)["items"] == ["short", "draft"]
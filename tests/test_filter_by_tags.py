@@ -204,3 +204,18 @@ def test_none_data():
 
 
 # Add more tests as needed
+
+
+def test_tag_expr():
+    result = filter_by_tags(list_of_dicts, tag_expr="(b & !a) | d")
+    assert result == ["Item 2", "Item 3"]
+
+
+def test_tag_expr_with_include_tags():
+    result = filter_by_tags(list_of_dicts, include_tags=["c"], tag_expr="!d")
+    assert result == ["Item 2"]
+
+
+def test_invalid_tag_expr():
+    with pytest.raises(ValueError):
+        filter_by_tags(simple_dict, tag_expr="greeting &")
@@ -1,8 +1,12 @@
+import sys
 from typing import Any
 
 import pytest
 
+from cvgen.utils.filter_by_tags import _filter_by_tags
+from cvgen.utils.filter_by_verbosity import _filter_by_verbosity
 from cvgen.utils.filter_compound import filter_compound
+from cvgen.utils.unwrap import unwrap_content
 
 
 @pytest.fixture
@@ -203,3 +207,66 @@ def test_filter_compound_custom_keys():
         tags_key="custom_tags",
     )
     assert result["custom_content"]["item"]["custom_content"] == "Custom content"
+
+
+def _filter_sequentially(data: Any, target_verbosity: float, **tag_options: Any) -> Any:
+    filtered = _filter_by_verbosity(data, target_verbosity=target_verbosity)
+    if filtered is None:
+        return None
+    return unwrap_content(_filter_by_tags(filtered, **tag_options))
+
+
+@pytest.mark.parametrize(
+    "target_verbosity, tag_options",
+    [
+        (1.0, {}),
+        (0.7, {}),
+        (2.0, {"include_tags": ["important"]}),
+        (2.0, {"exclude_tags": ["verbose"]}),
+        (2.0, {"include_tags": ["short"], "exclude_tags": ["list"]}),
+        (2.0, {"include_tags": ["important", "short"], "include_mode": "all"}),
+        (2.0, {"exclude_tags": ["verbose", "detailed"], "exclude_mode": "all"}),
+    ],
+)
+def test_filter_compound_matches_sequential_filters(
+    sample_data: dict[str, Any], target_verbosity: float, tag_options: dict[str, Any]
+):
+    expected = _filter_sequentially(sample_data, target_verbosity, **tag_options)
+    assert (
+        filter_compound(sample_data, target_verbosity=target_verbosity, **tag_options) == expected
+    )
+
+
+def test_filter_compound_wrapper_with_dropped_content():
+    data = {
+        "tagged": {"content": {"content": "x", "verbosity": 2.0}, "verbosity": 0.5, "tags": []},
+        "untagged": {"content": {"content": "x", "verbosity": 2.0}, "verbosity": 0.5},
+        "empty": [{"content": None}],
+    }
+    result = filter_compound(data, target_verbosity=1.0)
+    assert result == _filter_sequentially(data, 1.0)
+    assert result == {"tagged": None, "untagged": {"verbosity": 0.5}, "empty": [{}]}
+
+
+def test_filter_compound_tag_expr(sample_data: dict[str, Any]):
+    result = filter_compound(sample_data, target_verbosity=2.0, tag_expr="short & !list")
+    assert result["level1"] == {"level2a": "This is level 2a content"}
+    assert result["level1_list"] == []
+
+
+def test_filter_compound_deeply_nested():
+    depth = sys.getrecursionlimit() * 2
+    data: Any = "leaf"
+    for _ in range(depth):
+        data = {"content": {"item": data}, "verbosity": 0.5, "tags": ["keep"]}
+    result = filter_compound(data, target_verbosity=1.0, include_tags=["keep"])
+    for _ in range(depth):
+        result = result["item"]
+    assert result == "leaf"
+
+
+def test_filter_compound_deep_wrapper_chain():
+    data: Any = "leaf"
+    for _ in range(sys.getrecursionlimit() * 2):
+        data = {"content": data, "verbosity": 0.5}
+    assert filter_compound(data, target_verbosity=1.0) == "leaf"
@@ -0,0 +1,131 @@
+import datetime
+import importlib.util
+import io
+
+import pytest
+import yaml
+
+from cvgen.formats import detect_format, dump_data, dump_data_to_stream, load_data, load_documents
+from cvgen.yaml_handler import get_yaml_handler
+
+data = {"name": {"en": "Name", "ko": "이름"}, "highlights": ["a", "b"], "verbosity": 1.5}
+has_msgpack = importlib.util.find_spec("msgpack") is not None
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        (b"name: x\n", "yaml"),
+        (b"", "yaml"),
+        (b'  {"name": "x"}', "json"),
+        (b"[1, 2]", "json"),
+        (b"\x81\xa4name\xa1x", "msgpack"),
+        # Valid UTF-8 text starting with a non-ASCII character is still YAML
+        ("이름: x\n".encode("utf-8"), "yaml"),
+    ],
+)
+def test_detect_format(source, expected):
+    assert detect_format(source) == expected
+
+
+@pytest.mark.parametrize("data_format", ["yaml", "json"])
+def test_round_trip(data_format):
+    yaml_handler = get_yaml_handler()
+    source = dump_data(data, data_format, yaml_handler)
+    assert load_data(source, data_format, yaml_handler) == data
+    assert load_data(source, None, yaml_handler) == data
+
+
+@pytest.mark.parametrize("engine", ["pyyaml", "ruamel"])
+def test_yaml_documents_round_trip(engine):
+    handler = get_yaml_handler(engine)
+    documents = [data, ["a"], {"b": None}]
+    stream = io.StringIO()
+    for index, document in enumerate(documents):
+        dump_data_to_stream(document, "yaml", handler, stream, explicit_start=index > 0)
+    source = io.BytesIO(stream.getvalue().encode("utf-8"))
+    assert list(load_documents(source, None, handler)) == documents
+
+
+@pytest.mark.parametrize("input_format", ["json", None])
+def test_json_documents_round_trip(input_format):
+    handler = get_yaml_handler()
+    documents = [data, ["a\nb"], None, "text"]
+    stream = io.StringIO()
+    for document in documents:
+        dump_data_to_stream(document, "json", handler, stream)
+    # One document per line
+    assert stream.getvalue().count("\n") == len(documents)
+    source = io.BytesIO(stream.getvalue().encode("utf-8"))
+    assert list(load_documents(source, input_format, handler)) == documents
+
+
+def test_load_documents_reads_one_document_at_a_time():
+    source = io.BytesIO(b"a: 1\n---\nb: [\n")
+    documents = load_documents(source, None, get_yaml_handler())
+    # The broken second document is only parsed when it is asked for
+    assert next(documents) == {"a": 1}
+    with pytest.raises(yaml.YAMLError):
+        next(documents)
+
+
+def test_detect_format_ignores_a_character_cut_off_at_the_end():
+    # U+0700 is encoded from 0xDC, which also starts a MessagePack array
+    source = "\u0700: a이".encode("utf-8")
+    assert detect_format(source[:-1]) == "msgpack"
+    assert detect_format(source[:-1], truncated=True) == "yaml"
+    assert detect_format(b"\xdc\x00\x01\xc0", truncated=True) == "msgpack"
+
+
+def test_load_documents_detects_yaml_cut_inside_a_character():
+    # The bytes used for detection end in the middle of a character
+    source = ("\u0700: a" + "이" * 2000 + "\n").encode("utf-8")
+    documents = load_documents(io.BytesIO(source), None, get_yaml_handler())
+    assert list(documents) == [{"\u0700": "a" + "이" * 2000}]
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [(b"", [None]), (b'{"a": 1}', [{"a": 1}]), (b"{a: 1}\n---\n{b: 2}\n", [{"a": 1}, {"b": 2}])],
+)
+def test_load_documents_single_document_formats(source, expected):
+    assert list(load_documents(io.BytesIO(source), None, get_yaml_handler())) == expected
+
+
+def test_flow_yaml_is_not_mistaken_for_json():
+    assert load_data(b"{name: x}", None, get_yaml_handler()) == {"name": "x"}
+
+
+def test_json_writes_dates_as_strings():
+    source = dump_data({"date": datetime.date(2024, 1, 31)}, "json", get_yaml_handler())
+    assert source == b'{"date": "2024-01-31"}\n'
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match="Unknown format"):
+        dump_data(data, "xml", get_yaml_handler())
+
+
+@pytest.mark.skipif(not has_msgpack, reason="msgpack is not installed")
+def test_msgpack_round_trip():
+    yaml_handler = get_yaml_handler()
+    source = dump_data(data, "msgpack", yaml_handler)
+    assert detect_format(source) == "msgpack"
+    assert load_data(source, None, yaml_handler) == data
+
+
+@pytest.mark.skipif(not has_msgpack, reason="msgpack is not installed")
+def test_msgpack_documents_round_trip():
+    handler = get_yaml_handler()
+    documents = [data, ["a"], None]
+    stream = io.BytesIO()
+    for document in documents:
+        dump_data_to_stream(document, "msgpack", handler, stream)
+    source = io.BytesIO(stream.getvalue())
+    assert list(load_documents(source, None, handler)) == documents
+
+
+@pytest.mark.skipif(has_msgpack, reason="msgpack is installed")
+def test_msgpack_without_package():
+    with pytest.raises(ValueError, match="needs the 'msgpack' package"):
+        dump_data(data, "msgpack", get_yaml_handler())
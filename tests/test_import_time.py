@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+# Cold-start budget for `import cvgen.cli`, in microseconds of cumulative import time. It can be
+# raised on slow machines with CVGEN_IMPORT_BUDGET_US.
+IMPORT_BUDGET_US = int(os.environ.get("CVGEN_IMPORT_BUDGET_US", "750000"))
+
+# Modules that only some commands need, and that must not be imported at startup
+LAZY_MODULES = [
+    "deepdiff",
+    "ruamel.yaml",
+    "cvgen.batch",
+    "cvgen.build",
+    "cvgen.cache",
+    "cvgen.explain",
+    "cvgen.pipeline",
+    "cvgen.render",
+    "cvgen.streaming",
+    "cvgen.watch",
+    "cvgen.utils.collapse",
+    "cvgen.utils.filter_compound",
+    "cvgen.utils.tag_index",
+    "cvgen.utils.tree_diff",
+    "cvgen.verify",
+]
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *options, "-c", code], capture_output=True, text=True, check=True
+    )
+
+
+def cumulative_import_time(module: str) -> int:
+    stderr = run_python(f"import {module}", "-X", "importtime").stderr
+    for line in stderr.splitlines():
+        _, _, cumulative, name = (part.strip() for part in line.replace("|", ":").split(":"))
+        if name == module:
+            return int(cumulative)
+    raise AssertionError(f"{module} not found in -X importtime output")
+
+
+def test_cli_does_not_import_command_specific_modules():
+    imported = run_python(
+        f"import sys, cvgen.cli; print(*[m for m in {LAZY_MODULES!r} if m in sys.modules])"
+    ).stdout.split()
+    assert imported == []
+
+
+def test_cli_import_time_budget():
+    # The fastest of a few runs, so that a busy machine does not fail the test
+    best = min(cumulative_import_time("cvgen.cli") for _ in range(3))
+    assert best <= IMPORT_BUDGET_US, f"importing cvgen.cli took {best} us"
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from cvgen.output import atomic_open, write_data, write_output
+from cvgen.yaml_handler import get_yaml_handler
+
+
+def test_write_output_skips_identical_content(tmp_path):
+    output_file = tmp_path / "out.yaml"
+    assert write_output(output_file, "a: 1\n")
+    assert not write_output(output_file, "a: 1\n")
+    assert write_output(output_file, "a: 2\n")
+    assert output_file.read_text() == "a: 2\n"
+
+
+def test_atomic_open_keeps_old_file_on_failure(tmp_path):
+    output_file = tmp_path / "out.yaml"
+    output_file.write_text("old\n")
+    os.chmod(output_file, 0o644)
+
+    with pytest.raises(RuntimeError):
+        with atomic_open(output_file) as file:
+            file.write("partial")
+            raise RuntimeError
+
+    assert output_file.read_text() == "old\n"
+    assert os.listdir(tmp_path) == ["out.yaml"]
+
+    with atomic_open(output_file) as file:
+        file.write("new\n")
+    assert output_file.read_text() == "new\n"
+    assert os.stat(output_file).st_mode & 0o777 == 0o644
+
+
+def test_atomic_open_applies_current_umask_to_new_files(tmp_path, monkeypatch):
+    previous = os.umask(0o027)
+    try:
+
+        def fail(mask):
+            raise AssertionError("os.umask called while writing")
+
+        monkeypatch.setattr(os, "umask", fail)
+        output_file = tmp_path / "new.yaml"
+        with atomic_open(output_file) as file:
+            file.write("new\n")
+    finally:
+        monkeypatch.undo()
+        os.umask(previous)
+    assert os.stat(output_file).st_mode & 0o777 == 0o640
+
+
+def test_write_data_matches_dump_to_string(tmp_path, capsys):
+    yaml_handler = get_yaml_handler()
+    data = {"name": "이름", "items": [1, 2]}
+    expected = yaml_handler.dump_to_string(data)
+
+    write_data(yaml_handler, data, tmp_path / "out.yaml")
+    assert (tmp_path / "out.yaml").read_text(encoding="utf-8") == expected
+
+    write_data(yaml_handler, data, None)
+    assert capsys.readouterr().out == expected + "\n"
@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from cvgen.cli import app, parse_stage
+from cvgen.config import CollapseConfig, FilterConfig
+from cvgen.pipeline import Pipeline
+from cvgen.utils.collapse import collapse_keys
+from cvgen.utils.filter_compound import filter_compound
+
+data = {
+    "multi_lang_config": {"lang_keys": ["en", "ko"], "default_lang": "en"},
+    "highlights": [
+        {"content": {"en": "Short", "ko": "짧은"}, "verbosity": 1.0},
+        {"content": {"en": "Long", "ko": "긴"}, "verbosity": 2.0, "tags": ["detail"]},
+    ],
+}
+
+
+def test_pipeline_matches_stages_run_one_by_one():
+    pipeline = Pipeline([FilterConfig(target_verbosity=2.0), CollapseConfig(user_key="ko")])
+
+    expected = collapse_keys(
+        filter_compound(data, target_verbosity=2.0),
+        "multi_lang_config",
+        "lang_keys",
+        "default_lang",
+        "ko",
+    )
+    assert pipeline(data) == expected == {"highlights": ["짧은", "긴"]}
+
+
+def test_empty_pipeline_returns_input():
+    assert Pipeline([]).run(data) is data
+
+
+def test_pipeline_config_keeps_stage_types():
+    pipeline = Pipeline([CollapseConfig(user_key="ko"), FilterConfig()])
+    assert [type(stage) for stage in pipeline.stages] == [CollapseConfig, FilterConfig]
+
+
+def test_parse_stage_uses_command_options():
+    # Unset list options are None, as they are for 'cvgen filter' itself
+    assert parse_stage("filter --target-verbosity 2 --exclude-tags detail") == FilterConfig(
+        target_verbosity=2.0, include_tags=None, exclude_tags=["detail"]
+    )
+    assert parse_stage("collapse -k ko") == CollapseConfig(user_key="ko")
+
+
+@pytest.mark.parametrize("spec", ["", "unwrap", "filter cv.yaml", "collapse -o out.yaml"])
+def test_parse_stage_rejects_invalid_stages(spec):
+    with pytest.raises(ValueError):
+        parse_stage(spec)
+
+
+def test_run_matches_filter_then_collapse(tmp_path):
+    example = Path(__file__).parent.parent / "examples" / "basic_ko" / "extended_template.yaml"
+    runner = CliRunner()
+
+    def invoke(*args):
+        result = runner.invoke(app, [str(arg) for arg in args])
+        assert result.exit_code == 0, result.output
+
+    invoke("filter", example, "--target-verbosity", "2", "-o", tmp_path / "filtered.yaml")
+    invoke("collapse", tmp_path / "filtered.yaml", "-k", "ko", "-o", tmp_path / "piped.yaml")
+    invoke(
+        "run",
+        example,
+        "-s",
+        "filter --target-verbosity 2",
+        "-s",
+        "collapse -k ko",
+        "-o",
+        tmp_path / "run.yaml",
+    )
+    piped = (tmp_path / "piped.yaml").read_bytes()
+    assert b"technologies" in piped
+    assert (tmp_path / "run.yaml").read_bytes() == piped
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from cvgen import profiling
+from cvgen.profiling import count_nodes, profiled, start_profiling, stop_profiling
+
+
+@pytest.fixture(autouse=True)
+def no_leftover_profiler():
+    yield
+    profiling._active = None
+
+
+def drop_first(data):
+    return data[1:]
+
+
+def test_count_nodes():
+    assert count_nodes({"a": [1, 2], "b": {"c": "x"}}) == 6
+    assert count_nodes("leaf") == 1
+
+
+def test_profiled_is_a_plain_call_when_off():
+    assert profiled("filter", drop_first, [1, 2, 3]) == [2, 3]
+    assert stop_profiling("filter") is None
+
+
+def test_profiled_records_stages(capsys):
+    start_profiling()
+    assert profiled("filter", drop_first, [1, 2, 3]) == [2, 3]
+    profiled("dump", str, 5)
+    report = stop_profiling("filter")
+
+    assert report["command"] == "filter"
+    first, second = report["stages"]
+    assert first["stage"] == "filter"
+    assert first["nodes_in"] == 4
+    assert first["nodes_out"] == 3
+    assert first["seconds"] >= 0
+    assert second["nodes_in"] is None
+    assert second["nodes_out"] is None
+    assert report["totals"]["filter"]["count"] == 1
+    assert "cprofile" not in report
+
+    # The report is printed to stderr so it never mixes with the command output
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert json.loads(captured.err) == report
+
+
+def test_profiler_top_functions(capsys):
+    start_profiling(top=3)
+    profiled("filter", drop_first, list(range(100)))
+    report = stop_profiling("filter")
+    assert 0 < len(report["cprofile"]) <= 3
+    assert {"function", "calls", "total_seconds", "cumulative_seconds"} <= set(
+        report["cprofile"][0]
+    )
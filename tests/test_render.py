@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from cvgen.render import format_summary, render_args, render_files
+
+# Stands in for `rendercv render`: fails for files whose name contains "bad", otherwise writes
+# the output folder it was given
+FAKE_RENDERCV = (
+    sys.executable,
+    "-c",
+    """
+import os, sys
+name, folder = sys.argv[1], sys.argv[3]
+sys.exit("cannot render " + name) if "bad" in name else os.makedirs(folder)
+""",
+)
+
+
+def test_render_args_use_a_folder_per_file():
+    assert render_args(Path("out/cv_ko.yaml")) == [
+        "rendercv",
+        "render",
+        "cv_ko.yaml",
+        "--output-folder-name",
+        "rendercv_output_cv_ko",
+    ]
+
+
+def test_render_files_isolates_failures(tmp_path):
+    files = [tmp_path / name for name in ["cv_en.yaml", "cv_bad.yaml", "cv_ko.yaml"]]
+    for f in files:
+        f.write_text("cv: {}\n")
+
+    results = render_files(files, jobs=2, command=FAKE_RENDERCV)
+
+    assert [r.input_file for r in results] == files
+    assert [r.ok for r in results] == [True, False, True]
+    assert "cannot render cv_bad.yaml" in results[1].output
+    assert (tmp_path / "rendercv_output_cv_en").is_dir()
+    assert (tmp_path / "rendercv_output_cv_ko").is_dir()
+    assert all(r.duration > 0 for r in results)
+
+
+def test_render_files_reports_missing_command(tmp_path):
+    f = tmp_path / "cv.yaml"
+    f.write_text("cv: {}\n")
+
+    (result,) = render_files([f], command=[str(tmp_path / "no-such-rendercv")])
+
+    assert result.returncode is None
+    assert not result.ok
+
+
+def test_render_files_rejects_zero_jobs():
+    with pytest.raises(ValueError):
+        render_files([Path("cv.yaml")], jobs=0)
+
+
+def test_format_summary(tmp_path):
+    results = render_files([tmp_path / "cv_bad.yaml"], command=FAKE_RENDERCV)
+    summary = format_summary(results, elapsed=1.5)
+
+    assert summary.startswith("FAILED")
+    assert summary.endswith(
+        f"Rendered 0/1 files in 1.50s ({results[0].duration:.2f}s if run one at a time)"
+    )
@@ -0,0 +1,48 @@
+from cvgen.utils.scope import ScopeResolver
+
+
+def resolver():
+    return ScopeResolver("cfg", lambda config: frozenset(config.get("keys", [])))
+
+
+def test_root_scope():
+    scope = resolver().root()
+    assert scope.config == {}
+    assert scope.values == frozenset()
+    assert resolver().root({"keys": ["en"]}).values == frozenset({"en"})
+
+
+def test_enter_merges_config():
+    r = resolver()
+    root = r.root({"keys": ["en"], "default": "en"})
+    scope = r.enter(root, {"cfg": {"keys": ["en", "ko"]}, "name": "x"})
+    assert scope.config == {"keys": ["en", "ko"], "default": "en"}
+    assert scope.values == frozenset({"en", "ko"})
+    # The enclosing config is not changed
+    assert root.config == {"keys": ["en"], "default": "en"}
+
+
+def test_enter_without_config_keeps_scope():
+    r = resolver()
+    root = r.root()
+    assert r.enter(root, {"name": "x"}) is root
+
+
+def test_scopes_are_resolved_once():
+    calls = []
+
+    def resolve(config):
+        calls.append(config)
+        return config.get("keys")
+
+    r = ScopeResolver("cfg", resolve)
+    root = r.root()
+    item = {"cfg": {"keys": ["en"]}}
+    first = r.enter(root, item)
+    assert r.enter(root, item) is first
+    assert len(calls) == 2
+
+    # The same config under another scope is resolved again
+    other = r.child(root, {"keys": ["ko"]})
+    assert r.enter(other, item) is not first
+    assert len(calls) == 4
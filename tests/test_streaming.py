@@ -0,0 +1,150 @@
+import io
+
+import pytest
+import yaml
+
+from cvgen.config import CollapseConfig, FilterConfig
+from cvgen.pipeline import Pipeline
+from cvgen.streaming import (
+    StreamingError,
+    collapse_events,
+    emit_events,
+    filter_events,
+    parse_events,
+)
+from cvgen.utils.collapse import collapse_keys
+from cvgen.utils.filter_compound import filter_compound
+
+data = {
+    "filter_config": {"verbosity_key": "level"},
+    "multi_lang_config": {"lang_keys": ["en", "ko"], "default_lang": "en"},
+    "name": {"en": "Kim", "ko": "김"},
+    "highlights": [
+        {"content": {"en": "Short", "ko": "짧은"}, "level": 1.0},
+        {"content": {"en": "Long", "ko": "긴"}, "level": 2.0, "tags": ["detail"]},
+        {"content": "Plain", "tags": ["backend"]},
+    ],
+    "sections": {
+        "work": {
+            "multi_lang_config": {"default_lang": "ko"},
+            "items": [{"en": "English", "ko": "한국어"}, {"ko": "한국어만"}],
+        },
+    },
+}
+
+
+def stream(document, transform):
+    output = io.StringIO()
+    emit_events(
+        transform(parse_events(yaml.safe_dump(document, allow_unicode=True, sort_keys=False))),
+        output,
+    )
+    return yaml.safe_load(output.getvalue())
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        FilterConfig(),
+        FilterConfig(target_verbosity=2.0),
+        FilterConfig(target_verbosity=2.0, exclude_tags=["detail"]),
+        FilterConfig(tag_expr="backend | !detail"),
+    ],
+)
+def test_filter_events_matches_filter_compound(config):
+    expected = filter_compound(data, **config.model_dump())
+    assert stream(data, lambda events: filter_events(events, config)) == expected
+
+
+@pytest.mark.parametrize("user_key", [None, "en", "ko"])
+def test_collapse_events_matches_collapse_keys(user_key):
+    config = CollapseConfig(user_key=user_key)
+    expected = collapse_keys(data, **config.model_dump())
+    assert stream(data, lambda events: collapse_events(events, config)) == expected
+
+
+def test_streamed_pipeline_matches_pipeline():
+    pipeline = Pipeline([FilterConfig(target_verbosity=2.0), CollapseConfig(user_key="ko")])
+    assert stream(data, pipeline.stream) == pipeline(data)
+
+
+def test_configs_of_other_stages_may_come_first():
+    document = {"multi_lang_config": data["multi_lang_config"], **data}
+    config = FilterConfig(target_verbosity=2.0)
+    expected = filter_compound(document, **config.model_dump())
+    assert stream(document, lambda events: filter_events(events, config)) == expected
+
+
+def test_late_config_key_with_same_settings_is_allowed():
+    document = {
+        "items": [{"content": "a", "verbosity": 2.0}],
+        "filter_config": {"verbosity_key": "verbosity"},
+    }
+    config = FilterConfig()
+    assert stream(document, lambda events: filter_events(events, config)) == {"items": []}
+
+
+def test_late_config_key_changing_settings_raises():
+    document = {
+        "items": [{"content": "a", "level": 2.0}],
+        "filter_config": {"verbosity_key": "level"},
+    }
+    with pytest.raises(StreamingError):
+        stream(document, lambda events: filter_events(events, FilterConfig()))
+
+
+def test_late_content_key_raises():
+    document = {"items": [{"title": "x", "content": "a"}]}
+    with pytest.raises(StreamingError):
+        stream(document, lambda events: filter_events(events, FilterConfig()))
+
+
+def test_late_lang_key_raises_like_collapse_keys():
+    document = {
+        "multi_lang_config": {"lang_keys": ["en", "ko"]},
+        "item": {"title": "x", "en": "a"},
+    }
+    with pytest.raises(ValueError, match="both collapsible keys and other keys"):
+        stream(document, lambda events: collapse_events(events, CollapseConfig()))
+
+
+def test_aliases_are_not_supported():
+    text = "base: &base {en: a}\ncopy: *base\n"
+    with pytest.raises(StreamingError):
+        list(filter_events(parse_events(text), FilterConfig()))
+
+
+def test_each_document_of_a_stream_is_filtered():
+    text = "- {content: a, verbosity: 2.0}\n- b\n---\nitem: {content: c}\n"
+    output = io.StringIO()
+    emit_events(filter_events(parse_events(text), FilterConfig()), output)
+    assert list(yaml.safe_load_all(output.getvalue())) == [["b"], {"item": "c"}]
+
+
+def test_dropped_root_is_written_as_null():
+    document = {"content": "a", "verbosity": 2.0}
+    assert stream(document, lambda events: filter_events(events, FilterConfig())) is None
+
+
+def test_late_nested_config_key_raises_streaming_error():
+    document = {
+        "multi_lang_config": {"lang_keys": ["en", "ko"], "default_lang": "en"},
+        "section": {
+            "title": {"en": "T", "ko": "티", "de": "D"},
+            "multi_lang_config": {"lang_keys": ["en", "ko", "de"]},
+        },
+    }
+    config = CollapseConfig(user_key="ko")
+    assert collapse_keys(document, **config.model_dump()) == {"section": {"title": "티"}}
+    with pytest.raises(StreamingError, match="multi_lang_config"):
+        stream(document, lambda events: collapse_events(events, config))
+
+
+def test_transform_errors_without_late_config_key_are_kept():
+    document = {
+        "multi_lang_config": {"lang_keys": ["en", "ko"]},
+        "section": {"title": {"en": "T", "de": "D"}, "other": 1},
+    }
+    with pytest.raises(ValueError, match="both collapsible keys") as error:
+        stream(document, lambda events: collapse_events(events, CollapseConfig()))
+    assert not isinstance(error.value, StreamingError)
@@ -0,0 +1,31 @@
+import pytest
+
+from cvgen.utils.tag_expr import parse_tag_expr
+
+
+@pytest.mark.parametrize(
+    "expr, tags, expected",
+    [
+        ("backend", {"backend"}, True),
+        ("backend", {"frontend"}, False),
+        ("!intern", {"intern"}, False),
+        ("!intern", set(), True),
+        ("backend & !intern", {"backend"}, True),
+        ("backend & !intern", {"backend", "intern"}, False),
+        ("(backend & !intern) | leadership", {"intern", "leadership"}, True),
+        ("(backend & !intern) | leadership", {"backend", "intern"}, False),
+        ("a | b & c", {"a"}, True),
+        ("a | b & c", {"b"}, False),
+        ("!(a | b)", {"c"}, True),
+        ("!!a", {"a"}, True),
+        ("ml-ops&c++", {"ml-ops", "c++"}, True),
+    ],
+)
+def test_parse_tag_expr(expr, tags, expected):
+    assert parse_tag_expr(expr)(frozenset(tags)) is expected
+
+
+@pytest.mark.parametrize("expr", ["", "   ", "a &", "(a | b", "a b", "a | )", "&a", "a)"])
+def test_invalid_tag_expr(expr):
+    with pytest.raises(ValueError):
+        parse_tag_expr(expr)
@@ -0,0 +1,136 @@
+import pytest
+
+from cvgen.utils.filter_by_tags import compile_subtree_tags_check
+from cvgen.utils.filter_compound import filter_compound
+from cvgen.utils.tag_index import build_tag_index, format_tag_stats
+
+shared = {"plain": [1, 2, {"x": "y"}]}
+
+data = {
+    "meta": shared,
+    "items": [
+        {"content": "a", "verbosity": 1.0, "tags": ["backend", "lead"]},
+        {"content": "b", "verbosity": 2.0, "tags": "backend"},
+        {"content": "c", "tags": ["lead", "backend", "lead"]},
+        None,
+    ],
+    "nested": {
+        "filter_config": {"content_key": "body", "tags_key": "labels"},
+        "entry": {"body": "d", "labels": ["intern"], "verbosity": 1.0},
+        "alias": shared,
+    },
+}
+
+
+def test_index_tags_and_verbosity():
+    index = build_tag_index(data)
+    assert index.tags == {
+        "backend": [["items", 0], ["items", 1], ["items", 2]],
+        "lead": [["items", 0], ["items", 2]],
+        "intern": [["nested", "entry"]],
+    }
+    assert index.co_occurrence == {("backend", "lead"): 2}
+    assert index.verbosity == {1.0: [["items", 0], ["nested", "entry"]], 2.0: [["items", 1]]}
+
+
+def test_inert_subtrees():
+    index = build_tag_index(data)
+    assert id(shared) in index.inert
+    assert id(shared["plain"]) in index.inert
+    # Holds a wrapper, or a None
+    assert id(data["items"]) not in index.inert
+    assert id(data["nested"]) not in index.inert
+    assert id(data) not in index.inert
+
+
+def test_tags_below():
+    index = build_tag_index(data, stats=False)
+    assert index.tags_below[id(data)] == {"backend", "lead", "intern"}
+    assert index.tags_below[id(data["items"])] == {"backend", "lead"}
+    assert index.tags_below[id(data["nested"])] == {"intern"}
+    # No tagged wrapper below
+    assert id(shared) not in index.tags_below
+    assert index.tags == {}
+
+
+def test_tags_below_leaves_out_unknown_tags_and_aliases():
+    entry = {"content": "a", "tags": ["x"]}
+    document = {"odd": [{"content": "b", "tags": 3}], "one": [entry], "two": [entry]}
+    index = build_tag_index(document, stats=False)
+    assert id(document) not in index.tags_below
+    assert id(document["odd"]) not in index.tags_below
+    assert index.tags_below[id(document["one"])] == {"x"}
+    assert id(entry) not in index.tags_below
+
+
+@pytest.mark.parametrize(
+    "options, tags, expected",
+    [
+        ({"include_tags": ["a"]}, {"b", "c"}, False),
+        ({"include_tags": ["a"]}, {"a", "b"}, None),
+        ({"include_tags": ["a", "b"], "include_mode": "all"}, {"a", "c"}, False),
+        ({"include_tags": [], "include_mode": "all"}, {"a"}, True),
+        ({"exclude_tags": ["a"]}, {"b", "c"}, True),
+        ({"exclude_tags": ["a"]}, {"a"}, None),
+        ({"exclude_tags": ["a", "b"], "exclude_mode": "all"}, {"a", "c"}, True),
+        ({"exclude_tags": [], "exclude_mode": "all"}, {"a"}, False),
+        ({"exclude_tags": ["a"], "tag_expr": "b"}, {"b"}, None),
+        ({"include_tags": ["a"], "tag_expr": "b"}, {"b"}, False),
+    ],
+)
+def test_subtree_tags_check(options, tags, expected):
+    options.setdefault("include_tags", None)
+    options.setdefault("exclude_tags", None)
+    assert compile_subtree_tags_check(**options)(frozenset(tags)) is expected
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"target_verbosity": 1.0},
+        {"target_verbosity": 3.0, "exclude_tags": ["lead"]},
+        {"target_verbosity": 1.0, "include_tags": ["intern", "backend"]},
+        {"target_verbosity": 3.0, "include_tags": ["intern"]},
+        {"target_verbosity": 3.0, "exclude_tags": ["intern"]},
+        {"target_verbosity": 3.0, "exclude_tags": ["intern", "lead"], "exclude_mode": "all"},
+        {"target_verbosity": 1.0, "should_unwrap": False},
+    ],
+)
+def test_filter_with_index_matches_filter_without(options):
+    index = build_tag_index(data)
+    assert filter_compound(data, index=index, **options) == filter_compound(data, **options)
+
+
+def test_filter_rejects_index_of_other_document():
+    index = build_tag_index(data)
+    with pytest.raises(ValueError, match="another document"):
+        filter_compound(dict(data), index=index)
+    # An index built with other keys is not used
+    other_keys = build_tag_index(data, content_key="body")
+    assert filter_compound(data, index=other_keys) == filter_compound(data)
+
+
+def test_format_tag_stats():
+    text = format_tag_stats(build_tag_index(data), paths=True)
+    assert text.splitlines()[:3] == ["Tags:", f"  {'backend':<24} {3:>5}", "      items[0]"]
+    assert f"  {'backend + lead':<24} {2:>5}" in text
+    assert format_tag_stats(build_tag_index({})).splitlines()[1] == "  (none)"
+
+
+@pytest.mark.parametrize(
+    "document, expected",
+    [
+        # The tags stage drops the inner config, so the wrapper is unwrapped with the outer key
+        (
+            {"section": {"filter_config": {"content_key": "body"}, "body": {"content": 1}}},
+            {"section": {"body": 1}},
+        ),
+        (
+            {"filter_config": {"content_key": "body"}, "x": {"content": {}, "verbosity": 2.0}},
+            {"x": {}},
+        ),
+    ],
+)
+def test_wrapper_of_outer_content_key_is_not_inert(document, expected):
+    index = build_tag_index(document)
+    assert filter_compound(document, index=index) == filter_compound(document) == expected
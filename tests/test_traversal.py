@@ -0,0 +1,111 @@
+import copy
+import sys
+
+from cvgen.utils.collapse import collapse_keys
+from cvgen.utils.filter_by_tags import _filter_by_tags
+from cvgen.utils.filter_by_verbosity import _filter_by_verbosity
+from cvgen.utils.filter_compound import filter_compound
+from cvgen.utils.traversal import REMOVE, Frame, Redirect, traverse
+from cvgen.utils.unwrap import unwrap_content
+
+
+def _drop_negative(node, context):
+    if isinstance(node, list):
+        output = []
+        pending = []
+        for element in node:
+            if isinstance(element, (dict, list)):
+                pending.append((len(output), element, context))
+            elif element < 0:
+                continue
+            output.append(element)
+        return Frame(output, pending)
+    if "skip" in node:
+        return REMOVE
+    if "inner" in node:
+        return Redirect(node["inner"], context)
+    return {k: v for k, v in node.items()}
+
+
+def test_traverse_keeps_order_and_removes():
+    data = [1, {"skip": True}, [-1, 2, {"inner": {"a": 1}}], {"inner": [3, -4]}, 5]
+    assert traverse(data, None, _drop_negative) == [1, [2, {"a": 1}], [3], 5]
+
+
+def test_traverse_returns_final_value_of_root():
+    assert traverse({"inner": {"skip": True}}, None, _drop_negative) is REMOVE
+
+
+def test_traverse_close_replaces_output():
+    def open_node(node, context):
+        pending = [(i, child, context) for i, child in enumerate(node) if isinstance(child, list)]
+        return Frame(list(node), pending, sum)
+
+    assert traverse([1, [2, [3, 4]], 5], None, open_node) == 15
+
+
+def _double_odd(node, context):
+    if isinstance(node, int):
+        return node * 2 if node % 2 else node
+    items = node.items() if isinstance(node, dict) else enumerate(node)
+    return Frame(node, [(slot, v, context) for slot, v in items], shared=True)
+
+
+def test_traverse_shares_unchanged_subtrees():
+    data = {"a": [2, 4], "b": {"c": [1, 2]}, "d": {"e": {"f": [6]}}}
+    before = copy.deepcopy(data)
+    result = traverse(data, None, _double_odd)
+    assert result == {"a": [2, 4], "b": {"c": [2, 2]}, "d": {"e": {"f": [6]}}}
+    # Only the path to the changed list is copied
+    assert result is not data
+    assert result["b"] is not data["b"]
+    assert result["d"] is data["d"]
+    assert data == before
+
+
+def test_transforms_share_unchanged_subtrees():
+    untouched = {"email": "someone@example.com", "links": ["a", {"b": "c"}]}
+    data = {
+        "config": {"lang_keys": ["en", "ko"], "default_lang": "en"},
+        "name": {"en": "Name", "ko": "이름"},
+        "contact": untouched,
+        "items": [{"content": "x", "verbosity": 1}, {"content": "y", "verbosity": 3}],
+    }
+    before = copy.deepcopy(data)
+
+    filtered = filter_compound(data, target_verbosity=2)
+    assert filtered["items"] == ["x"]
+    assert filtered["contact"] is untouched
+    assert filtered["name"] is data["name"]
+
+    collapsed = collapse_keys(data, "config", "lang_keys", "default_lang", "ko")
+    assert collapsed["name"] == "이름"
+    assert collapsed["contact"] is untouched
+
+    assert unwrap_content(untouched) is untouched
+    assert data == before
+
+
+def test_unwrap_beyond_recursion_limit():
+    depth = sys.getrecursionlimit() * 2
+    data = "leaf"
+    for _ in range(depth):
+        data = {"content": [{"item": data}]}
+    result = unwrap_content(data)
+    for _ in range(depth):
+        result = result[0]["item"]
+    assert result == "leaf"
+
+
+def test_filter_beyond_recursion_limit():
+    depth = sys.getrecursionlimit() * 2
+    data = "leaf"
+    for _ in range(depth):
+        data = {"content": [{"item": data}], "verbosity": 1.0, "tags": ["a"]}
+    for result in [
+        _filter_by_verbosity(data, target_verbosity=1.0),
+        _filter_by_tags(data, include_tags=["a"]),
+    ]:
+        for _ in range(depth):
+            result = result["content"][0]["item"]
+        assert result == "leaf"
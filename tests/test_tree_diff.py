@@ -0,0 +1,103 @@
+import pytest
+
+from cvgen.cli import compare_yaml_content
+from cvgen.utils.tree_diff import (
+    Change,
+    changed_pairs,
+    diff_trees,
+    format_change,
+    format_path,
+    node_digest,
+    tree_digests,
+)
+
+
+def digest(data):
+    return node_digest(data, tree_digests(data))
+
+
+def test_digests_ignore_key_order_but_not_list_order():
+    assert digest({"a": 1, "b": [1, 2]}) == digest({"b": [1, 2], "a": 1})
+    assert digest([1, 2]) != digest([2, 1])
+    assert digest({"a": [1]}) != digest({"a": 1})
+
+
+def test_digests_tell_types_apart():
+    assert len({digest(value) for value in [1, 1.0, True, "1", None, "None"]}) == 6
+
+
+def test_identical_subtrees_are_not_visited():
+    shared = {"big": list(range(100))}
+    old = {"same": shared, "other": 1}
+    new = {"same": dict(shared), "other": 2}
+    assert diff_trees(old, new) == [Change("changed", ["other"], 1, 2)]
+
+
+def test_dict_changes_in_document_order():
+    old = {"a": {"x": 1}, "gone": 1, "c": 3}
+    new = {"a": {"x": 2}, "c": 4, "new": 5}
+    assert diff_trees(old, new) == [
+        Change("changed", ["a", "x"], 1, 2),
+        Change("removed", ["gone"], old=1),
+        Change("changed", ["c"], 3, 4),
+        Change("added", ["new"], new=5),
+    ]
+
+
+def test_list_items_are_aligned():
+    old = {"items": ["a", "b", "c", "d"]}
+    new = {"items": ["a", "new", "b", "c2", "d"]}
+    assert diff_trees(old, new) == [
+        Change("added", ["items", 1], new="new"),
+        Change("changed", ["items", 2], "c", "c2"),
+    ]
+    assert diff_trees(["a", "b"], ["b"]) == [Change("removed", [0], old="a")]
+
+
+def test_changed_pairs_lead_down_to_each_change():
+    old = {"items": [{"x": 1}, "b"]}
+    new = {"items": [{"x": 2}, "b", "c"]}
+    (first, second) = changed_pairs(old, new)
+    assert first == [
+        (old, new),
+        (old["items"], new["items"]),
+        (old["items"][0], new["items"][0]),
+        (1, 2),
+    ]
+    assert second[:2] == first[:2]
+    assert second[2][1] == "c" and not isinstance(second[2][0], (dict, list, str))
+
+
+def test_multi_line_strings_get_a_line_diff():
+    (change,) = diff_trees({"text": "one\ntwo\n"}, {"text": "one\nthree\n"})
+    assert "-two" in change.detail
+    assert "+three" in change.detail
+    assert diff_trees({"text": "a"}, {"text": "b"})[0].detail is None
+
+
+def test_format_path_and_change():
+    assert format_path(["cv", "sections", 2, "a.b", 1.5]) == 'cv.sections[2]["a.b"][1.5]'
+    assert format_path([]) == "(root)"
+    assert format_change(Change("changed", ["name"], "A", "이름")) == (
+        'changed  name: "A" -> "이름"'
+    )
+
+
+def test_compare_yaml_content():
+    assert compare_yaml_content({"a": [1]}, {"a": [1]}).is_equal
+    result = compare_yaml_content({"a": [1]}, {"a": [2]})
+    assert not result.is_equal
+    assert result.changes == [Change("changed", ["a", 0], 1, 2)]
+    quick = compare_yaml_content({"a": [1]}, {"a": [2]}, quick=True)
+    assert not quick.is_equal and quick.changes == []
+
+
+def test_compare_yaml_content_tells_types_apart():
+    result = compare_yaml_content({"a": [1, 1]}, {"a": [1.0, True]})
+    assert [change.new for change in result.changes] == [1.0, True]
+
+
+def test_compare_result_diff_is_deprecated_alias():
+    result = compare_yaml_content({"a": 1}, {"a": 2})
+    with pytest.deprecated_call():
+        assert result.diff == result.changes
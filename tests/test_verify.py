@@ -0,0 +1,88 @@
+import json
+from pathlib import Path
+
+from cvgen.utils.tree_diff import Change
+from cvgen.verify import (
+    CHANGED,
+    NEW,
+    OK,
+    REMOVED,
+    content_hashes,
+    load_snapshot,
+    update_snapshot,
+    verify_outputs,
+)
+from cvgen.yaml_handler import get_yaml_handler
+
+yaml_handler = get_yaml_handler()
+
+
+def outputs_in(out_dir: Path, **variants):
+    return {out_dir / f"{name}.yaml": data for name, data in variants.items()}
+
+
+def test_content_hashes_by_output_name(tmp_path):
+    shared = {"sections": [{"a": 1}, {"b": 2}]}
+    outputs = outputs_in(tmp_path, en={"cv": shared, "lang": "en"}, ko={"cv": shared})
+    hashes = content_hashes(outputs, tmp_path)
+    assert list(hashes) == ["en.yaml", "ko.yaml"]
+    reordered = content_hashes(outputs_in(tmp_path, en={"lang": "en", "cv": shared}), tmp_path)
+    assert reordered["en.yaml"] == hashes["en.yaml"]
+    assert hashes["ko.yaml"] != hashes["en.yaml"]
+
+
+def test_update_then_verify(tmp_path):
+    snapshot_file = tmp_path / "snapshot.json"
+    outputs = outputs_in(tmp_path, en={"name": "A"}, ko={"name": "가"})
+    written = update_snapshot(yaml_handler, outputs, tmp_path, snapshot_file)
+    assert written == [*outputs, snapshot_file]
+    assert update_snapshot(yaml_handler, outputs, tmp_path, snapshot_file) == []
+    assert sorted(json.loads(snapshot_file.read_text())) == ["en.yaml", "ko.yaml"]
+
+    results = verify_outputs(yaml_handler, outputs, tmp_path, load_snapshot(snapshot_file))
+    assert [(r.name, r.status) for r in results] == [("en.yaml", OK), ("ko.yaml", OK)]
+
+
+def test_verify_diffs_only_mismatches(tmp_path):
+    snapshot_file = tmp_path / "snapshot.json"
+    outputs = outputs_in(tmp_path, en={"name": "A"}, ko={"name": "가"}, old={})
+    update_snapshot(yaml_handler, outputs, tmp_path, snapshot_file)
+    # An output whose hash matches is never loaded
+    (tmp_path / "ko.yaml").write_text("not: [valid")
+
+    generated = outputs_in(tmp_path, en={"name": "B"}, ko={"name": "가"}, de={"name": "A"})
+    results = verify_outputs(
+        yaml_handler, generated, tmp_path, load_snapshot(snapshot_file), jobs=2
+    )
+
+    assert [(r.name, r.status) for r in results] == [
+        ("en.yaml", CHANGED),
+        ("ko.yaml", OK),
+        ("de.yaml", NEW),
+        ("old.yaml", REMOVED),
+    ]
+    assert results[0].changes == [Change("changed", ["name"], "A", "B")]
+    assert not any(r.error for r in results)
+
+
+def test_verify_reports_unreadable_stored_outputs(tmp_path):
+    snapshot = {"en.yaml": "0" * 32}
+    (results,) = verify_outputs(yaml_handler, outputs_in(tmp_path, en={}), tmp_path, snapshot)
+    assert results.status == CHANGED
+    assert "FileNotFoundError" in results.error
+    assert load_snapshot(tmp_path / "missing.json") == {}
+
+
+def test_verify_diffs_changed_outputs_in_worker_processes(tmp_path):
+    snapshot_file = tmp_path / "snapshot.json"
+    update_snapshot(
+        yaml_handler, outputs_in(tmp_path, en={"n": 1}, ko={"n": 2}), tmp_path, snapshot_file
+    )
+    generated = outputs_in(tmp_path, en={"n": 3}, ko={"n": 4})
+    results = verify_outputs(
+        yaml_handler, generated, tmp_path, load_snapshot(snapshot_file), jobs=2
+    )
+    assert [r.changes for r in results] == [
+        [Change("changed", ["n"], 1, 3)],
+        [Change("changed", ["n"], 2, 4)],
+    ]
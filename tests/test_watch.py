@@ -0,0 +1,119 @@
+import os
+from pathlib import Path
+
+from cvgen.build import BuildManifest
+from cvgen.utils.filter_compound import filter_compound
+from cvgen.watch import IncrementalBuild, watch_files
+from cvgen.yaml_handler import get_yaml_handler
+
+source = """\
+multi_lang_config:
+  lang_keys: [en, ko]
+  default_lang: en
+name:
+  en: Name
+  ko: 이름
+highlights:
+  - content: Short
+    verbosity: 1.0
+  - content: Long
+    verbosity: 2.0
+"""
+
+
+def make_build(tmp_path: Path, manifest: dict) -> IncrementalBuild:
+    (tmp_path / "cv.yaml").write_text(source, encoding="utf-8")
+    return IncrementalBuild(
+        get_yaml_handler(),
+        lambda: BuildManifest(source=tmp_path / "cv.yaml", out_dir=tmp_path, **manifest),
+    )
+
+
+def test_rebuild_writes_only_changed_outputs(tmp_path):
+    build = make_build(tmp_path, {"languages": ["en", "ko"], "output_template": "{lang}.yaml"})
+
+    assert build.rebuild() == [tmp_path / "en.yaml", tmp_path / "ko.yaml"]
+    assert (tmp_path / "ko.yaml").read_text(encoding="utf-8") == (
+        "name: 이름\nhighlights:\n- Short\n"
+    )
+    assert build.rebuild() == []
+
+    (tmp_path / "cv.yaml").write_text(source.replace("Name", "Other"), encoding="utf-8")
+    assert build.rebuild() == [tmp_path / "en.yaml"]
+
+
+def test_rebuild_reuses_unchanged_variants(tmp_path, monkeypatch):
+    manifest = {"languages": ["en"], "verbosity": [1.0]}
+    build = make_build(tmp_path, manifest)
+    build.rebuild()
+
+    calls = []
+    monkeypatch.setattr(
+        "cvgen.watch.filter_compound", lambda data, **config: calls.append(config) or data
+    )
+    manifest["verbosity"] = [1.0, 2.0]
+    # Rewriting the source with the same content does not invalidate anything
+    (tmp_path / "cv.yaml").write_text(source, encoding="utf-8")
+    os.utime(tmp_path / "cv.yaml", (1, 1))
+
+    assert build.rebuild() == [tmp_path / "cv_en_2_all.yaml"]
+    assert [config["target_verbosity"] for config in calls] == [2.0]
+
+
+def test_rebuild_refilters_only_variants_that_keep_the_change(tmp_path, monkeypatch):
+    build = make_build(tmp_path, {"languages": ["en"], "verbosity": [1.0, 2.0]})
+    build.rebuild()
+
+    calls = []
+    monkeypatch.setattr(
+        "cvgen.watch.filter_compound",
+        lambda data, **config: (
+            calls.append(config["target_verbosity"]) or filter_compound(data, **config)
+        ),
+    )
+    # Only the variant at verbosity 2 keeps the edited highlight
+    (tmp_path / "cv.yaml").write_text(source.replace("Long", "Longer"), encoding="utf-8")
+    assert build.rebuild() == [tmp_path / "cv_en_2_all.yaml"]
+    assert calls == [2.0]
+
+    # A change outside any dropped wrapper affects every variant
+    (tmp_path / "cv.yaml").write_text(source.replace("Short", "Brief"), encoding="utf-8")
+    assert build.rebuild() == [tmp_path / "cv_en_1_all.yaml", tmp_path / "cv_en_2_all.yaml"]
+    assert calls == [2.0, 1.0, 2.0]
+
+
+def test_rebuild_tells_apart_values_that_compare_equal(tmp_path):
+    build = make_build(tmp_path, {"languages": ["en"], "output_template": "{lang}.yaml"})
+    (tmp_path / "cv.yaml").write_text(source.replace("Short", "1"), encoding="utf-8")
+    build.rebuild()
+
+    # 1 == True in Python, but the outputs differ
+    (tmp_path / "cv.yaml").write_text(source.replace("Short", "true"), encoding="utf-8")
+    assert build.rebuild() == [tmp_path / "en.yaml"]
+    assert "- true\n" in (tmp_path / "en.yaml").read_text(encoding="utf-8")
+
+
+def test_watch_files_debounces_changes(tmp_path):
+    watched = tmp_path / "cv.yaml"
+    watched.write_text("a: 1\n")
+    ticks = []
+    changes = []
+
+    def should_stop():
+        ticks.append(None)
+        # Two quick writes, then enough quiet ticks for one rebuild
+        if len(ticks) == 2:
+            watched.write_text("a: 2\n")
+        if len(ticks) == 3:
+            watched.write_text("a: 33\n")
+        return len(ticks) > 8
+
+    watch_files(
+        lambda: [watched],
+        lambda: changes.append(None),
+        interval=0,
+        debounce=0,
+        should_stop=should_stop,
+    )
+
+    assert len(changes) == 1
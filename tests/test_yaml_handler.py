@@ -0,0 +1,76 @@
+import pytest
+import yaml
+
+from cvgen.utils.filter_compound import filter_compound
+from cvgen.yaml_handler import (
+    YAML_ENGINES,
+    PurePyYAMLHandler,
+    PyYAMLHandler,
+    get_yaml_handler,
+    select_yaml_engine,
+)
+
+data = {"name": {"en": "Name", "ko": "이름"}, "highlights": ["a", "b"], "verbosity": 1.5}
+
+
+@pytest.fixture(autouse=True)
+def default_engine(monkeypatch):
+    monkeypatch.delenv("CVGEN_YAML_ENGINE", raising=False)
+    yield
+    select_yaml_engine(None)
+
+
+def test_default_engine_is_reused():
+    handler = get_yaml_handler()
+    assert isinstance(handler, PyYAMLHandler)
+    assert get_yaml_handler() is handler
+
+
+def test_engine_selection_order(monkeypatch):
+    monkeypatch.setenv("CVGEN_YAML_ENGINE", "ruamel")
+    assert get_yaml_handler() is get_yaml_handler("ruamel")
+
+    select_yaml_engine("pyyaml-pure")
+    assert type(get_yaml_handler()) is PurePyYAMLHandler
+    assert type(get_yaml_handler("pyyaml")) is PyYAMLHandler
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError, match="Unknown YAML engine"):
+        select_yaml_engine("nope")
+    with pytest.raises(ValueError, match="Unknown YAML engine"):
+        get_yaml_handler("nope")
+
+
+@pytest.mark.parametrize("engine", list(YAML_ENGINES))
+def test_engines_round_trip(engine, tmp_path):
+    handler = get_yaml_handler(engine)
+    text = handler.dump_to_string(data)
+    assert handler.load_from_string(text) == data
+
+    handler.dump_to_file(data, tmp_path / "out.yaml")
+    assert handler.load_from_file(tmp_path / "out.yaml") == data
+
+
+def test_pyyaml_engines_write_the_same_text():
+    expected = yaml.dump(data, allow_unicode=True, sort_keys=False)
+    assert get_yaml_handler("pyyaml").dump_to_string(data) == expected
+    assert get_yaml_handler("pyyaml-pure").dump_to_string(data) == expected
+
+
+@pytest.mark.parametrize("value", [{"a": "😀 \x85 text"}, "scalar root"])
+def test_pyyaml_engine_writes_what_pure_pyyaml_writes(value):
+    expected = yaml.dump(value, Dumper=yaml.SafeDumper, allow_unicode=True, sort_keys=False)
+    assert get_yaml_handler("pyyaml").dump_to_string(value) == expected
+
+
+@pytest.mark.parametrize("engine", ["pyyaml", "pyyaml-pure"])
+def test_pyyaml_engines_write_aliased_input_in_full(engine):
+    handler = get_yaml_handler(engine)
+    data = handler.load_from_string("shared: &s {x: [1, 2]}\nitems:\n- content: *s\n- *s\n")
+    # The filtered output shares the aliased subtree with the input
+    filtered = filter_compound(data)
+    assert filtered["items"][0] is filtered["shared"]
+    text = handler.dump_to_string(filtered)
+    assert "&" not in text and "*" not in text
+    assert handler.load_from_string(text) == {"shared": {"x": [1, 2]}, "items": [{"x": [1, 2]}] * 2}